@@ -0,0 +1,15 @@
+import pytest
+
+from zab_backends import MockModelBackend
+from zab_game import ZabGame
+from zab_mock import CycleStrategy, MockBackend
+
+@pytest.fixture
+def mock_game():
+    """Factory for a quiet fin/plox/tox game played against the mock model, one request per batch"""
+    def make(total_turns, strategy=None, scheduler=None, **mock_options):
+        backend = MockModelBackend(MockBackend(strategy or CycleStrategy(), **mock_options), max_batch_size=1,
+                                   scheduler=scheduler)
+        return ZabGame(total_turns, model_name="mock", backend=backend,
+                       available_functions=["fin", "plox", "tox"], seed=0, verbose=False)
+    return make
@@ -0,0 +1,52 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from zab import BIM_COLORS, Zab
+
+def test_zab_is_a_compact_immutable_state():
+    zab = Zab(10, bim=" lavender ")
+    assert not hasattr(zab, "__dict__")
+    with pytest.raises(AttributeError):
+        zab.pim = 5
+    with pytest.raises(AttributeError):
+        del zab.name
+    assert zab.bim == "Lavender" and BIM_COLORS[zab.bim_index] == zab.bim
+    assert all(Zab(1, bim=color).bim == color and Zab(1, bim=i).bim == color
+               for i, color in enumerate(BIM_COLORS))
+
+def test_bims_outside_the_palette_are_rejected():
+    for bim in ("Mauve", "light blue", len(BIM_COLORS), -1, None):
+        with pytest.raises(ValueError):
+            Zab(1, bim=bim)
+
+def test_zabs_pickle_and_copy():
+    zab = Zab(10, bim="Teal").call_function("fin").call_function("plox", 3)
+    restored = pickle.loads(pickle.dumps(zab))
+    assert (restored.name, restored.bim, restored.pim, restored.turns) == (zab.name, zab.bim, zab.pim, zab.turns)
+    assert list(restored.history) == list(zab.history)
+    assert copy.copy(zab) is zab and copy.deepcopy(zab) is zab
+
+def test_history_is_a_plain_list():
+    zab = Zab(10).call_function("fin").call_function("plox", 3)
+    assert type(zab.history) is list
+    assert json.loads(json.dumps(zab.history)) == zab.history
+    assert zab.history[-1] == "(name: amaC, bim: Red, pim: 1) -> plox(3) -> (name: amaC, bim: Red, pim: 4)"
+
+def test_history_view_shares_tails_and_formats_lazily():
+    base = Zab(10).call_function("fin").call_function("tox")
+    left, right = base.call_function("plox", 2), base.call_function("sox")
+    assert left.history_tail.parent is right.history_tail.parent is base.history_tail
+    assert base.history_tail._text is None  # nothing formatted yet
+
+    view = left.history_view
+    entries = left.history
+    assert len(view) == 3 and view == entries and view == tuple(entries)
+    assert view[0] == entries[0] and view[-1] == entries[-1] and view[-3] == entries[0]
+    assert view[1:] == entries[1:] and view[::-1] == entries[::-1]
+    assert list(reversed(view)) == entries[::-1]
+    with pytest.raises(IndexError):
+        view[3]
+    assert right.history[:2] == entries[:2] and right.history[2] != entries[2]
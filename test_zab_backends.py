@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from zab_backends import MockModelBackend, OpenAICompatibleBackend
+from zab_mock import CycleStrategy, LatencyModel, MockBackend, ScriptedStrategy
+from zab_ratelimit import ModelRequestFailed, RequestScheduler
+
+def test_concurrent_requests_are_batched():
+    backend = MockModelBackend(MockBackend(CycleStrategy(), latency=LatencyModel("fixed", 0.05)),
+                               max_batch_size=8, batch_window=0.02)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(lambda i: backend.respond("mock", f"Turn {i}. Call fin()"), range(8)))
+    assert len(answers) == 8
+    assert backend.batcher.requests == 8
+    assert backend.batcher.batches < 8
+
+def test_game_with_backend(mock_game):
+    results = mock_game(6, seed=0).play_game()
+    assert {turn['action'] for turn in results['turns']} == {"fin", "plox", "tox"}
+
+def test_timeout_is_retried_then_reported():
+    backend = MockModelBackend(MockBackend(latency=LatencyModel("fixed", 5.0), sleep=lambda s: None),
+                               timeout=1.0, max_batch_size=1,
+                               scheduler=RequestScheduler(max_retries=1, sleep=lambda s: None))
+    with pytest.raises(ModelRequestFailed) as error:
+        backend.respond("mock", "hi")
+    assert error.value.attempts == 2
+    assert "BackendTimeout" in str(error.value)
+
+def test_streamed_turns_stop_once_the_action_is_in(mock_game):
+    response = "<scratch>try fin</scratch>\nfin()\nNext I will explain at length why."
+    game = mock_game(2, ScriptedStrategy([response]), sleep=lambda s: None)
+    game.stop_early = True
+    chunks = []
+    game.on_response_chunk = lambda text, offset: chunks.append((text, offset))
+    results = game.play_game()
+    # The mock streams four characters at a time; generation stops at the first one past the newline
+    assert [turn['response'] for turn in results['turns']] == ["<scratch>try fin</scratch>\nfin()\nNex"] * 2
+    assert all(turn['success'] for turn in results['turns'])
+    assert "".join(text for text, _ in chunks[:9]) == results['turns'][0]['response'] and chunks[9][1] == 0
+    assert game.backend.mock.stats['requests'] == 3 and game.backend.mock.stats['completion_tokens'] > 0
+
+def test_async_games_share_one_client_and_build_no_sync_one():
+    import openai
+    from zab_game_async import AsyncZabGameOAI
+    client = openai.AsyncOpenAI(api_key="unused")
+    games = [AsyncZabGameOAI(2, client=client) for _ in range(2)]
+    assert all(game.async_client is client for game in games)
+    assert games[0].backend is games[1].backend and games[0].client is None  # no sync client per game
+    with pytest.raises(TypeError):
+        games[0].get_llm_response("hi")
+
+def test_native_batches_keep_token_usage():
+    class Completions:
+        def create(self, model, prompt, **params):
+            choices = [SimpleNamespace(index=i, text=f" answer {i}") for i in range(len(prompt))]
+            return SimpleNamespace(choices=choices, usage=SimpleNamespace(prompt_tokens=30, completion_tokens=7))
+    backend = OpenAICompatibleBackend(client=SimpleNamespace(completions=Completions()), native_batch=True)
+    answers = backend.complete_batch("model", [[{"role": "user", "content": "hi"}],
+                                               [{"role": "user", "content": "hello there"}]])
+    assert answers == ["answer 0", "answer 1"]
+    assert sum(a.prompt_tokens for a in answers) == 30 and sum(a.completion_tokens for a in answers) == 7
+    assert answers[0].prompt_tokens < answers[1].prompt_tokens
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import random
+
+from zab import Zab
+from zab_batch import ZabBatch, BatchFunctions
+
+def random_call(rng):
+    func_name = rng.choice(sorted(BatchFunctions.registry))
+    if func_name == "hin":
+        return func_name, rng.randint(1, 6)
+    if func_name == "min":
+        return func_name, rng.choice(["x", "hello", "zab", "ñandú"])
+    if func_name == "plox":
+        return func_name, rng.randint(1, 10)
+    if func_name == "mox":
+        return func_name, rng.randint(1, 7)
+    if func_name == "lox":
+        return func_name, rng.choice(["blue", "Yellow", "scarlet", "#00ff00", "dark green"])
+    if func_name == "rox":
+        return func_name, rng.choice(["triangle", "Hexagons", "12-gon", "circle"])
+    if func_name in ("vox", "box"):
+        return func_name, rng.choice(["cat", "spiders", "flamingo", "snake"])
+    return (func_name,)
+
+def test_batch_matches_scalar_functions():
+    """Random call sequences give the same states in batch and one at a time"""
+    rng = random.Random(0)
+    zabs = [Zab(10, name=rng.choice(["Cama", "Zorro", "é", "Ab"]), bim=rng.randint(0, 34), pim=rng.randint(-5, 5) or 1)
+            for _ in range(50)]
+    calls = [random_call(rng) for _ in range(80)]
+
+    batch = ZabBatch.from_zabs(zabs).apply_sequence(calls)
+
+    expected_states = []
+    for zab in zabs:
+        for func_name, *args in calls:
+            zab = zab.call_function(func_name, *args)
+        expected_states.append((zab.name, zab.bim, zab.pim))
+    actual_states = [(z.name, z.bim, z.pim) for z in batch.to_zabs()]
+    assert actual_states == expected_states
+
+def test_batch_pim_does_not_overflow():
+    batch = ZabBatch.repeat(Zab(10), 3).apply_sequence([("tox",)] * 100)
+    assert [z.pim for z in batch.to_zabs()] == [2**100] * 3
+
+def test_batch_rejects_out_of_range_arguments():
+    batch = ZabBatch.repeat(Zab(10), 2)
+    for func_name, arg in [("plox", 11), ("mox", 0), ("hin", 0), ("min", "")]:
+        try:
+            batch.apply(func_name, arg)
+        except ValueError:
+            continue
+        raise AssertionError(f"{func_name}({arg!r}) should fail")
+
+def test_batch_functions_leave_builtins_alone():
+    import zab_batch
+    assert {"bin", "min"} <= set(BatchFunctions.registry)
+    assert "bin" not in vars(zab_batch) and "min" not in vars(zab_batch)
@@ -0,0 +1,39 @@
+import json
+
+from zab_bench_runner import build_matrix, merge_shards, run_sweep
+
+def test_process_sweep_merges_worker_shards(tmp_path, monkeypatch):
+    monkeypatch.setenv("ZAB_ORACLE_CACHE", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setenv("ZAB_KNOWLEDGE_OVERLAY", str(tmp_path / "overlay.tsv"))
+    output = tmp_path / "results.jsonl"
+    # A shard of another (or an interrupted) run is left alone
+    (tmp_path / "results.jsonl.shard-1").write_text(json.dumps({'config': {}, 'error': "interrupted"}) + "\n")
+    configs = build_matrix(["mock"], [["fin", "tox", "plox"]], [4], range(6))
+    records = run_sweep(configs, str(output), backend="mock", workers=2, progress=False, processes=2)
+    assert len(records) == 6 and all('score' in r and 'result' not in r for r in records)
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(lines) == 6 and all('result' in line for line in lines)
+    assert [path.name for path in tmp_path.glob("*.shard-*")] == ["results.jsonl.shard-1"]
+    assert merge_shards(str(output)) == 1
+    assert not list(tmp_path.glob("*.shard-*"))
+
+def test_mock_sweep_sends_oracle_questions_to_the_mock(tmp_path, monkeypatch):
+    import zab
+    from zab_cache import OracleCache
+    from zab_models import model_provider
+
+    class RealBackend:
+        def __init__(self):
+            self.calls = []
+
+        def respond(self, model_name, prompt):
+            self.calls.append(prompt)
+            return "gato"
+    real = RealBackend()
+    monkeypatch.setattr(model_provider, "_backend", real)
+    monkeypatch.setattr(zab, "oracle_cache", OracleCache(path=None))
+    monkeypatch.setenv("ZAB_MOCK_STRATEGY", "cycle")
+    configs = build_matrix(["mock"], [["stin"]], [2], range(2))  # stin always asks the oracle
+    records = run_sweep(configs, str(tmp_path / "results.jsonl"), backend="mock", workers=2, progress=False)
+    assert all('score' in record for record in records)
+    assert real.calls == [] and model_provider.backend.mock.stats['requests'] > 0
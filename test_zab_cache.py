@@ -0,0 +1,34 @@
+from zab_cache import OracleCache, default_cache_path
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = OracleCache(None, max_memory_entries=2)
+    cache.put("stin", ["cama"], "m", "1")
+    cache.put("stin", ["toby"], "m", "2")
+    assert cache.get("stin", ["cama"], "m") == "1"
+    cache.put("stin", ["lulu"], "m", "3")
+    assert cache.get("stin", ["toby"], "m") is None
+    assert cache.get("stin", [" Cama "], "m") == "1"
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1 and cache.stats()['memory_entries'] == 2
+
+def test_disk_tier_outlives_the_instance(tmp_path):
+    path = str(tmp_path / "nested" / "cache.sqlite3")
+    cache = OracleCache(path)
+    cache.put("vox", ["flamingo"], "m", "Pink")
+    assert cache.warm([("rox", ["square"], "m", 4), ("rox", ["hexagon"], "m", 6)]) == 2
+    cache.close()
+
+    reopened = OracleCache(path)
+    assert reopened.get("vox", ["flamingo"], "m") == "Pink"
+    assert reopened.stats()['disk_hits'] == 1
+    warmed = OracleCache(path, max_memory_entries=2)
+    assert warmed.warm_from_disk() == 2
+    # The two most recent entries are now answered from memory
+    assert warmed.get("rox", ["square"], "m") == 4 and warmed.get("rox", ["hexagon"], "m") == 6
+    assert warmed.stats()['disk_hits'] == 0
+
+def test_default_path_stays_out_of_the_working_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv("ZAB_ORACLE_CACHE", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_path() == str(tmp_path / "zab-bench" / "oracle_cache.sqlite3")
+    monkeypatch.setenv("ZAB_ORACLE_CACHE", "off")
+    assert default_cache_path() is None
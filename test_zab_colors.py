@@ -0,0 +1,23 @@
+import zab
+from zab import Zab
+from zab_colors import BIM_COLORS, LOX_TABLE, snap_color
+
+def test_snapping():
+    assert snap_color("  navy. ") == "Navy"
+    assert snap_color("grey") == "Gray"
+    assert snap_color("#FF0000") == "Red"
+    assert snap_color("rgb(0, 0, 250)") == "Blue"
+    assert snap_color("forest green") == "Green"
+    assert snap_color("sunset") is None and snap_color(None) is None
+
+def test_lox_uses_the_midpoint_table(monkeypatch):
+    monkeypatch.setattr(zab, "_ask_oracle", lambda *args: "unused")
+    assert all(LOX_TABLE[i][i] == i for i in range(len(BIM_COLORS)))
+    assert Zab(10, bim="Black").call_function("lox", "white").bim == "Gray"
+    assert Zab(10, bim="Red").call_function("lox", "#ffff00").bim == "Orange"
+
+def test_lox_asks_the_oracle_only_for_unknown_words(monkeypatch):
+    asked = []
+    monkeypatch.setattr(zab, "_ask_oracle", lambda func, args, prompt, model: asked.append(func) or "Blue")
+    assert Zab(10, bim="Blue").call_function("lox", "ocean").bim == "Blue"
+    assert asked == ["color"]
@@ -0,0 +1,67 @@
+import threading
+
+import zab
+import zab_knowledge
+from zab import Zab
+from zab_cache import OracleCache
+from zab_knowledge import KnowledgeBase, default_overlay_path
+
+def test_lookup_normalizes_names(tmp_path):
+    knowledge = KnowledgeBase(overlay_path=str(tmp_path / "overlay.tsv"))
+    assert knowledge.lookup("animal", "Spiders", "count") == 8
+    assert knowledge.lookup("animal", "the African elephants", "color") == "Gray"
+    assert knowledge.lookup("animal", "flamingoe", "color") == "Pink"
+    assert knowledge.lookup("shape", "17-gon", "count") == 17
+    assert knowledge.lookup("shape", "circle", "count") == 0
+    assert knowledge.lookup("animal", "zorblax", "count") is None
+
+def test_oracle_answers_are_written_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(zab, "knowledge", KnowledgeBase(overlay_path=str(tmp_path / "overlay.tsv")))
+    monkeypatch.setattr(zab, "oracle_cache", OracleCache(str(tmp_path / "cache.sqlite3")))
+    asked = []
+    monkeypatch.setattr(zab.model_provider, "respond", lambda model, prompt: asked.append(prompt) or "6")
+    assert Zab(10).call_function("rox", "square").pim == 5
+    assert asked == []
+    assert Zab(10).call_function("rox", "zorblaxagon").pim == 7
+    assert Zab(10).call_function("rox", "Zorblaxagons").pim == 7
+    assert len(asked) == 1
+    assert KnowledgeBase(overlay_path=str(tmp_path / "overlay.tsv")).lookup("shape", "zorblaxagon", "count") == 6
+
+def test_only_known_modifiers_are_dropped(tmp_path):
+    knowledge = KnowledgeBase(overlay_path=str(tmp_path / "overlay.tsv"))
+    assert knowledge.resolve("animal", "sea horse")[0] == "seahorse"
+    assert knowledge.resolve("animal", "baby African elephants")[0] == "elephant"
+    assert knowledge.resolve("shape", "red squares")[0] == "square"
+    assert knowledge.resolve("animal", "sea lion") is None
+    assert knowledge.resolve("animal", "horsefly") is None
+
+def test_names_tolerate_concurrent_overlay_writes(tmp_path):
+    knowledge = KnowledgeBase(overlay_path=str(tmp_path / "overlay.tsv"))
+    writer = threading.Thread(target=lambda: [knowledge.remember("animal", f"zorblax {i}", "count", i)
+                                              for i in range(300)])
+    writer.start()
+    while writer.is_alive():
+        knowledge._names.clear()
+        knowledge.names("animal")
+    writer.join()
+    assert "zorblax 299" in knowledge.names("animal")
+
+def test_overlay_defaults_to_the_cache_directory(tmp_path, monkeypatch):
+    monkeypatch.delenv("ZAB_KNOWLEDGE_OVERLAY", raising=False)
+    monkeypatch.delenv("ZAB_ORACLE_CACHE", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert default_overlay_path() == str(tmp_path / "xdg" / "zab-bench" / "knowledge_overlay.tsv")
+    monkeypatch.setenv("ZAB_ORACLE_CACHE", str(tmp_path / "run" / "cache.sqlite3"))
+    assert default_overlay_path() == str(tmp_path / "run" / "knowledge_overlay.tsv")
+
+def test_overlay_is_written_outside_the_lock(tmp_path, monkeypatch):
+    knowledge = KnowledgeBase(overlay_path=str(tmp_path / "new" / "overlay.tsv"))
+    held = []
+
+    def checked_open(*args, **kwargs):
+        held.append(knowledge.lock.locked())
+        return open(*args, **kwargs)
+    monkeypatch.setattr(zab_knowledge, "open", checked_open, raising=False)
+    knowledge.remember("animal", "zorblat", "count", 6)
+    assert held == [False]
+    assert KnowledgeBase(overlay_path=knowledge.overlay_path).lookup("animal", "zorblats", "count") == 6
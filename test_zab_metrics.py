@@ -0,0 +1,17 @@
+from zab_metrics import MetricsRegistry
+from zab_mock import LatencyModel
+
+def test_game_results_carry_phase_timings_and_tokens(mock_game):
+    game = mock_game(3, latency=LatencyModel("fixed", 0.01))
+    game.metrics.registry = registry = MetricsRegistry()
+    metrics = game.play_game()['metrics']
+    assert [turn['turn'] for turn in metrics['turns']] == [1, 2, 3, "final"]
+    first = metrics['turns'][0]
+    assert first['model_s'] >= 0.01 and first['ttft_s'] == 0.01 and first['outcome'] == "valid"
+    assert first['prompt_tokens'] > 0 and not metrics['totals']['estimated_tokens']
+    assert 0 < metrics['totals']['model_share'] <= 1
+
+    text = registry.render({'zab_live_games': 2})
+    assert 'zab_turns_total{model="mock",outcome="valid"} 3' in text
+    assert 'zab_phase_seconds_count{model="mock",phase="model"} 3' in text
+    assert "zab_live_games 2.0" in text
@@ -0,0 +1,22 @@
+import openai
+import pytest
+
+from zab_game_oai import ZabGameOAI
+from zab_mock import CycleStrategy, MockBackend, MockOpenAIServer
+
+def test_in_process_client_plays_a_game():
+    backend = MockBackend(CycleStrategy(), seed=0)
+    results = ZabGameOAI(6, client=backend.client(), available_functions=["fin", "plox", "tox"],
+                         seed=0, verbose=False).play_game()
+    assert all(turn['success'] for turn in results['turns'])
+    assert {turn['action'] for turn in results['turns']} == {"fin", "plox", "tox"}
+    assert backend.stats['requests'] == 7
+
+def test_http_server_rate_limits():
+    with MockOpenAIServer(MockBackend(requests_per_minute=2)) as server:
+        client = openai.OpenAI(base_url=server.base_url, api_key="mock", max_retries=0)
+        for _ in range(2):
+            client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}])
+        with pytest.raises(openai.RateLimitError) as error:
+            client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}])
+        assert error.value.response.headers["x-ratelimit-remaining-requests"] == "0"
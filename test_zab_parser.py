@@ -0,0 +1,45 @@
+from zab_parser import ActionParser, parse_args
+
+def test_last_valid_call_outside_scratchpad():
+    parser = ActionParser(["fin", "lox", "plox"])
+    result = parser.parse('Try Fin() first. <scratch>Lox(red) is a theory</scratch> Now LOX( "green" ), foo(2)')
+    assert result.action() == ("lox", ["green"])
+    assert result.scratchpad == "Lox(red) is a theory"
+    assert result.unknown_calls == ["foo"]
+    assert result.valid_calls == 2
+
+def test_no_action():
+    result = ActionParser(["fin"]).parse("I am thinking <scratch>notes")
+    assert result.action() == (None, None)
+    assert result.scratchpad is None
+    assert "unclosed <scratch> tag" in result.diagnostics
+
+def test_typed_arguments():
+    assert parse_args("") == []
+    assert parse_args(" 4 ") == [4]
+    assert parse_args('"4"') == [4]
+    assert parse_args('"a, b", -3, cat') == ["a, b", -3, "cat"]
+
+def test_streamed_response_completeness():
+    parser = ActionParser(["fin", "plox"])
+    assert not parser.is_complete("<scratch>maybe fin()\nreverses")
+    assert not parser.is_complete("<scratch>theory</scratch>\nplox(3")
+    assert not parser.is_complete("<scratch>theory</scratch>\nplox(3)")
+    assert parser.is_complete("<scratch>theory</scratch>\nplox(3)\n")
+    assert not parser.is_complete("fin()\nstill thinking")
+
+def test_streamed_checks_match_whole_text_checks():
+    parser = ActionParser(["fin", "plox"])
+    responses = [
+        "<scratch>theory: plox(2) adds\n</scratch>\nI will call plox(3)\nbecause",
+        "Thinking (aloud) first. <scratch>fin() reverses?</scratch> then fin()\n",
+        "xfin()\n<scratch>a</scratch>\nplox( 4 )\nok",
+    ]
+    for response in responses:
+        check = parser.completion_check()
+        streamed = [check(response[:end]) for end in range(1, len(response) + 1)]
+        assert streamed == [parser.is_complete(response[:end]) for end in range(1, len(response) + 1)]
+        assert streamed[-1]
+    # A retried request starts the text over
+    check = parser.completion_check()
+    assert check("<scratch>a</scratch>\nfin()\n") and not check("<scratch>")
@@ -0,0 +1,21 @@
+from zab import Zab
+from zab_prompts import PromptBuilder
+
+def test_every_turn_shares_the_static_prefix():
+    prompts = PromptBuilder(["fin", "plox"], 5)
+    zab = Zab(5)
+    first = prompts.messages(prompts.turn_prompt(zab, 0, ""))
+    zab = zab.call_function("plox", 3)
+    second = prompts.messages(prompts.turn_prompt(zab, 1, "plox adds?"))
+    assert first[0] == second[0] and first[0]["role"] == "system"
+    assert "plox adds?" in second[1]["content"] and "plox adds?" not in second[0]["content"]
+
+def test_multi_turn_prompts_report_only_new_history():
+    prompts = PromptBuilder(["fin", "plox"], 5, multi_turn=True)
+    zab = Zab(5)
+    zab = zab.call_function("fin")
+    prompt = prompts.turn_prompt(zab, 1, "")
+    assert "fin()" in prompt
+    prompts.record(prompt, "fin()")
+    assert "No new actions since the last turn." in prompts.turn_prompt(zab, 2, "")
+    assert len(prompts.messages("next")) == 4
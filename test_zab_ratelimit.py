@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from zab_backends import ModelBackend
+from zab_mock import MockError, MockRateLimitError
+from zab_ratelimit import ModelLimits, ModelRequestFailed, RequestScheduler, parse_duration
+
+def test_headers_shape_the_buckets():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    limits = ModelLimits()
+    limits.observe({'x-ratelimit-limit-requests': "60", 'x-ratelimit-remaining-requests': "0",
+                    'x-ratelimit-reset-requests': "2s"})
+    assert limits.reserve() >= 1.0
+
+def test_header_limits_keep_the_process_share():
+    limits = ModelLimits(requests_per_minute=15, processes=4)
+    limits.observe({'x-ratelimit-limit-requests': "60", 'x-ratelimit-remaining-requests': "60",
+                    'x-ratelimit-limit-tokens': "40000"})
+    assert limits.buckets["requests"].capacity == 15
+    assert limits.buckets["tokens"].capacity == 10000
+
+def test_retries_transient_errors_with_backoff():
+    sleeps = []
+    scheduler = RequestScheduler(max_retries=3, seed=0, sleep=sleeps.append)
+    errors = [MockRateLimitError("slow down", retry_after=2.0), MockError("boom")]
+
+    def send():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    assert scheduler.call("model", send) == "ok"
+    assert scheduler.stats['retries'] == 2 and scheduler.stats['rate_limited'] == 1
+    assert sleeps[0] >= 2.0
+
+    def bad_request():
+        raise ValueError("not retryable")
+    with pytest.raises(ModelRequestFailed) as error:
+        scheduler.call("model", bad_request)
+    assert error.value.attempts == 1
+
+def test_hedge_answers_a_stalled_request():
+    scheduler = RequestScheduler(hedge_after=0.05)
+    calls = []
+
+    def send():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+    assert scheduler.call("model", send) == "fast"
+    assert scheduler.stats['hedge_wins'] == 1
+
+class HangingBackend(ModelBackend):
+    """Answers at once, except to "hang", which it sits on until released"""
+
+    def __init__(self, scheduler):
+        super().__init__(max_concurrent=1, scheduler=scheduler)
+        self.released = threading.Event()
+
+    def _complete(self, model_name, messages, params):
+        if messages[0]["content"] == "hang":
+            self.released.wait(5)
+        return "ok"
+
+def test_abandoned_attempts_give_back_their_slot():
+    backend = HangingBackend(RequestScheduler(max_retries=0, timeout=0.1))
+    try:
+        for _ in range(3):
+            with pytest.raises(ModelRequestFailed):
+                backend.respond("model", "hang")
+        # The hung requests still hold worker threads, but no longer the only concurrency slot
+        started = time.monotonic()
+        assert backend.respond("model", "hello") == "ok"
+        assert time.monotonic() - started < 0.1
+    finally:
+        backend.released.set()
+
+def test_failed_requests_are_recorded_as_failed_turns(mock_game):
+    scheduler = RequestScheduler(max_retries=1, sleep=lambda s: None)
+    results = mock_game(3, scheduler=scheduler, error_rate=1.0).play_game()
+    assert results['failed_turns'] == 3
+    assert all(turn['error'] and turn['response'] is None for turn in results['turns'])
+    assert results['final_analysis'] is None and results['final_error']
+
+def test_queued_attempts_do_not_time_out_before_they_start():
+    scheduler = RequestScheduler(max_retries=0, timeout=0.3, max_threads=1)
+
+    def send():
+        time.sleep(0.2)
+        return "ok"
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        # Each waits up to 0.4s for the single thread, but only its own 0.2s counts against the timeout
+        answers = list(pool.map(lambda _: scheduler.call("model", send), range(3)))
+    assert answers == ["ok"] * 3 and scheduler.stats['failed'] == 0
@@ -0,0 +1,35 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import zab
+from zab_cache import OracleCache
+from zab_game_oai import ZabGameOAI
+from zab_replay import GameRecorder, GameReplayer, ReplayMismatch, results_digest
+
+def fake_client(responses):
+    def create(**kwargs):
+        content = "done" if "final analysis" in kwargs["messages"][-1]["content"] else next(responses)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def test_record_and_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr(zab, "oracle_cache", OracleCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(zab.model_provider, "respond", lambda model, prompt: "Purple")
+    responses = itertools.cycle(['Lox("blue")', "Fin()", "Rox(square)"])
+    game = ZabGameOAI(6, client=fake_client(responses), available_functions=["fin", "rox", "lox"], verbose=False)
+    log = str(tmp_path / "game.jsonl")
+    results = GameRecorder(log).play(game)
+
+    # Replay must not reach the model at all
+    monkeypatch.setattr(zab.model_provider, "respond", None)
+    assert results_digest(GameReplayer(log).play()) == results_digest(results)
+
+    changed = GameReplayer(log).build_game()
+    changed.prompts.conversation[0]["content"] += " (reworded)"
+    with pytest.raises(ReplayMismatch):
+        GameReplayer(log).play(changed)
+    changed = GameReplayer(log).build_game()
+    changed.prompts.conversation[0]["content"] += " (reworded)"
+    assert GameReplayer(log, strict=False).play(changed)['final_state'] == results['final_state']
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from zab_scheduler import GameScheduler, QueueFullError
+
+def test_position_callbacks_run_outside_the_scheduler_lock():
+    scheduler = GameScheduler(max_workers=1, max_queue=4, per_key_limit=None)
+    release = threading.Event()
+    lock_free = []
+
+    def probe():
+        if scheduler.condition.acquire(timeout=1):
+            scheduler.condition.release()
+            lock_free.append(True)
+        else:
+            lock_free.append(False)
+
+    def on_position(position):
+        # Another thread must be able to take the lock while the callback runs
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+
+    scheduler.submit("a", release.wait, on_position=on_position)
+    scheduler.submit("b", lambda: None, on_position=on_position)
+    release.set()
+    scheduler.shutdown(wait=True, cancel_pending=False, timeout=5)
+    assert lock_free and all(lock_free)
+    assert scheduler.stats()['completed'] == 2
+
+def test_per_key_limit_and_full_queue():
+    scheduler = GameScheduler(max_workers=2, max_queue=3, per_key_limit=1)
+    release = threading.Event()
+    started = []
+    job_started = threading.Semaphore(0)
+
+    def job(name):
+        def run():
+            started.append(name)
+            job_started.release()
+            release.wait(5)
+        return run
+
+    assert scheduler.submit("a1", job("a1"), key="a") == 0
+    assert scheduler.submit("a2", job("a2"), key="a") == 1  # a worker is free, but key "a" is at its limit
+    assert scheduler.submit("b1", job("b1"), key="b") == 0
+    assert job_started.acquire(timeout=5) and job_started.acquire(timeout=5)
+    assert sorted(started) == ["a1", "b1"] and scheduler.position("a2") == 1
+    assert scheduler.submit("a3", job("a3"), key="a") == 2
+    scheduler.submit("a4", job("a4"), key="a")
+    with pytest.raises(QueueFullError):
+        scheduler.submit("a5", job("a5"), key="a")
+    release.set()
+    scheduler.shutdown(wait=True, cancel_pending=False, timeout=5)
+    assert sorted(started) == ["a1", "a2", "a3", "a4", "b1"]
@@ -0,0 +1,28 @@
+from zab import Zab
+from zab_scoring import extract_guesses, parse_history_entry, score_transcript
+
+def make_result(analysis):
+    zab = Zab(3).call_function("fin").call_function("plox", 4).call_function("tox")
+    return {
+        'selected_functions': ["fin", "plox", "tox"],
+        'history': list(zab.history),
+        'final_analysis': analysis,
+    }
+
+def test_history_round_trip():
+    zab = Zab(3).call_function("plox", 4)
+    assert parse_history_entry(zab.history[0]) == (("Cama", "Red", 1), "plox", (4,), ("Cama", "Red", 5))
+
+def test_extract_guesses():
+    guesses = extract_guesses("- **Fin**: reverses the name\n- `plox(n)` - adds to pim\nTox doubles pim.",
+                              ["fin", "plox", "tox"])
+    assert guesses["fin"] == "reverses the name"
+    assert guesses["plox"] == "adds to pim"
+    assert guesses["tox"] == "doubles pim."
+
+def test_scores_correct_and_wrong_guesses():
+    right = score_transcript(make_result("- fin: reverses the name\n- plox: adds the number to pim\n- tox: doubles pim"))
+    assert right['score'] == 1.0
+    wrong = score_transcript(make_result("- fin: doubles pim\n- plox: resets everything\n- tox: no idea"))
+    assert wrong['score'] == 0.0
+    assert wrong['functions']['fin']['hypotheses'] == ["double_pim"]
@@ -0,0 +1,23 @@
+from zab import Zab
+from zab_search import StateSpace, probe_plan, shortest_path
+
+def test_shortest_path_reaches_the_target():
+    path = shortest_path(["fin", "tox", "plox", "mox"], ("Cama", "Red", 1), (None, "Blue", 37))
+    zab = Zab(10)
+    for func_name, args in path:
+        zab = zab.call_function(func_name, *args)
+    assert (zab.bim, zab.pim) == ("Blue", 37)
+    assert len(path) == 5
+    assert shortest_path(["fin", "sox"], ("Cama", "Red", 1), ("Cama", "Blue", None)) is None
+
+def test_exploration_layers_are_disjoint():
+    space = StateSpace(["fin", "tox", "plox", "hin"], max_pim=50)
+    exploration = space.explore(("Cama", "Red", 1), 6)
+    keys = [key for layer in exploration.layers for key in layer.tolist()]
+    assert len(keys) == len(set(keys)) == len(exploration)
+    assert all(abs(pim) <= 50 for _, _, pim in exploration.states(6))
+
+def test_probe_plan_pins_down_each_function():
+    plan = probe_plan(["tox", "plox", "fin", "lox"])
+    assert plan['remaining'] == {'tox': ["double_pim"], 'plox': ["add_input"], 'fin': ["reverse_name"],
+                                 'lox': ["mix_color"]}
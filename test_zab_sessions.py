@@ -0,0 +1,45 @@
+import time
+
+from zab_sessions import GameSessionStore
+
+class FakeCapture:
+    def __init__(self, is_complete=False):
+        self.is_complete = is_complete
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def to_dict(self):
+        return {'is_complete': self.is_complete}
+
+def test_watched_games_are_not_cancelled_as_idle():
+    store = GameSessionStore(idle_ttl=0.05, sweep_interval=0)
+    watched, abandoned = FakeCapture(), FakeCapture()
+    store.add("watched", {'game': None, 'output_capture': watched})
+    store.add("abandoned", {'game': None, 'output_capture': abandoned})
+    for _ in range(4):
+        time.sleep(0.02)
+        store.touch("watched")  # what an open /game_events stream does
+        store.sweep()
+    assert not watched.cancelled and abandoned.cancelled
+
+def test_finished_games_expire_or_are_evicted_oldest_first():
+    store = GameSessionStore(max_finished_games=2, finished_ttl=0.05, sweep_interval=0)
+    store.add("stale", {'game': None, 'output_capture': FakeCapture(is_complete=True)})
+    time.sleep(0.1)
+    for name in ("old", "middle", "new"):
+        store.add(name, {'game': None, 'output_capture': FakeCapture(is_complete=True)})
+    store.add("running", {'game': None, 'output_capture': FakeCapture()})
+    assert "stale" not in store  # past its TTL
+    assert list(store.sessions) == ["middle", "new", "running"]  # "old" was least recently used
+    assert store.evicted == 2
+
+def test_evicted_games_are_spilled_and_reloaded(tmp_path):
+    store = GameSessionStore(max_finished_games=0, sweep_interval=0, spill_dir=str(tmp_path),
+                             restore=lambda data: FakeCapture(**data))
+    store.add("done", {'game': object(), 'output_capture': FakeCapture(is_complete=True)})
+    store.sweep(force=True)
+    assert "done" not in store.sessions and store.spilled == 1
+    entry = store.get("done")
+    assert entry['game'] is None and entry['output_capture'].is_complete
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from zab_backends import MockModelBackend
+from zab_mock import CycleStrategy, MockBackend
+from zab_scheduler import GameScheduler
+from zab_sessions import GameSessionStore
+from zab_web_server import GameOutputCapture, WebZabGame, app
+
+def play_turns(capture, count):
+    for i in range(count):
+        capture.start_new_turn(i + 1, count)
+        capture.add_step(f"response {i}", "llm_response")
+        capture.set_game_state({'turn': i + 1, 'total_turns': count}, [f"entry {i}"])
+        capture.complete_current_turn()
+
+def test_game_state_events_carry_only_new_history():
+    capture = GameOutputCapture()
+    play_turns(capture, 3)
+    states = [event['data'] for event in capture.events if event['type'] == 'game_state']
+    assert [state['history_added'] for state in states] == [["entry 0"], ["entry 1"], ["entry 2"]]
+    assert all('history' not in state for state in states)
+    assert capture.game_state['history'] == ["entry 0", "entry 1", "entry 2"]
+
+def test_spilled_transcripts_replay_the_event_log():
+    capture = GameOutputCapture()
+    play_turns(capture, 2)
+    capture.set_final_analysis({'llm_analysis': "fin reverses"})
+    capture.mark_complete()
+    data = capture.to_dict()
+    assert list(data) == ['events']
+    restored = GameOutputCapture.from_dict(data)
+    assert restored.turns == capture.turns
+    assert restored.game_state == capture.game_state
+    assert restored.final_analysis == capture.final_analysis and restored.is_complete
+    assert restored.events == capture.events and all(
+        event['data']['turn']['steps'] == [] for event in restored.events if event['type'] == 'turn_start')
+
+def test_a_game_started_paused_waits_before_its_first_turn():
+    capture = GameOutputCapture(turn_delay=0, paused=True)
+    game = WebZabGame(total_turns=2, api_key="unused", output_capture=capture)
+    game.backend = MockModelBackend(MockBackend(CycleStrategy(), sleep=lambda s: None), max_batch_size=1)
+    runner = threading.Thread(target=game.play_game, daemon=True)
+    runner.start()
+    try:
+        time.sleep(0.1)
+        assert capture.turns == []
+        capture.request_step()
+        with capture.condition:
+            capture.condition.wait_for(lambda: len(capture.turns) == 1 and capture.turns[0]['is_complete'], 5)
+        time.sleep(0.1)
+        assert len(capture.turns) == 1  # held again before turn 2
+        capture.set_paused(False)
+        runner.join(5)
+        assert len(capture.turns) == 2 and capture.is_complete
+    finally:
+        capture.cancel()
+
+@pytest.fixture
+def client(monkeypatch):
+    import zab_web_server
+    store = GameSessionStore(sweep_interval=0)
+    monkeypatch.setattr(zab_web_server, "game_sessions", store)
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        client.store = store
+        yield client
+
+def watch(client, capture):
+    client.store.add("game", {'game': None, 'output_capture': capture})
+    with client.session_transaction() as browser_session:
+        browser_session['game_id'] = "game"
+
+def finished_capture(turns=2):
+    capture = GameOutputCapture()
+    play_turns(capture, turns)
+    capture.mark_complete()
+    return capture
+
+def test_event_stream_resumes_after_last_event_id(client):
+    capture = finished_capture()
+    watch(client, capture)
+    body = client.get("/game_events", headers={'Last-Event-ID': "5"}).get_data(as_text=True)
+    ids = [int(line[4:]) for line in body.splitlines() if line.startswith("id: ")]
+    assert ids == list(range(6, len(capture.events) + 1))
+    assert "event: complete" in body
+
+def test_game_status_cursor_and_etag(client):
+    capture = finished_capture()
+    watch(client, capture)
+    full = client.get("/game_status")
+    assert full.status_code == 200 and full.json['version'] == len(capture.events)
+    assert client.get("/game_status", headers={'If-None-Match': full.headers['ETag']}).status_code == 304
+    assert client.get(f"/game_status?cursor={len(capture.events)}").status_code == 304
+    update = client.get("/game_status?cursor=3").json
+    assert update['events'] == capture.events[3:] and update['is_complete']
+
+def test_start_game_is_refused_when_the_queue_is_full(client, monkeypatch):
+    import zab_web_server
+    scheduler = GameScheduler(max_workers=1, max_queue=0)
+    monkeypatch.setattr(zab_web_server, "game_scheduler", scheduler)
+    response = client.post("/start_game", json={'api_key': "unused", 'total_turns': 1})
+    assert response.status_code == 429 and not response.json['success']
+    assert len(client.store) == 0  # the refused game does not hold a session
+    scheduler.shutdown()
+
+def test_turn_delay_ends_early_on_step_or_fast_mode():
+    capture = GameOutputCapture(turn_delay=5)
+    for wake in (capture.request_step, lambda: capture.set_fast_mode(True)):
+        timer = threading.Timer(0.05, wake)
+        timer.start()
+        start = time.time()
+        capture.wait_for_next_turn()
+        assert time.time() - start < 1
+    start = time.time()
+    capture.wait_for_next_turn()  # fast mode skips the delay altogether
+    assert time.time() - start < 0.1
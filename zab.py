@@ -1,13 +1,185 @@
-import lmstudio as lms
-from typing import Dict, Callable
+import sys
+from collections.abc import Sequence
+from contextvars import ContextVar
+from typing import Dict, Callable, List
+from zab_cache import OracleCache
+from zab_colors import BIM_COLORS, lox_index, snap_color_index
+from zab_knowledge import knowledge, parse_answer
+from zab_models import model_provider
+
+ORACLE_MODEL = "gemma-3-12b-it-qat"
+
+# Zabs store a bim as an index into the BIM_COLORS palette (see zab_colors)
+BIM_INDEX = {color.lower(): i for i, color in enumerate(BIM_COLORS)}
+
+def bim_to_index(bim) -> int:
+    """Map a palette color name (case-insensitive) or index to its palette index"""
+    if isinstance(bim, int):
+        if not 0 <= bim < len(BIM_COLORS):
+            raise ValueError(f"bim index out of range: {bim}")
+        return bim
+    try:
+        return BIM_INDEX[bim.strip().lower()]
+    except (AttributeError, KeyError):
+        raise ValueError(f"Unknown bim color: {bim!r}") from None
+
+# Shared cache for LLM oracle answers (stin, unknown rox shapes and vox/box animals, unknown lox color words)
+oracle_cache = OracleCache()
+
+# Per-context wrapper around oracle answers, used to record and replay games (see zab_replay)
+oracle_hook: ContextVar = ContextVar("oracle_hook", default=None)
+
+def ask_oracle(func_name: str, args, prompt: str, model_name: str = ORACLE_MODEL) -> str:
+    """Answer an oracle question, letting the current hook observe or replace the answer"""
+    hook = oracle_hook.get()
+    if hook is not None:
+        return hook(func_name, args, prompt, model_name, _ask_oracle)
+    return _ask_oracle(func_name, args, prompt, model_name)
+
+# Oracle questions the knowledge table can answer: (kind, field) looked up by the first argument
+KNOWLEDGE_QUESTIONS = {"rox": ("shape", "count"), "vox": ("animal", "color"),
+                       "box_color": ("animal", "color"), "box_legs": ("animal", "count")}
+
+def _ask_oracle(func_name: str, args, prompt: str, model_name: str = ORACLE_MODEL) -> str:
+    """Answer an oracle question from the knowledge table, then the cache, and only then the model"""
+    question = KNOWLEDGE_QUESTIONS.get(func_name)
+    if question is not None:
+        known = knowledge.lookup(question[0], args[0], question[1])
+        if known is not None:
+            return str(known)
+    cached = oracle_cache.get(func_name, args, model_name)
+    if cached is not None:
+        return cached
+    answer = str(model_provider.respond(model_name, prompt)).strip()
+    oracle_cache.put(func_name, args, model_name, answer)
+    if question is not None:
+        knowledge.remember(question[0], args[0], question[1], parse_answer(question[1], answer))
+    return answer
+
+class HistoryEntry:
+    """One transition in a zab's history; nodes are shared between successive zabs"""
+    __slots__ = ("parent", "old", "func_name", "args", "new", "length", "_text")
+
+    def __init__(self, parent, old, func_name, args, new):
+        self.parent = parent  # previous HistoryEntry or None
+        self.old = old  # (name, bim, pim) before the call
+        self.func_name = func_name
+        self.args = args
+        self.new = new  # (name, bim, pim) after the call
+        self.length = parent.length + 1 if parent is not None else 1
+        self._text = None
+
+    def __str__(self):
+        # Formatted only when a prompt or the UI asks for it
+        if self._text is None:
+            if self.args:
+                func_call = f"{self.func_name}({', '.join(str(arg) for arg in self.args)})"
+            else:
+                func_call = f"{self.func_name}()"
+            old_state = f"(name: {self.old[0]}, bim: {self.old[1]}, pim: {self.old[2]})"
+            new_state = f"(name: {self.new[0]}, bim: {self.new[1]}, pim: {self.new[2]})"
+            self._text = f"{old_state} -> {func_call} -> {new_state}"
+        return self._text
+
+    __repr__ = __str__
+
+class ZabHistory(Sequence):
+    """Read-only list-like view of a zab's history, oldest entry first"""
+    __slots__ = ("tail",)
+
+    def __init__(self, tail=None):
+        self.tail = tail
+
+    def __len__(self):
+        return self.tail.length if self.tail is not None else 0
+
+    def entries(self):
+        """Return the HistoryEntry nodes, oldest first"""
+        nodes = []
+        node = self.tail
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        nodes.reverse()
+        return nodes
+
+    def __iter__(self):
+        for node in self.entries():
+            yield str(node)
+
+    def __reversed__(self):
+        node = self.tail
+        while node is not None:
+            yield str(node)
+            node = node.parent
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [str(node) for node in self.entries()[index]]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        # Walk back from the tail; recent entries are the common case
+        node = self.tail
+        for _ in range(length - 1 - index):
+            node = node.parent
+        return str(node)
+
+    def __eq__(self, other):
+        if isinstance(other, (ZabHistory, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
 
 class Zab:
-    def __init__(self, turns, name = "Cama", bim = "Red", pim = 1):
-        self.turns = turns
-        self.name = name
-        self.bim = bim  # color string
-        self.pim = pim  # nonzero integer
-        self.history = []
+    """Immutable zab state; bim is stored as an index into BIM_COLORS"""
+    __slots__ = ("turns", "name", "bim_index", "pim", "oracle_model", "history_tail")
+
+    def __init__(self, turns, name = "Cama", bim = "Red", pim = 1, oracle_model = ORACLE_MODEL, history_tail = None):
+        init = object.__setattr__
+        init(self, "turns", turns)
+        init(self, "name", sys.intern(name) if type(name) is str else name)
+        init(self, "bim_index", bim_to_index(bim))  # index into BIM_COLORS
+        init(self, "pim", pim)  # nonzero integer
+        init(self, "oracle_model", oracle_model)  # model answering stin/rox/vox/lox/box
+        init(self, "history_tail", history_tail)  # last HistoryEntry, shared with the previous zab
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("Zab is immutable; use call_function to derive a new one")
+
+    def __delattr__(self, attr):
+        raise AttributeError("Zab is immutable; use call_function to derive a new one")
+
+    def __reduce__(self):
+        # Rebuild through __init__, which sets the slots without going through __setattr__
+        return (Zab, (self.turns, self.name, self.bim_index, self.pim, self.oracle_model, self.history_tail))
+
+    def __copy__(self):
+        return self  # immutable, and the history is shared anyway
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"Zab(turns={self.turns!r}, name={self.name!r}, bim={self.bim!r}, pim={self.pim!r})"
+
+    @property
+    def bim(self) -> str:
+        return BIM_COLORS[self.bim_index]
+
+    @property
+    def history(self) -> List[str]:
+        """The history as a plain list of strings, built on each access"""
+        return list(self.history_view)
+
+    @property
+    def history_view(self) -> ZabHistory:
+        """Lazy read-only view of the history, for callers that only need part of it"""
+        return ZabHistory(self.history_tail)
         
     def state(self):
         return f"You are a zab named {self.name} with bim {self.bim} and pim {self.pim}."
@@ -15,30 +187,41 @@ class Zab:
     def call_function(self, func_name: str, *args) -> 'Zab':
         """Call a zab function and return new Zab instance"""
         if func_name in ZabFunctions.registry:
-            # Store old state
-            old_state = f"(name: {self.name}, bim: {self.bim}, pim: {self.pim})"
-            
             # Create new zab
             new_zab = ZabFunctions.registry[func_name](self, *args)
             
-            # Format function call
-            if args:
-                func_call = f"{func_name}({', '.join(str(arg) for arg in args)})"
-            else:
-                func_call = f"{func_name}()"
-            
-            # Store new state
-            new_state = f"(name: {new_zab.name}, bim: {new_zab.bim}, pim: {new_zab.pim})"
-            
-            # Create history entry
-            history_entry = f"{old_state} -> {func_call} -> {new_state}"
-            
-            # Copy history and add new entry
-            new_zab.history = self.history + [history_entry]
+            # Append to the shared history; strings are built lazily
+            history_tail = HistoryEntry(
+                self.history_tail,
+                (self.name, self.bim, self.pim),
+                func_name,
+                args,
+                (new_zab.name, new_zab.bim, new_zab.pim),
+            )
+            object.__setattr__(new_zab, "history_tail", history_tail)
+            object.__setattr__(new_zab, "oracle_model", self.oracle_model)
             
             return new_zab
         raise ValueError(f"Unknown function: {func_name}")
 
+# Plain-language effect of each function, revealed at the end of a game
+FUNCTION_EFFECTS = {
+    "fin": "Reverses the name",
+    "bin": "Changes name to 'bad name, please change me immediately!'",
+    "stin": "Changes name to Spanish translation of the input noun",
+    "hin": "Keeps first N characters of the name",
+    "min": "Changes name to input string without its first character",
+    "tox": "Doubles the pim value",
+    "plox": "Adds the input number (1-10) to pim",
+    "rox": "Adds the number of sides of the shape to pim",
+    "sox": "Changes bim to 'Red'",
+    "vox": "Changes bim to color associated with the input animal",
+    "lox": "Changes bim to intermediate color between current bim and input color",
+    "mox": "Changes bim to ROYGBIV color at position N (1-7)",
+    "hox": "Resets to name='Cama', bim='Red', pim=1",
+    "box": "Changes bim to animal's color, pim to animal's leg count"
+}
+
 class ZabFunctions:
     registry: Dict[str, Callable] = {}
     
@@ -69,10 +252,8 @@ def bin(zab: Zab) -> Zab:
 @ZabFunctions.register("stin")
 def stin(zab: Zab, noun: str) -> Zab:
     # Use LLM for Spanish translation
-    model = lms.llm("gemma-3-12b-it-qat")
     prompt = f"Translate the English noun '{noun}' to Spanish. Respond with only the Spanish word, no explanation."
-    response = model.respond(prompt)
-    spanish_translation = str(response).strip()
+    spanish_translation = ask_oracle("stin", (noun,), prompt, zab.oracle_model)
     return Zab(zab.turns, name=spanish_translation, bim=zab.bim, pim=zab.pim)
 
 @ZabFunctions.register("hin")
@@ -100,25 +281,12 @@ def plox(zab: Zab, n: int) -> Zab:
 
 @ZabFunctions.register("rox")
 def rox(zab: Zab, shape: str) -> Zab:
-    # Map common 2D shapes to their number of sides
-    shape_sides = {
-        "triangle": 3, "square": 4, "rectangle": 4, "rhombus": 4, "parallelogram": 4,
-        "pentagon": 5, "hexagon": 6, "heptagon": 7, "octagon": 8, "nonagon": 9, "decagon": 10,
-        "circle": 0, "ellipse": 0, "oval": 0
-    }
-    
-    shape_lower = shape.lower()
-    if shape_lower in shape_sides:
-        sides = shape_sides[shape_lower]
-    else:
-        # Use LLM for unknown shapes
-        model = lms.llm("gemma-3-12b-it-qat")
-        prompt = f"How many sides does the 2D shape '{shape}' have? Respond with only a number."
-        try:
-            response = model.respond(prompt)
-            sides = int(str(response).strip())
-        except:
-            sides = 0  # Default for unknown shapes
+    # Known shapes come from the knowledge table; the LLM only answers for shapes it lacks
+    prompt = f"How many sides does the 2D shape '{shape}' have? Respond with only a number."
+    try:
+        sides = int(ask_oracle("rox", (shape,), prompt, zab.oracle_model))
+    except:
+        sides = 0  # Default for unknown shapes
     
     return Zab(zab.turns, name=zab.name, bim=zab.bim, pim=zab.pim + sides)
 
@@ -126,51 +294,28 @@ def rox(zab: Zab, shape: str) -> Zab:
 @ZabFunctions.register("vox")
 def vox(zab: Zab, animal: str) -> Zab:
     # Use LLM to determine animal color
-    model = lms.llm("gemma-3-12b-it-qat")
-    valid_colors = ["Pink", "Crimson", "Brown", "Maroon", "Red", "Salmon", "Coral", "Chocolate", 
-                   "Orange", "Gold", "Ivory", "Yellow", "Olive", "Chartreuse", "Lime", "Green", 
-                   "Aquamarine", "Turquoise", "Azure", "Cyan", "Teal", "Navy", "Blue", "Lavender", 
-                   "Indigo", "Plum", "Violet", "Magenta", "Purple", "Tan", "Beige", "White", 
-                   "Silver", "Gray", "Black"]
-    
-    color_list = ", ".join(valid_colors)
+    color_list = ", ".join(BIM_COLORS)
     prompt = f"What color is most associated with a {animal}? Choose from this list: {color_list}. Respond with only the color name."
     
-    response = model.respond(prompt)
-    color = str(response).strip()
-    # Ensure the color is in our valid list
-    if color not in valid_colors:
-        # Try to find a close match
-        color_lower = color.lower()
-        for valid_color in valid_colors:
-            if valid_color.lower() == color_lower:
-                color = valid_color
-                break
-        else:
-            color = "Brown"  # Default fallback
+    color = snap_color_index(ask_oracle("vox", (animal,), prompt, zab.oracle_model))
+    if color is None:
+        color = "Brown"  # Default fallback
     
     return Zab(zab.turns, name=zab.name, bim=color, pim=zab.pim)
 
 @ZabFunctions.register("lox")
 def lox(zab: Zab, color: str) -> Zab:
-    # Use LLM to find intermediate color
-    model = lms.llm("gemma-3-12b-it-qat")
-    valid_colors = ["Pink", "Crimson", "Brown", "Maroon", "Red", "Salmon", "Coral", "Chocolate", 
-                   "Orange", "Gold", "Ivory", "Yellow", "Olive", "Chartreuse", "Lime", "Green", 
-                   "Aquamarine", "Turquoise", "Azure", "Cyan", "Teal", "Navy", "Blue", "Lavender", 
-                   "Indigo", "Plum", "Violet", "Magenta", "Purple", "Tan", "Beige", "White", 
-                   "Silver", "Gray", "Black"]
-    
-    color_list = ", ".join(valid_colors)
-    prompt = f"What color would be between {zab.bim} and {color}? Choose from this list: {color_list}. Respond with only the color name."
+    # The Lab-space midpoint of the two colors, from a precomputed table
+    target = snap_color_index(color)
+    if target is None:
+        # Only words outside the color vocabulary need the LLM, to name the nearest palette color
+        color_list = ", ".join(BIM_COLORS)
+        prompt = f"Which color from this list is closest to '{color}'? Choose from this list: {color_list}. Respond with only the color name."
+        target = snap_color_index(ask_oracle("color", (color,), prompt, zab.oracle_model))
+    if target is None:
+        return Zab(zab.turns, name=zab.name, bim=zab.bim_index, pim=zab.pim)  # Keep current color if unknown
     
-    response = model.respond(prompt)
-    intermediate_color = str(response).strip()
-    # Ensure the color is in our valid list
-    if intermediate_color not in valid_colors:
-        intermediate_color = zab.bim  # Default to current color if invalid
-    
-    return Zab(zab.turns, name=zab.name, bim=intermediate_color, pim=zab.pim)
+    return Zab(zab.turns, name=zab.name, bim=lox_index(zab.bim_index, target), pim=zab.pim)
 
 @ZabFunctions.register("mox")
 def mox(zab: Zab, i: int) -> Zab:
@@ -195,30 +340,20 @@ def box(zab: Zab, animal: str) -> Zab:
     # But that's backwards - bim should be color, pim should be integer
     # Following the spec literally would be inconsistent, so interpreting as:
     # bim = predominant color, pim = number of legs
-    model = lms.llm("gemma-3-12b-it-qat")
     
     # Get number of legs
     legs_prompt = f"How many legs does a {animal} have? Respond with only a number."
     try:
-        response = model.respond(legs_prompt)
-        legs = int(str(response).strip())
+        legs = int(ask_oracle("box_legs", (animal,), legs_prompt, zab.oracle_model))
     except:
         legs = 4  # Default
     
     # Get predominant color
-    valid_colors = ["Pink", "Crimson", "Brown", "Maroon", "Red", "Salmon", "Coral", "Chocolate", 
-                   "Orange", "Gold", "Ivory", "Yellow", "Olive", "Chartreuse", "Lime", "Green", 
-                   "Aquamarine", "Turquoise", "Azure", "Cyan", "Teal", "Navy", "Blue", "Lavender", 
-                   "Indigo", "Plum", "Violet", "Magenta", "Purple", "Tan", "Beige", "White", 
-                   "Silver", "Gray", "Black"]
-    
-    color_list = ", ".join(valid_colors)
+    color_list = ", ".join(BIM_COLORS)
     color_prompt = f"What is the predominant color of a {animal}? Choose from this list: {color_list}. Respond with only the color name."
     
-    response = model.respond(color_prompt)
-    color = str(response).strip()
-    # Ensure the color is in our valid list
-    if color not in valid_colors:
+    color = snap_color_index(ask_oracle("box_color", (animal,), color_prompt, zab.oracle_model))
+    if color is None:
         color = "Brown"  # Default fallback
     
     return Zab(zab.turns, name=zab.name, bim=color, pim=legs)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Callable, Dict, List, Optional
+
+from zab_metrics import Completion
+from zab_ratelimit import Attempt, RequestTimeout, current_attempt, default_scheduler, detached, estimate_tokens
+
+class BackendTimeout(TimeoutError):
+    """Raised when a backend request takes longer than the backend's timeout"""
+
+def prompt_messages(prompt) -> List[Dict[str, str]]:
+    """Chat messages for a plain prompt string"""
+    return [{"role": "user", "content": str(prompt)}]
+
+def render_messages(messages) -> str:
+    """Flatten chat messages into one prompt for text-completion endpoints"""
+    if len(messages) == 1 and messages[0]["role"] == "user":
+        return messages[0]["content"]
+    return "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages) + "\n\nAssistant:"
+
+def batch_completions(prompts, texts, usage) -> List[Completion]:
+    """Completions for a batched response, splitting its usage totals by prompt and answer length"""
+    if usage is None:
+        return [Completion(text) for text in texts]
+
+    def shares(total, parts):
+        if total is None:
+            return [None] * len(parts)
+        weights = [len(part) or 1 for part in parts]
+        counts = [total * weight // sum(weights) for weight in weights]
+        counts[-1] += total - sum(counts)  # the shares add up to what the server reported
+        return counts
+    prompt_tokens = shares(getattr(usage, "prompt_tokens", None), prompts)
+    completion_tokens = shares(getattr(usage, "completion_tokens", None), texts)
+    return [Completion(text, p, c) for text, p, c in zip(texts, prompt_tokens, completion_tokens)]
+
+class _PendingRequest:
+    __slots__ = ("messages", "done", "result", "error")
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class RequestBatcher:
+    """Coalesces concurrent requests for the same model and parameters into batched backend calls.
+
+    The first request of a batch waits up to `window` seconds for company; a batch that
+    reaches `max_batch_size` is sent at once by the request that filled it.
+    """
+
+    def __init__(self, backend: "ModelBackend", max_batch_size: int = 8, window: float = 0.005):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.pending: Dict[tuple, List[_PendingRequest]] = {}
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, model_name: str, messages, params: Dict) -> Completion:
+        key = (model_name, json.dumps(params, sort_keys=True))
+        item = _PendingRequest(messages)
+        batch = None
+        with self.lock:
+            queue = self.pending.setdefault(key, [])
+            queue.append(item)
+            leader = len(queue) == 1
+            if len(queue) >= self.max_batch_size:
+                batch = self.pending.pop(key)
+        if batch is None and leader:
+            time.sleep(self.window)
+            with self.lock:
+                # Unless a full batch already went out with this request in it, send what has gathered
+                if item in self.pending.get(key, ()):
+                    batch = self.pending.pop(key)
+        if batch is not None:
+            self._run(model_name, batch, params)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _run(self, model_name, batch, params):
+        with self.lock:
+            self.batches += 1
+            self.requests += len(batch)
+        try:
+            # The batch answers other requests too, so it must not stop with the one that sent it
+            with detached():
+                results = self.backend.complete_batch(model_name, [item.messages for item in batch], **params)
+            for item, result in zip(batch, results):
+                item.result = result
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+
+class ModelBackend:
+    """A place to send chat requests, with a concurrency cap, a timeout and optional batching.
+
+    Requests go through a zab_ratelimit.RequestScheduler (rate limits, retries, hedging).
+    Subclasses implement _complete (one request) and, when the server can take several
+    prompts in one request, _complete_batch with supports_batching = True.
+    """
+    name = "base"
+    supports_batching = False
+
+    def __init__(self, max_concurrent: Optional[int] = None, timeout: Optional[float] = None,
+                 max_batch_size: int = 1, batch_window: float = 0.005, scheduler=None):
+        self.timeout = timeout  # seconds per request (None: no limit)
+        self.scheduler = scheduler or default_scheduler()
+        self._slots = None
+        self.set_max_concurrent(max_concurrent)
+        self.batcher = None
+        if self.supports_batching and max_batch_size > 1:
+            self.batcher = RequestBatcher(self, max_batch_size, batch_window)
+
+    def set_max_concurrent(self, max_concurrent: Optional[int]):
+        """Limit how many requests (or batches) may be in flight at once (None for no limit)"""
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def _limited(self, call, *args):
+        slots = self._slots
+        if slots is None:
+            return call(*args)
+        attempt = current_attempt()
+        if attempt is None:
+            with slots:
+                return call(*args)
+        slots.acquire()
+        once = threading.Lock()
+
+        def release():
+            if once.acquire(blocking=False):
+                slots.release()
+        # An attempt the scheduler gave up on hands its slot back at once, not when the server answers
+        attempt.on_cancel(release)
+        try:
+            if attempt.cancelled.is_set():
+                raise RequestTimeout("Abandoned before it was sent")
+            return call(*args)
+        finally:
+            release()
+
+    def respond(self, model_name: str, prompt, **params) -> Completion:
+        """Answer a plain prompt string"""
+        return self.complete(model_name, prompt_messages(prompt), **params)
+
+    def complete(self, model_name: str, messages, **params) -> Completion:
+        """Answer one chat request; raises ModelRequestFailed once the scheduler gives up"""
+        return self.scheduler.call(model_name, lambda: self._send(model_name, messages, params),
+                                   estimate_tokens(messages, params))
+
+    def stream(self, model_name: str, messages, on_chunk=None, stop=None, **params) -> Completion:
+        """Answer one chat request piece by piece.
+
+        on_chunk(text, offset) gets each new piece and its position in the answer; a retried
+        request starts over at offset 0. Generation is cut short once stop(text so far) is true.
+        """
+        attempts = itertools.count(1)
+        current = [0]
+
+        def send():
+            attempt = current[0] = next(attempts)
+            scheduled = current_attempt()
+            text = ""
+
+            def emit(piece):
+                nonlocal text
+                # A retry supersedes this attempt: stop reading it and keep it out of the output
+                if current[0] != attempt or (scheduled is not None and scheduled.cancelled.is_set()):
+                    return False
+                if on_chunk is not None:
+                    on_chunk(piece, len(text))
+                text += piece
+                return stop is None or not stop(text)
+            return self._limited(self._stream, model_name, messages, params, emit)
+        return self.scheduler.call(model_name, send, estimate_tokens(messages, params), hedge=False)
+
+    def _stream(self, model_name: str, messages, params: Dict, emit) -> Completion:
+        # Backends without streaming hand over the whole answer as one piece
+        completion = self._complete(model_name, messages, params)
+        emit(str(completion))
+        return completion
+
+    def _send(self, model_name, messages, params):
+        # Coalesce with concurrent requests when batching is on
+        if self.batcher is not None:
+            return self.batcher.submit(model_name, messages, params)
+        return self._limited(self._complete, model_name, messages, params)
+
+    def complete_batch(self, model_name: str, batch, **params) -> List[Completion]:
+        """Answer several chat requests, in one server request where the backend supports it"""
+        if self.supports_batching:
+            return self._limited(self._complete_batch, model_name, batch, params)
+        workers = min(len(batch), self.max_concurrent or len(batch)) or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda messages: self.complete(model_name, messages, **params), batch))
+
+    def _complete(self, model_name: str, messages, params: Dict) -> Completion:
+        raise NotImplementedError
+
+    def _complete_batch(self, model_name: str, batch, params: Dict) -> List[Completion]:
+        return [self._complete(model_name, messages, params) for messages in batch]
+
+    def stats(self) -> Dict:
+        stats = {'backend': self.name, 'max_concurrent': self.max_concurrent, 'timeout': self.timeout,
+                 'scheduler': dict(self.scheduler.stats)}
+        if self.batcher is not None:
+            stats.update(batches=self.batcher.batches, batched_requests=self.batcher.requests)
+        return stats
+
+    def reset(self):
+        """Drop any cached connections or model handles"""
+
+class LMStudioBackend(ModelBackend):
+    """Local models through the lmstudio SDK, one lazily created handle per model"""
+    name = "lmstudio"
+
+    def __init__(self, max_concurrent: Optional[int] = None, timeout: Optional[float] = None,
+                 factory: Optional[Callable[[str], object]] = None, scheduler=None):
+        super().__init__(max_concurrent, timeout, scheduler=scheduler)
+        self.factory = factory  # creates a handle with respond(); defaults to lmstudio.llm
+        self._handles: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def handle(self, model_name: str):
+        """Return the handle for model_name, creating it on first use"""
+        handle = self._handles.get(model_name)
+        if handle is None:
+            with self._lock:
+                handle = self._handles.get(model_name)
+                if handle is None:
+                    if self.factory is None:
+                        import lmstudio as lms
+                        self.factory = lms.llm
+                    handle = self.factory(model_name)
+                    self._handles[model_name] = handle
+        return handle
+
+    def _complete(self, model_name, messages, params):
+        attempt = current_attempt()
+        if self.timeout is None:
+            return self._respond(model_name, messages, attempt)
+        # The SDK has no per-request timeout, so wait on a worker thread instead
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent or 32,
+                                                        thread_name_prefix="zab-lmstudio")
+        attempt = attempt or Attempt()
+        future = self._executor.submit(self._respond, model_name, messages, attempt)
+        try:
+            return future.result(self.timeout)
+        except FuturesTimeout:
+            attempt.cancel()
+            raise BackendTimeout(f"{model_name} did not answer within {self.timeout}s") from None
+
+    def _respond(self, model_name, messages, attempt=None):
+        handle = self.handle(model_name)
+        if attempt is None:
+            return self._completion(handle.respond(self._history(messages)))
+        # Streamed so that an abandoned attempt can stop the generation
+        prediction = handle.respond_stream(self._history(messages))
+        attempt.on_cancel(prediction.cancel)
+        return self._completion(prediction.wait_for_result())
+
+    @staticmethod
+    def _history(messages):
+        if len(messages) == 1 and messages[0]["role"] == "user":
+            return messages[0]["content"]
+        import lmstudio as lms
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        chat = lms.Chat(system) if system else lms.Chat()
+        for message in messages:
+            if message["role"] == "user":
+                chat.add_user_message(message["content"])
+            elif message["role"] == "assistant":
+                chat.add_assistant_response(message["content"])
+        return chat
+
+    def _stream(self, model_name, messages, params, emit):
+        started = time.perf_counter()
+        prediction = self.handle(model_name).respond_stream(self._history(messages))
+        pieces, ttft = [], None
+        for fragment in prediction:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            pieces.append(fragment.content)
+            if not emit(fragment.content):
+                prediction.cancel()
+                return Completion("".join(pieces), ttft=ttft)
+        completion = self._completion(prediction.result())
+        if completion.ttft is None:
+            completion.ttft = ttft
+        return completion
+
+    @staticmethod
+    def _completion(result):
+        # lmstudio prediction results carry token counts and time to first token in .stats
+        stats = getattr(result, "stats", None)
+        return Completion(str(result), getattr(stats, "prompt_tokens_count", None),
+                          getattr(stats, "predicted_tokens_count", None),
+                          ttft=getattr(stats, "time_to_first_token_sec", None))
+
+    def reset(self):
+        with self._lock:
+            self._handles.clear()
+
+class OpenAICompatibleBackend(ModelBackend):
+    """OpenAI or any server speaking its API (vLLM, llama.cpp, LM Studio's server, the mock server).
+
+    With native_batch=True, batches go out as one /v1/completions request with a list of
+    prompts, which vLLM-style servers run as a single batch.
+    """
+    name = "openai"
+
+    def __init__(self, client=None, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 max_concurrent: Optional[int] = None, timeout: Optional[float] = 120.0,
+                 native_batch: bool = False, max_batch_size: int = 8, batch_window: float = 0.005, scheduler=None):
+        self.supports_batching = native_batch
+        super().__init__(max_concurrent, timeout, max_batch_size, batch_window, scheduler)
+        if client is None:
+            import openai
+            client = openai.OpenAI(base_url=base_url, api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                                   timeout=timeout, max_retries=0)
+        self.client = client
+
+    def _create(self, endpoint, model_name, **request):
+        attempt = current_attempt()
+        if attempt is not None and attempt.deadline is not None:
+            # The HTTP client gives up when the scheduler does, instead of holding a thread until its own timeout
+            request.setdefault("timeout", max(attempt.remaining(), 0.001))
+        # The raw response carries the x-ratelimit headers the scheduler paces by
+        raw = getattr(endpoint, "with_raw_response", None)
+        if raw is None:
+            return endpoint.create(model=model_name, **request)
+        response = raw.create(model=model_name, **request)
+        self.scheduler.observe(model_name, response.headers)
+        return response.parse()
+
+    def _complete(self, model_name, messages, params):
+        response = self._create(self.client.chat.completions, model_name, messages=messages, **params)
+        return Completion.from_openai(response.choices[0].message.content, getattr(response, "usage", None))
+
+    def _stream(self, model_name, messages, params, emit):
+        started = time.perf_counter()
+        stream = self._create(self.client.chat.completions, model_name, messages=messages, stream=True,
+                              stream_options={"include_usage": True}, **params)
+        pieces, usage, ttft = [], None, None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage  # sent in a last chunk with no choices
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if not piece:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                pieces.append(piece)
+                if not emit(piece):
+                    break  # closing the stream stops generation on the server
+        finally:
+            stream.close()
+        return Completion.from_openai("".join(pieces), usage, ttft)
+
+    def _complete_batch(self, model_name, batch, params):
+        params = dict(params)
+        if "max_completion_tokens" in params:
+            params["max_tokens"] = params.pop("max_completion_tokens")
+        prompts = [render_messages(m) for m in batch]
+        response = self._create(self.client.completions, model_name, prompt=prompts, **params)
+        texts = [""] * len(batch)
+        for choice in response.choices:
+            texts[choice.index] = choice.text.strip()
+        return batch_completions(prompts, texts, getattr(response, "usage", None))
+
+class MockModelBackend(ModelBackend):
+    """zab_mock.MockBackend behind the backend interface; batches share one latency draw"""
+    name = "mock"
+    supports_batching = True
+
+    def __init__(self, mock=None, max_concurrent: Optional[int] = None, timeout: Optional[float] = None,
+                 max_batch_size: int = 8, batch_window: float = 0.005, scheduler=None):
+        from zab_mock import MockBackend
+        super().__init__(max_concurrent, timeout, max_batch_size, batch_window, scheduler)
+        self.mock = mock or MockBackend.from_env()
+
+    def _complete(self, model_name, messages, params):
+        return self._complete_batch(model_name, [messages], params)[0]
+
+    def _complete_batch(self, model_name, batch, params):
+        from zab_mock import count_tokens, messages_text
+        prompts = [messages_text(messages) for messages in batch]
+        for _ in prompts:
+            self.mock.admit()
+        self.scheduler.observe(model_name, self.mock.rate_limit_headers())
+        texts = [self.mock.reply(prompt) for prompt in prompts]
+        # A batching server pays the first-token latency once, then generates the longest answer
+        with self.mock.lock:
+            first_token = self.mock.latency.first_token(self.mock.rng)
+        delay = first_token + max(count_tokens(text) for text in texts) * self.mock.latency.per_token()
+        if self.timeout is not None and delay > self.timeout:
+            self.mock.sleep(self.timeout)
+            raise BackendTimeout(f"Mock request took longer than {self.timeout}s")
+        self.mock.sleep(delay)
+        return [Completion(text, count_tokens(prompt), count_tokens(text), ttft=first_token)
+                for prompt, text in zip(prompts, texts)]
+
+    def _stream(self, model_name, messages, params, emit):
+        from zab_mock import count_tokens, messages_text
+        prompt = messages_text(messages)
+        started = time.perf_counter()
+        pieces = self.mock.stream(prompt)  # admits the request and counts its tokens in the mock's stats
+        sent, ttft = [], None
+        try:
+            for piece in pieces:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    self.scheduler.observe(model_name, self.mock.rate_limit_headers())
+                sent.append(piece)
+                if not emit(piece):
+                    break
+        finally:
+            pieces.close()
+        text = "".join(sent)
+        return Completion(text, count_tokens(prompt), count_tokens(text), ttft=ttft)
+
+BACKENDS = {
+    "lmstudio": LMStudioBackend,
+    "openai": OpenAICompatibleBackend,
+    "mock": MockModelBackend,
+}
+
+def backend_from_env() -> ModelBackend:
+    """Default backend for the oracle and local games, chosen by ZAB_MODEL_BACKEND"""
+    kind = os.getenv("ZAB_MODEL_BACKEND", "lmstudio")
+    max_concurrent = int(os.getenv("ZAB_MAX_CONCURRENT_INFERENCE", "0")) or None
+    timeout = float(os.getenv("ZAB_BACKEND_TIMEOUT", "0")) or None
+    batch_size = int(os.getenv("ZAB_BATCH_SIZE", "8"))
+    if kind == "openai":
+        return OpenAICompatibleBackend(base_url=os.getenv("ZAB_BACKEND_URL"), max_concurrent=max_concurrent,
+                                       timeout=timeout or 120.0, native_batch=os.getenv("ZAB_NATIVE_BATCH") == "1",
+                                       max_batch_size=batch_size)
+    if kind == "mock":
+        return MockModelBackend(max_concurrent=max_concurrent, timeout=timeout, max_batch_size=batch_size)
+    if kind != "lmstudio":
+        raise ValueError(f"Unknown ZAB_MODEL_BACKEND: {kind} (expected one of {', '.join(BACKENDS)})")
+    return LMStudioBackend(max_concurrent=max_concurrent, timeout=timeout)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from zab import Zab, BIM_COLORS, bim_to_index
+from zab_colors import LOX_ARRAY, snap_colors
+from zab_knowledge import knowledge
+
+NAME_DTYPE = np.dtypes.StringDType()
+BIM_ARRAY = np.array(BIM_COLORS, dtype=NAME_DTYPE)
+INT64_LIMIT = 2**62  # pims above this switch to exact Python ints
+
+class ZabBatch:
+    """Struct-of-arrays batch of zab states: names, bim indices and pims"""
+
+    def __init__(self, names, bims, pims, turns=10):
+        self.names = np.asarray(names, dtype=NAME_DTYPE)
+        bims = np.asarray(bims)
+        if bims.dtype.kind not in "iu":
+            bims = np.array([bim_to_index(b) for b in bims.tolist()])
+        self.bims = bims.astype(np.int8)
+        self.pims = _as_pims(pims)
+        self.turns = turns
+        if not len(self.names) == len(self.bims) == len(self.pims):
+            raise ValueError("names, bims and pims must have the same length")
+
+    @classmethod
+    def from_zabs(cls, zabs: Sequence[Zab]) -> 'ZabBatch':
+        turns = zabs[0].turns if len(zabs) else 10
+        return cls([z.name for z in zabs], np.array([z.bim_index for z in zabs], dtype=np.int8),
+                   [z.pim for z in zabs], turns)
+
+    @classmethod
+    def repeat(cls, zab: Zab, n: int) -> 'ZabBatch':
+        """A batch of n copies of one zab"""
+        return cls(np.full(n, zab.name, dtype=NAME_DTYPE), np.full(n, zab.bim_index, dtype=np.int8),
+                   np.full(n, zab.pim, dtype=np.int64), zab.turns)
+
+    def to_zabs(self) -> List[Zab]:
+        return [Zab(self.turns, name=str(name), bim=int(bim), pim=int(pim))
+                for name, bim, pim in zip(self.names, self.bims, self.pims)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def bim_names(self) -> np.ndarray:
+        return BIM_ARRAY[self.bims]
+
+    def replace(self, names=None, bims=None, pims=None) -> 'ZabBatch':
+        """Return a new batch sharing the unchanged columns"""
+        new = object.__new__(ZabBatch)
+        new.names = self.names if names is None else names
+        new.bims = self.bims if bims is None else bims
+        new.pims = self.pims if pims is None else pims
+        new.turns = self.turns
+        return new
+
+    def apply(self, func_name: str, *args) -> 'ZabBatch':
+        """Apply one function to every state; args may be scalars or per-state arrays"""
+        if func_name not in BatchFunctions.registry:
+            raise ValueError(f"No batch implementation for function: {func_name}")
+        return BatchFunctions.registry[func_name](self, *args)
+
+    def apply_sequence(self, calls: Iterable[Tuple]) -> 'ZabBatch':
+        """Apply (func_name, *args) calls in order"""
+        batch = self
+        for func_name, *args in calls:
+            batch = batch.apply(func_name, *args)
+        return batch
+
+def _as_pims(pims) -> np.ndarray:
+    pims = np.asarray(pims)
+    if pims.dtype == object:
+        return pims
+    if pims.dtype.kind not in "iu":
+        raise ValueError("pim must be an integer")
+    return pims.astype(np.int64)
+
+def _widen(pims: np.ndarray, limit: int = INT64_LIMIT) -> np.ndarray:
+    """Fall back to Python ints before int64 arithmetic could overflow"""
+    if pims.dtype != object and len(pims) and np.abs(pims).max() >= limit:
+        return pims.astype(object)
+    return pims
+
+def _check(condition, message: str):
+    if not np.all(condition):
+        raise ValueError(message)
+
+class BatchFunctions:
+    registry: Dict[str, Callable] = {}
+
+    @classmethod
+    def register(cls, name: str):
+        def decorator(func):
+            cls.registry[name] = func
+            return func
+        return decorator
+
+def _known(batch: ZabBatch, kind: str, values, field: str) -> np.ndarray:
+    # Knowledge table answers per state; names the table lacks need the oracle, which batches do not call
+    values = np.asarray(values, dtype=object)
+    answers = {value: knowledge.lookup(kind, value, field) for value in set(values.ravel().tolist())}
+    _check([answer is not None for answer in answers.values()], f"{kind} must be in the knowledge table")
+    if field == "color":
+        answers = {value: bim_to_index(answer) for value, answer in answers.items()}
+    known = np.array([answers[value] for value in values.ravel().tolist()], dtype=np.int64).reshape(values.shape)
+    return np.broadcast_to(known, batch.pims.shape)
+
+def _constant_names(batch: ZabBatch, name) -> np.ndarray:
+    return np.broadcast_to(np.asarray(name, dtype=NAME_DTYPE), batch.names.shape).copy()
+
+@BatchFunctions.register("fin")
+def fin(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(names=np.strings.slice(batch.names, None, None, -1))
+
+@BatchFunctions.register("tox")
+def tox(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(pims=_widen(batch.pims) * 2)
+
+@BatchFunctions.register("sox")
+def sox(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(bims=np.full(len(batch), BIM_COLORS.index("Red"), dtype=np.int8))
+
+@BatchFunctions.register("bin")
+def _bin(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(names=_constant_names(batch, "bad name, please change me immediately!"))
+
+@BatchFunctions.register("hin")
+def hin(batch: ZabBatch, n) -> ZabBatch:
+    n = np.asarray(n)
+    _check(n > 0, "n must be positive")
+    return batch.replace(names=np.strings.slice(batch.names, 0, n))
+
+@BatchFunctions.register("min")
+def _min(batch: ZabBatch, string) -> ZabBatch:
+    strings = np.broadcast_to(np.asarray(string, dtype=NAME_DTYPE), batch.names.shape)
+    _check(np.strings.str_len(strings) > 0, "string must be non-empty")
+    new_names = np.strings.slice(strings, 1, None)
+    new_names = np.where(np.strings.str_len(new_names) > 0, new_names, "unnamed").astype(NAME_DTYPE)
+    return batch.replace(names=new_names)
+
+@BatchFunctions.register("plox")
+def plox(batch: ZabBatch, n) -> ZabBatch:
+    n = np.asarray(n)
+    _check((1 <= n) & (n <= 10), "n must be between 1 and 10")
+    return batch.replace(pims=_widen(batch.pims) + n)
+
+@BatchFunctions.register("rox")
+def rox(batch: ZabBatch, shape) -> ZabBatch:
+    return batch.replace(pims=_widen(batch.pims) + _known(batch, "shape", shape, "count"))
+
+@BatchFunctions.register("mox")
+def mox(batch: ZabBatch, i) -> ZabBatch:
+    i = np.asarray(i)
+    _check((1 <= i) & (i <= 7), "i must be between 1 and 7")
+    roygbiv = np.array([bim_to_index(c) for c in ["Red", "Orange", "Yellow", "Green", "Blue", "Indigo", "Violet"]],
+                       dtype=np.int8)
+    return batch.replace(bims=np.broadcast_to(roygbiv[i - 1], batch.bims.shape).copy())
+
+@BatchFunctions.register("lox")
+def lox(batch: ZabBatch, color) -> ZabBatch:
+    colors = np.asarray(color, dtype=object)
+    targets = np.broadcast_to(snap_colors(colors.ravel()).reshape(colors.shape), batch.bims.shape)
+    # Colors outside the vocabulary need the oracle, which batches do not call
+    _check(targets >= 0, "color must be a known color word, hex code or rgb()")
+    return batch.replace(bims=LOX_ARRAY[batch.bims, targets])
+
+@BatchFunctions.register("vox")
+def vox(batch: ZabBatch, animal) -> ZabBatch:
+    return batch.replace(bims=_known(batch, "animal", animal, "color").astype(np.int8))
+
+@BatchFunctions.register("hox")
+def hox(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(names=_constant_names(batch, "Cama"),
+                         bims=np.full(len(batch), BIM_COLORS.index("Red"), dtype=np.int8),
+                         pims=np.ones(len(batch), dtype=np.int64))
+
+@BatchFunctions.register("box")
+def box(batch: ZabBatch, animal) -> ZabBatch:
+    return batch.replace(bims=_known(batch, "animal", animal, "color").astype(np.int8),
+                         pims=_known(batch, "animal", animal, "count").copy())
+
+@BatchFunctions.register("vin")
+def vin(batch: ZabBatch) -> ZabBatch:
+    return batch
+
+@BatchFunctions.register("cin")
+def cin(batch: ZabBatch) -> ZabBatch:
+    return batch.replace(names=_constant_names(batch, "Cama"))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from zab import ORACLE_MODEL, oracle_cache
+from zab_scoring import score_transcript
+
+def build_matrix(models, function_sets, turn_counts, seeds) -> List[Dict]:
+    """Expand the sweep options into one config per game"""
+    return [
+        {'model_name': model, 'functions': list(functions), 'total_turns': turns, 'seed': seed}
+        for model, functions, turns, seed in itertools.product(models, function_sets, turn_counts, seeds)
+    ]
+
+def create_game(config, backend="openai", oracle_model=ORACLE_MODEL, client=None):
+    """Create a quiet game for one sweep config"""
+    if backend in ("lmstudio", "mock"):
+        from zab_game import ZabGame
+        # client is the shared model backend here (None: the process-wide provider)
+        return ZabGame(config['total_turns'], config['model_name'], oracle_model=oracle_model,
+                       available_functions=config['functions'], seed=config['seed'], verbose=False, backend=client)
+    from zab_game_oai import ZabGameOAI
+    return ZabGameOAI(config['total_turns'], config['model_name'], oracle_model=oracle_model, client=client,
+                      available_functions=config['functions'], seed=config['seed'], verbose=False)
+
+def token_usage(result) -> Dict:
+    """Token totals and the share of game time spent waiting on the model"""
+    totals = result.get('metrics', {}).get('totals', {})
+    return {key: totals.get(key) for key in ('prompt_tokens', 'completion_tokens', 'model_share')}
+
+def score_game(result) -> Dict:
+    """Cheap per-game scoring from the structured turn log"""
+    turns = result['turns']
+    executed = [turn for turn in turns if turn['success']]
+    failed = [turn for turn in turns if turn.get('error')]  # the model request failed, not the model
+    selected = set(result['selected_functions'])
+    tried = {turn['action'] for turn in executed}
+    return {
+        'valid_actions': len(executed),
+        'invalid_turns': len(turns) - len(executed) - len(failed),
+        'failed_turns': len(failed),
+        'functions_tried': sorted(tried),
+        'coverage': len(tried & selected) / len(selected) if selected else 0.0,
+        'analysis_score': score_transcript(result)['score'],
+        **token_usage(result),
+    }
+
+def run_one(config, backend="openai", oracle_model=ORACLE_MODEL, client=None) -> Dict:
+    """Play one game and return its JSONL record"""
+    started = time.time()
+    record = {'config': config, 'backend': backend}
+    try:
+        game = create_game(config, backend, oracle_model, client)
+        result = game.play_game()
+        record['result'] = result
+        record['score'] = score_game(result)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['duration_s'] = round(time.time() - started, 3)
+    return record
+
+def aggregate(records) -> List[Dict]:
+    """Summarize records per (model, function set, turns)"""
+    groups: Dict[tuple, List[Dict]] = {}
+    for record in records:
+        config = record['config']
+        key = (config['model_name'], ",".join(config['functions']), config['total_turns'])
+        groups.setdefault(key, []).append(record)
+
+    summary = []
+    for (model, functions, turns), group in sorted(groups.items()):
+        scored = [r['score'] for r in group if 'score' in r]
+        summary.append({
+            'model_name': model,
+            'functions': functions,
+            'total_turns': turns,
+            'games': len(group),
+            'errors': len(group) - len(scored),
+            'mean_coverage': sum(s['coverage'] for s in scored) / len(scored) if scored else None,
+            'mean_valid_actions': sum(s['valid_actions'] for s in scored) / len(scored) if scored else None,
+            'failed_turns': sum(s.get('failed_turns', 0) for s in scored),
+            'prompt_tokens': sum(s.get('prompt_tokens') or 0 for s in scored),
+            'completion_tokens': sum(s.get('completion_tokens') or 0 for s in scored),
+            'mean_analysis_score': sum(s['analysis_score'] for s in scored) / len(scored) if scored else None,
+            'mean_duration_s': sum(r['duration_s'] for r in group) / len(group),
+        })
+    return summary
+
+def print_progress(done, total, record):
+    status = record.get('error', f"coverage={record['score']['coverage']:.2f}" if 'score' in record else "")
+    print(f"[{done}/{total}] {record['config']['model_name']} "
+          f"{','.join(record['config']['functions'])} seed={record['config']['seed']}: {status}")
+
+def run_sweep(configs, output_path, backend="openai", oracle_model=ORACLE_MODEL, workers=8, client=None,
+              progress=True, processes=1) -> List[Dict]:
+    """Run every config on a thread pool, appending each record to output_path as it finishes.
+
+    With processes > 1 the games are spread over that many processes instead (see run_sweep_processes).
+    """
+    if processes > 1:
+        return run_sweep_processes(configs, output_path, backend, oracle_model, processes, workers, progress)
+    if backend == "openai" and client is None:
+        import openai
+        client = openai.OpenAI(max_retries=0)  # one connection pool shared by every game; the scheduler retries
+    elif backend == "mock":
+        from zab_backends import MockModelBackend
+        from zab_models import model_provider
+        client = client or MockModelBackend()
+        model_provider.set_backend(client)  # oracle questions go to the mock as well
+
+    write_lock = threading.Lock()
+    records = []
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_one, config, backend, oracle_model, client) for config in configs]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            records.append(record)
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            if progress:
+                print_progress(done, len(futures), record)
+    return records
+
+# State of one sweep worker process, set up by _init_worker
+_worker: Dict = {}
+
+def _init_worker(output_path, backend, oracle_model, processes, threads, run_id):
+    """Give a sweep process its own model client, a warm cache tier and a shard file"""
+    # One API key's limits are split between the processes, both the configured ones and the server's headers
+    for name in ("ZAB_RATE_LIMIT_RPM", "ZAB_RATE_LIMIT_TPM"):
+        if os.getenv(name):
+            os.environ[name] = str(float(os.environ[name]) / processes)
+    os.environ["ZAB_RATE_LIMIT_PROCESSES"] = str(processes)
+    client = None
+    if backend == "openai":
+        import openai
+        client = openai.OpenAI(max_retries=0)
+    elif backend == "mock":
+        from zab_backends import MockModelBackend
+        from zab_models import model_provider
+        client = MockModelBackend()
+        model_provider.set_backend(client)
+    # The SQLite file is shared by every process; each keeps its own in-memory tier in front of it
+    oracle_cache.warm_from_disk()
+    _worker.update(client=client, backend=backend, oracle_model=oracle_model, threads=threads,
+                   shard=open(f"{output_path}.shard-{run_id}-{os.getpid()}", "a"))
+
+def _run_chunk(configs) -> List[Dict]:
+    """Play a few configs in a worker, writing full records to its shard and returning them without transcripts"""
+    shard = _worker['shard']
+    slim = []
+    with ThreadPoolExecutor(max_workers=_worker['threads']) as pool:
+        for record in pool.map(lambda config: run_one(config, _worker['backend'], _worker['oracle_model'],
+                                                      _worker['client']), configs):
+            shard.write(json.dumps(record) + "\n")
+            shard.flush()
+            slim.append({key: value for key, value in record.items() if key != 'result'})
+    return slim
+
+def merge_shards(output_path, run_id=None) -> int:
+    """Append one run's worker shards to output_path and remove them.
+
+    Without run_id every shard is merged, e.g. to recover the records of an interrupted run;
+    do that only while no other sweep is writing to output_path.
+    """
+    merged = 0
+    pattern = f"{glob.escape(output_path)}.shard-{glob.escape(run_id) + '-' if run_id else ''}*"
+    with open(output_path, "a") as out:
+        for shard_path in sorted(glob.glob(pattern)):
+            with open(shard_path) as shard:
+                for line in shard:
+                    out.write(line)
+                    merged += 1
+            os.remove(shard_path)
+    return merged
+
+def run_sweep_processes(configs, output_path, backend="openai", oracle_model=ORACLE_MODEL, processes=None,
+                        threads=4, progress=True) -> List[Dict]:
+    """Run every config across a process pool, each process playing up to threads games at once.
+
+    Workers write records to per-process shard files, merged into output_path at the end; the
+    returned records omit the transcripts, which is all aggregate needs.
+    """
+    processes = processes or os.cpu_count()
+    # Shards are named per run, so another sweep writing to the same output keeps its own
+    run_id = uuid.uuid4().hex[:8]
+    stale = glob.glob(f"{glob.escape(output_path)}.shard-*")
+    if stale and progress:
+        print(f"Leaving {len(stale)} shard files from other or interrupted runs; merge_shards({output_path!r}) "
+              f"appends them once no sweep is writing there")
+    chunks = [configs[i:i + threads] for i in range(0, len(configs), threads)]
+    records = []
+    # spawn, not fork: the parent may hold SQLite connections and backend threads
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes, initializer=_init_worker,
+                      initargs=(output_path, backend, oracle_model, processes, threads, run_id)) as pool:
+        for chunk in pool.imap_unordered(_run_chunk, chunks):
+            for record in chunk:
+                records.append(record)
+                if progress:
+                    print_progress(len(records), len(configs), record)
+        pool.close()
+        pool.join()  # let workers exit cleanly so their shards are closed before merging
+    merge_shards(output_path, run_id)
+    return records
+
+def main():
+    """Run a benchmark sweep from the command line"""
+    parser = argparse.ArgumentParser(description="Run a headless Zab benchmark sweep")
+    parser.add_argument("--backend", choices=["openai", "lmstudio", "mock"], default="openai")
+    parser.add_argument("--models", nargs="+", required=True)
+    parser.add_argument("--functions", nargs="+", default=["fin,rox,lox"],
+                        help="comma-separated function subsets, e.g. fin,rox,lox plox,tox,lox")
+    parser.add_argument("--turns", nargs="+", type=int, default=[10])
+    parser.add_argument("--seeds", type=int, default=1, help="number of seeds per configuration")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent games (per process with --processes)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="spread games over this many processes, each with --workers threads")
+    parser.add_argument("--oracle-model", default=ORACLE_MODEL)
+    parser.add_argument("--output", default="zab_results.jsonl")
+    parser.add_argument("--summary", help="optional path for the aggregated summary JSON")
+    args = parser.parse_args()
+
+    function_sets = [[f.strip() for f in spec.split(",") if f.strip()] for spec in args.functions]
+    seeds = range(args.seed_start, args.seed_start + args.seeds)
+    configs = build_matrix(args.models, function_sets, args.turns, seeds)
+    print(f"Running {len(configs)} games with {args.workers} workers"
+          f"{f' in each of {args.processes} processes' if args.processes > 1 else ''} -> {args.output}")
+
+    records = run_sweep(configs, args.output, args.backend, args.oracle_model, args.workers,
+                        processes=args.processes)
+    summary = aggregate(records)
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+def cache_dir() -> str:
+    """zab-bench's directory under $XDG_CACHE_HOME or ~/.cache"""
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "zab-bench")
+
+def default_cache_path() -> Optional[str]:
+    """ZAB_ORACLE_CACHE ("off" for memory only), else oracle_cache.sqlite3 in cache_dir()"""
+    path = os.getenv("ZAB_ORACLE_CACHE")
+    if path:
+        return None if path.lower() == "off" else path
+    # Anchored to the user's cache directory, so imports and test runs do not drop a file in the working directory
+    return os.path.join(cache_dir(), "oracle_cache.sqlite3")
+
+DEFAULT_CACHE_PATH = default_cache_path()
+
+def normalize_args(args) -> Tuple:
+    """Normalize oracle arguments so trivially different spellings share an entry"""
+    normalized = []
+    for arg in args:
+        if isinstance(arg, str):
+            normalized.append(" ".join(arg.strip().strip('"\'').lower().split()))
+        else:
+            normalized.append(arg)
+    return tuple(normalized)
+
+def make_key(func_name: str, args, model_name: str) -> str:
+    """Build the cache key for an oracle query"""
+    return json.dumps([func_name, list(normalize_args(args)), model_name])
+
+class OracleCache:
+    """Two-tier cache for LLM oracle answers: an in-memory LRU in front of SQLite"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_entries: int = 10000):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.memory: "OrderedDict[str, Any]" = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def _db(self):
+        """Open the on-disk tier lazily (None when disabled)"""
+        if self.path is None:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Several sweep processes may share the file: wait for each other's writes instead of failing
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS oracle_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, value: Any):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, func_name: str, args, model_name: str) -> Optional[Any]:
+        """Return the cached answer, or None on a miss"""
+        key = make_key(func_name, args, model_name)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+
+            db = self._db()
+            if db is not None:
+                row = db.execute("SELECT value FROM oracle_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, func_name: str, args, model_name: str, value: Any):
+        """Store an answer in both tiers"""
+        key = make_key(func_name, args, model_name)
+        with self.lock:
+            self._remember(key, value)
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO oracle_cache (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value)),
+                )
+                db.commit()
+
+    def warm(self, entries: Iterable[Tuple[str, Iterable, str, Any]]) -> int:
+        """Pre-load (func_name, args, model_name, answer) tuples; returns the number stored"""
+        count = 0
+        with self.lock:
+            db = self._db()
+            for func_name, args, model_name, value in entries:
+                key = make_key(func_name, args, model_name)
+                self._remember(key, value)
+                if db is not None:
+                    db.execute(
+                        "INSERT OR REPLACE INTO oracle_cache (key, value) VALUES (?, ?)",
+                        (key, json.dumps(value)),
+                    )
+                count += 1
+            if db is not None:
+                db.commit()
+        return count
+
+    def warm_from_disk(self, limit: Optional[int] = None) -> int:
+        """Pull the most recent disk entries into the memory tier"""
+        with self.lock:
+            db = self._db()
+            if db is None:
+                return 0
+            limit = limit or self.max_memory_entries
+            rows = db.execute(
+                "SELECT key, value FROM oracle_cache ORDER BY rowid DESC LIMIT ?", (limit,)
+            ).fetchall()
+            for key, value in reversed(rows):
+                self._remember(key, json.loads(value))
+            return len(rows)
+
+    def clear(self, disk: bool = False):
+        """Drop the memory tier (and optionally the disk tier) and reset counters"""
+        with self.lock:
+            self.memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if disk:
+                db = self._db()
+                if db is not None:
+                    db.execute("DELETE FROM oracle_cache")
+                    db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for reporting"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+            }
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import re
+from typing import Iterable, Optional
+
+import numpy as np
+
+# The bim palette from zab.md with CSS sRGB coordinates; zabs store a bim as an index into it
+PALETTE = (
+    ("Pink", (255, 192, 203)), ("Crimson", (220, 20, 60)), ("Brown", (165, 42, 42)),
+    ("Maroon", (128, 0, 0)), ("Red", (255, 0, 0)), ("Salmon", (250, 128, 114)),
+    ("Coral", (255, 127, 80)), ("Chocolate", (210, 105, 30)), ("Orange", (255, 165, 0)),
+    ("Gold", (255, 215, 0)), ("Ivory", (255, 255, 240)), ("Yellow", (255, 255, 0)),
+    ("Olive", (128, 128, 0)), ("Chartreuse", (127, 255, 0)), ("Lime", (0, 255, 0)),
+    ("Green", (0, 128, 0)), ("Aquamarine", (127, 255, 212)), ("Turquoise", (64, 224, 208)),
+    ("Azure", (240, 255, 255)), ("Cyan", (0, 255, 255)), ("Teal", (0, 128, 128)),
+    ("Navy", (0, 0, 128)), ("Blue", (0, 0, 255)), ("Lavender", (230, 230, 250)),
+    ("Indigo", (75, 0, 130)), ("Plum", (221, 160, 221)), ("Violet", (238, 130, 238)),
+    ("Magenta", (255, 0, 255)), ("Purple", (128, 0, 128)), ("Tan", (210, 180, 140)),
+    ("Beige", (245, 245, 220)), ("White", (255, 255, 255)), ("Silver", (192, 192, 192)),
+    ("Gray", (128, 128, 128)), ("Black", (0, 0, 0)),
+)
+BIM_COLORS = tuple(name for name, _ in PALETTE)
+PALETTE_RGB = np.array([rgb for _, rgb in PALETTE], dtype=np.float64)
+
+# Color words outside the palette that models and players commonly use, snapped once at import
+COLOR_WORDS = {
+    "grey": "#808080", "aqua": "#00ffff", "fuchsia": "#ff00ff", "scarlet": "#ff2400", "vermilion": "#e34234",
+    "rose": "#ff007f", "ruby": "#e0115f", "cherry": "#de3163", "burgundy": "#800020", "wine": "#722f37",
+    "rust": "#b7410e", "copper": "#b87333", "bronze": "#cd7f32", "amber": "#ffbf00", "mustard": "#ffdb58",
+    "lemon": "#fff700", "cream": "#fffdd0", "khaki": "#c3b091", "sand": "#c2b280", "peach": "#ffe5b4",
+    "apricot": "#fbceb1", "tangerine": "#f28500", "emerald": "#50c878", "jade": "#00a86b", "mint": "#98ff98",
+    "forest": "#228b22", "sage": "#bcb88a", "seafoam": "#93e9be", "sky": "#87ceeb", "cobalt": "#0047ab",
+    "sapphire": "#0f52ba", "cerulean": "#007ba7", "denim": "#1560bd", "periwinkle": "#ccccff",
+    "lilac": "#c8a2c8", "mauve": "#e0b0ff", "orchid": "#da70d6", "grape": "#6f2da8", "eggplant": "#614051",
+    "charcoal": "#36454f", "slate": "#708090", "ash": "#b2beb5", "snow": "#fffafa", "pearl": "#eae0c8",
+    "bone": "#e3dac9", "chestnut": "#954535", "coffee": "#6f4e37", "mahogany": "#c04000", "ginger": "#b06500",
+    "sepia": "#704214", "blond": "#faf0be", "blonde": "#faf0be", "golden": "#ffd700", "tawny": "#cd5700",
+    "auburn": "#a52a2a", "ochre": "#cc7722", "ebony": "#555d50", "onyx": "#353839", "jet": "#343434",
+    "platinum": "#e5e4e2",
+}
+MODIFIERS = {"light": 20.0, "pale": 25.0, "bright": 10.0, "dark": -25.0, "deep": -20.0}
+HEX_PATTERN = re.compile(r'#?([0-9a-f]{6}|[0-9a-f]{3})')
+RGB_PATTERN = re.compile(r'rgb\s*\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*\)')
+LUT_BITS = 5  # hex snapping table resolution per channel (32768 entries)
+
+def rgb_to_lab(rgb) -> np.ndarray:
+    """CIE Lab (D65) coordinates for an (..., 3) array of sRGB values in 0-255"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                             [0.3575761, 0.7151522, 0.1191920],
+                             [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+PALETTE_LAB = rgb_to_lab(PALETTE_RGB)
+
+def nearest_colors(lab) -> np.ndarray:
+    """Palette index nearest (CIE76 distance) to each row of an (N, 3) Lab array"""
+    lab = np.asarray(lab, dtype=np.float64).reshape(-1, 3)
+    distances = ((lab[:, None, :] - PALETTE_LAB[None, :, :]) ** 2).sum(axis=-1)
+    return distances.argmin(axis=1)
+
+def hex_to_rgb(code: str):
+    code = code.lstrip("#")
+    if len(code) == 3:
+        code = "".join(ch * 2 for ch in code)
+    return tuple(int(code[i:i + 2], 16) for i in (0, 2, 4))
+
+def _build_lox_table():
+    # Lab midpoint of every pair of palette colors, snapped back onto the palette
+    midpoints = (PALETTE_LAB[:, None, :] + PALETTE_LAB[None, :, :]) / 2
+    table = nearest_colors(midpoints).reshape(len(PALETTE), len(PALETTE))
+    return tuple(tuple(int(i) for i in row) for row in table)
+
+# LOX_TABLE[i][j]: palette index of the color between palette colors i and j
+LOX_TABLE = _build_lox_table()
+
+LOX_ARRAY = np.array(LOX_TABLE, dtype=np.int8)  # the same table for vectorized batches
+
+PALETTE_INDEX = {name.lower(): i for i, name in enumerate(BIM_COLORS)}
+_word_labs = rgb_to_lab([hex_to_rgb(code) for code in COLOR_WORDS.values()])
+WORD_LAB = dict(zip(COLOR_WORDS, _word_labs))
+WORD_INDEX = dict(zip(COLOR_WORDS, nearest_colors(_word_labs).tolist()))
+del _word_labs
+
+_hex_lut = None
+
+def hex_lut() -> np.ndarray:
+    """Palette index for every color quantized to LUT_BITS per channel, built on first use"""
+    global _hex_lut
+    if _hex_lut is None:
+        levels = (np.arange(2 ** LUT_BITS) + 0.5) * (256 / 2 ** LUT_BITS)
+        grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1).reshape(-1, 3)
+        _hex_lut = nearest_colors(rgb_to_lab(grid)).astype(np.int8)
+    return _hex_lut
+
+def snap_rgb(rgb) -> int:
+    """Palette index nearest to an sRGB triple, via the quantized lookup table"""
+    shift = 8 - LUT_BITS
+    r, g, b = (int(v) >> shift for v in rgb)
+    return int(hex_lut()[(r << (2 * LUT_BITS)) | (g << LUT_BITS) | b])
+
+def _word_lab(word):
+    if word in PALETTE_INDEX:
+        return PALETTE_LAB[PALETTE_INDEX[word]]
+    return WORD_LAB.get(word)
+
+def snap_color_index(text) -> Optional[int]:
+    """Palette index for a color name, color word, "light/dark <color>", hex code or rgb(), or None"""
+    if not isinstance(text, str):
+        return None
+    word = text.strip().strip(".!\"'").lower()
+    if word in PALETTE_INDEX:
+        return PALETTE_INDEX[word]
+    if word in WORD_INDEX:
+        return WORD_INDEX[word]
+    match = HEX_PATTERN.fullmatch(word)
+    if match and (word.startswith("#") or not word.isalpha()):
+        return snap_rgb(hex_to_rgb(match.group(1)))
+    match = RGB_PATTERN.fullmatch(word)
+    if match:
+        return snap_rgb(min(255, int(v)) for v in match.groups())
+    words = word.replace("-", " ").split()
+    if len(words) == 2 and words[0] in MODIFIERS:
+        lab = _word_lab(words[1])
+        if lab is not None:
+            lab = lab + np.array([MODIFIERS[words[0]], 0.0, 0.0])
+            return int(nearest_colors(lab)[0])
+    if len(words) > 1:
+        # "forest green", "navy blue": the last known word names the hue
+        for w in reversed(words):
+            if w in PALETTE_INDEX or w in WORD_INDEX:
+                return snap_color_index(w)
+    return None
+
+def snap_color(text) -> Optional[str]:
+    """Palette color name for any color text snap_color_index understands, or None"""
+    index = snap_color_index(text)
+    return None if index is None else BIM_COLORS[index]
+
+def snap_colors(texts: Iterable) -> np.ndarray:
+    """Palette indices for many color texts as an int8 array; unknown entries are -1"""
+    return np.array([-1 if (i := snap_color_index(t)) is None else i for t in texts], dtype=np.int8)
+
+def lox_index(bim_index: int, color_index: int) -> int:
+    """Palette index of the color between two palette colors"""
+    return LOX_TABLE[bim_index][color_index]
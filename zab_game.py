@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 
-import lmstudio as lms
+import os
 import random
-import re
-from zab import Zab, ZabFunctions
+from zab import Zab, ZabFunctions, ORACLE_MODEL, FUNCTION_EFFECTS
+from zab_models import model_provider
+from zab_metrics import GameMetrics
+from zab_parser import ActionParser
+from zab_prompts import FUNCTION_DESCRIPTIONS, PromptBuilder
+from zab_ratelimit import ModelRequestFailed
 
 class ZabGame:
-    def __init__(self, total_turns=10, model_name="gemma-3-12b-it-qat"):
+    """One game against a model; the backend decides where the requests go"""
+    default_functions = ["plox", "tox", "lox"]
+    title = "Starting Zab Game!"
+    
+    def __init__(self, total_turns=10, model_name="gemma-3-12b-it-qat", oracle_model=ORACLE_MODEL,
+                 available_functions=None, seed=None, verbose=True, backend=None, multi_turn=False):
         self.total_turns = total_turns
         self.model_name = model_name
-        self.model = lms.llm(model_name)
+        self.oracle_model = oracle_model
+        self.backend = backend or model_provider  # anything with complete(model_name, messages, **params)
+        self.verbose = verbose
         
         # Available functions for the game (subset of all functions)
         # available_functions = [
@@ -18,109 +29,145 @@ class ZabGame:
         #     "sox", "vox", "lox", "mox",          # bim functions
         #     "hox", "box"                         # multi functions
         # ]
-        available_functions = ["plox", "tox", "lox"]
-        
-        # Randomly select 3 functions for this game
-        self.selected_functions = random.sample(available_functions, 3)
-        print(f"Selected functions for this game: {self.selected_functions}")
-        
-        # Create function descriptions (intentionally vague to make it a puzzle)
-        self.function_descriptions = {
-            "fin": "Fin - Takes no parameters\n      - Example: Fin()",
-            "bin": "Bin - Takes no parameters\n      - Example: Bin()",
-            "stin": "Stin - Takes a single noun\n      - Example: Stin(\"cat\")",
-            "hin": "Hin - Takes a positive integer\n      - Example: Hin(3)",
-            "min": "Min - Takes a single word\n      - Example: Min(\"hello\")",
-            "tox": "Tox - Takes no parameters\n      - Example: Tox()",
-            "plox": "Plox - Takes a number from 1-10\n      - Example: Plox(4)",
-            "rox": "Rox - Takes the name of a 2D shape\n      - Example: Rox(\"triangle\")",
-            "sox": "Sox - Takes no parameters\n      - Example: Sox()",
-            "vox": "Vox - Takes the name of an animal\n      - Example: Vox(\"elephant\")",
-            "lox": "Lox - Takes the name of a color\n      - Example: Lox(\"blue\")",
-            "mox": "Mox - Takes a number from 1-7\n      - Example: Mox(3)",
-            "hox": "Hox - Takes no parameters\n      - Example: Hox()",
-            "box": "Box - Takes the name of an animal\n      - Example: Box(\"spider\")"
-        }
+        if available_functions is None:
+            available_functions = self.default_functions
+        
+        # Randomly select 3 functions for this game; a seed is always recorded so it can be replayed
+        self.available_functions = list(available_functions)
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.selected_functions = self.rng.sample(available_functions, min(3, len(available_functions)))
+        self.log(f"Selected functions for this game: {self.selected_functions}")
+        self.parser = ActionParser(self.selected_functions)
+        self.last_parse = None
+        
+        self.function_descriptions = FUNCTION_DESCRIPTIONS
+        # Static rules first, turn state last; multi_turn extends one conversation instead
+        self.prompts = PromptBuilder(self.selected_functions, total_turns, multi_turn)
         
         # Initialize zab and game state
-        self.current_zab = Zab(turns=total_turns)
+        self.current_zab = Zab(turns=total_turns, oracle_model=oracle_model)
         self.current_turn = 0
         self.scratchpad = ""
+        self.turn_log = []  # one record per turn for structured results
+        self.metrics = GameMetrics(model_name)  # phase timings and token counts per turn
+        # Streaming: on_response_chunk(text, offset) sees answers as they are generated, and
+        # stop_early ends a turn's generation once the parser has a scratchpad and an action
+        self.on_response_chunk = None
+        self.stop_early = os.getenv("ZAB_STOP_EARLY") == "1"
         
+    def log(self, text=""):
+        """Print progress output unless the game runs quietly"""
+        if self.verbose:
+            print(text)
+    
+    def record_turn(self, response, func_name, args, success, message, error=None):
+        """Keep a structured record of the turn just played"""
+        self.turn_log.append({
+            'turn': self.current_turn + 1,
+            'response': response,
+            'action': func_name,
+            'args': args,
+            'success': success,
+            'message': message,
+            'diagnostics': self.last_parse.diagnostics if self.last_parse else [],
+            'error': error,  # set when the model request itself failed
+            'state': {
+                'name': self.current_zab.name,
+                'bim': self.current_zab.bim,
+                'pim': self.current_zab.pim
+            }
+        })
+        self.metrics.end_turn("failed" if error else "valid" if success else "invalid")
+    
+    def record_failed_turn(self, error):
+        """Record a turn lost to a failed model request, as opposed to a response without an action"""
+        self.last_parse = None
+        message = f"Model request failed after {error.attempts} attempt(s): {error}"
+        self.log(message)
+        self.record_turn(None, None, None, False, message, error=str(error))
+
+    def get_results(self, final_response, final_error=None):
+        """Collect the finished game into a JSON-serializable dict"""
+        self.metrics.end_game()
+        return {
+            'model_name': self.model_name,
+            'oracle_model': self.oracle_model,
+            'seed': self.seed,
+            'total_turns': self.total_turns,
+            'selected_functions': self.selected_functions,
+            'history': list(self.current_zab.history),
+            'turns': self.turn_log,
+            'scratchpad': self.scratchpad,
+            'final_state': {
+                'name': self.current_zab.name,
+                'bim': self.current_zab.bim,
+                'pim': self.current_zab.pim
+            },
+            'final_analysis': final_response,
+            'final_error': final_error,
+            'failed_turns': sum(1 for turn in self.turn_log if turn['error']),
+            'actual_effects': {func: FUNCTION_EFFECTS[func] for func in self.selected_functions},
+            'metrics': self.metrics.summary(),
+        }
+    
     def get_function_descriptions(self):
         """Get descriptions for the selected functions"""
-        descriptions = []
-        for func in self.selected_functions:
-            descriptions.append(f"    - {self.function_descriptions[func]}")
-        return "\n".join(descriptions)
+        return self.prompts.function_descriptions()
     
     def create_prompt(self):
-        """Create the prompt for the current turn"""
-        history_text = ""
-        if self.current_zab.history:
-            history_text = "\n".join(self.current_zab.history)
-        else:
-            history_text = "No actions taken yet."
-            
-        additional_context = ""
-        if self.current_turn > 0:
-            additional_context = f"\n    \nYour history (the actions you've taken already):\n{history_text}"
-        
-        prompt = f"""You are a Zab.
-As a Zab, you have three qualities: your name is "{self.current_zab.name}", your bim is "{self.current_zab.bim}", and your pim is "{self.current_zab.pim}".
-You have access to the following actions:
-{self.get_function_descriptions()}
+        """Create the turn-specific prompt; the static rules go in the system message"""
+        return self.prompts.turn_prompt(self.current_zab, self.current_turn, self.scratchpad)
+    
+    def request_params(self):
+        """Sampling parameters sent with every request"""
+        return {}
+    
+    def build_request(self, prompt):
+        """Build the chat request for a prompt"""
+        return {"model": self.model_name, "messages": self.prompts.messages(prompt), **self.request_params()}
+    
+    def create_final_prompt(self):
+        """Create the end-of-game analysis prompt"""
+        return f"""The game is now complete! Based on your {self.total_turns} turns of experimentation, please provide your final analysis.
 
-This is turn {self.current_turn + 1}/{self.total_turns}.
+Your final state: {self.current_zab.state()}
 
-You can include private notes in a scratchpad by wrapping them with <scratch></scratch> tags. This information will be preserved across turns.
+Your complete history:
+{chr(10).join(self.current_zab.history) if self.current_zab.history else "No actions were successfully executed."}
 
-Your scratchpad:
+Your final scratchpad:
 {self.scratchpad}
 
-Your goal is to figure out what all the functions do over the course of your turns. At the end, you'll be prompted to make a guess as to what each function does. It is helpful to use your <scratch></scratch> functionality to include working theories so they can be tested later.
-Submit an action after describing your current working theory for what the functions do as well as what your goal is. Include notes you'd like to pass into the future with the <scratch></scratch> tags{additional_context}"""
-        
-        return prompt
+Now, please provide your best guess for what each of the three functions does:
+{chr(10).join([f"- {func}:" for func in self.selected_functions])}
+
+Be specific about how each function affects your name, bim, and pim values."""
+    
+    def get_llm_response(self, prompt, stop=None):
+        """Get response from the model backend; raises ModelRequestFailed when it gives up"""
+        request = self.build_request(prompt)
+        messages = request.pop("messages")
+        model = request.pop("model")
+        if (self.on_response_chunk is not None or stop is not None) and hasattr(self.backend, "stream"):
+            response = self.backend.stream(model, messages, self.on_response_chunk, stop, **request)
+        else:
+            response = self.backend.complete(model, messages, **request)
+        self.metrics.add_usage(messages, response)
+        response = str(response)
+        self.prompts.record(prompt, response)
+        return response
+    
+    def turn_stop(self):
+        """The early-stop check for a turn's response, when stop_early is on"""
+        return self.parser.completion_check() if self.stop_early else None
     
     def parse_action(self, response):
         """Parse the LLM's response to extract the action and update scratchpad"""
-        # Extract scratchpad content
-        scratch_match = re.search(r'<scratch>(.*?)</scratch>', response, re.DOTALL)
-        if scratch_match:
-            self.scratchpad = scratch_match.group(1).strip()
-        
-        # Remove scratchpad content from response before parsing for actions
-        response_without_scratch = re.sub(r'<scratch>.*?</scratch>', '', response, flags=re.DOTALL)
-        
-        # Extract action - look for function calls (find last occurrence)
-        action_patterns = [
-            r'(\w+)\s*\(\s*([^)]*)\s*\)',  # Function(arg) format
-            r'(\w+)\s*\(\s*\)',            # Function() format
-        ]
-        
-        last_valid_action = None, None
-        
-        for pattern in action_patterns:
-            matches = re.findall(pattern, response_without_scratch, re.IGNORECASE)
-            for match in matches:
-                func_name = match[0].lower()
-                if func_name in [f.lower() for f in self.selected_functions]:
-                    # Found a valid function call - store it (last one will be kept)
-                    if len(match) == 2 and match[1]:
-                        # Has arguments
-                        arg_str = match[1].strip().strip('"\'')
-                        # Try to parse as int, otherwise treat as string
-                        try:
-                            arg = int(arg_str)
-                        except ValueError:
-                            arg = arg_str
-                        last_valid_action = func_name, [arg]
-                    else:
-                        # No arguments
-                        last_valid_action = func_name, []
-        
-        return last_valid_action
+        self.last_parse = self.parser.parse(response)
+        if self.last_parse.scratchpad is not None:
+            self.scratchpad = self.last_parse.scratchpad
+        return self.last_parse.action()
     
     def execute_action(self, func_name, args):
         """Execute the parsed action"""
@@ -142,88 +189,79 @@ Submit an action after describing your current working theory for what the funct
     
     def play_turn(self):
         """Play a single turn"""
-        print(f"\n{'='*50}")
-        print(f"TURN {self.current_turn + 1}/{self.total_turns}")
-        print(f"Current state: {self.current_zab.state()}")
-        print(f"{'='*50}")
+        self.log(f"\n{'='*50}")
+        self.log(f"TURN {self.current_turn + 1}/{self.total_turns}")
+        self.log(f"Current state: {self.current_zab.state()}")
+        self.log(f"{'='*50}")
         
-        prompt = self.create_prompt()
-        print(f"\nPrompt sent to LLM:\n{prompt}\n")
+        self.metrics.start_turn(self.current_turn + 1)
+        with self.metrics.phase("prompt"):
+            prompt = self.create_prompt()
+        self.log(f"\nPrompt sent to LLM:\n{prompt}\n")
         
-        response = self.model.respond(prompt)
-        print(f"LLM Response:\n{str(response)}\n")
+        try:
+            with self.metrics.phase("model"):
+                response = self.get_llm_response(prompt, self.turn_stop())
+        except ModelRequestFailed as e:
+            self.record_failed_turn(e)
+            self.current_turn += 1
+            return
+        self.log(f"LLM Response:\n{str(response)}\n")
         
-        func_name, args = self.parse_action(str(response))
+        with self.metrics.phase("parse"):
+            func_name, args = self.parse_action(str(response))
         
         if func_name:
-            success, message = self.execute_action(func_name, args)
-            print(f"Action result: {message}")
+            with self.metrics.phase("execute"):
+                success, message = self.execute_action(func_name, args)
+            self.log(f"Action result: {message}")
             if success:
-                print(f"New state: {self.current_zab.state()}")
+                self.log(f"New state: {self.current_zab.state()}")
         else:
-            print("No valid action found in response. Skipping turn.")
+            success, message = False, "No valid action found in response. Skipping turn."
+            self.log(message)
+        self.record_turn(str(response), func_name, args, success, message)
         
         self.current_turn += 1
         
     def play_game(self):
         """Play the complete game"""
-        print("Starting Zab Game!")
-        print(f"Initial state: {self.current_zab.state()}")
-        print(f"Available functions: {self.selected_functions}")
+        self.log(self.title)
+        self.log(f"Model: {self.model_name}")
+        self.log(f"Initial state: {self.current_zab.state()}")
+        self.log(f"Available functions: {self.selected_functions}")
         
         # Play all turns
         while self.current_turn < self.total_turns:
             self.play_turn()
         
         # Final analysis prompt
-        print(f"\n{'='*50}")
-        print("GAME COMPLETE - FINAL ANALYSIS")
-        print(f"{'='*50}")
+        self.log(f"\n{'='*50}")
+        self.log("GAME COMPLETE - FINAL ANALYSIS")
+        self.log(f"{'='*50}")
         
-        final_prompt = f"""The game is now complete! Based on your {self.total_turns} turns of experimentation, please provide your final analysis.
-
-Your final state: {self.current_zab.state()}
-
-Your complete history:
-{chr(10).join(self.current_zab.history) if self.current_zab.history else "No actions were successfully executed."}
-
-Your final scratchpad:
-{self.scratchpad}
-
-Now, please provide your best guess for what each of the three functions does:
-{chr(10).join([f"- {func}:" for func in self.selected_functions])}
-
-Be specific about how each function affects your name, bim, and pim values."""
+        final_prompt = self.create_final_prompt()
         
-        print(f"Final analysis prompt:\n{final_prompt}\n")
+        self.log(f"Final analysis prompt:\n{final_prompt}\n")
         
-        final_response = self.model.respond(final_prompt)
-        print(f"LLM's final analysis:\n{str(final_response)}")
+        self.metrics.start_turn("final")
+        try:
+            with self.metrics.phase("final"):
+                final_response, final_error = str(self.get_llm_response(final_prompt)), None
+        except ModelRequestFailed as e:
+            final_response, final_error = None, str(e)
+        self.metrics.end_turn()
+        self.log(f"LLM's final analysis:\n{final_response or final_error}")
         
         # Show actual function effects
-        print(f"\n{'='*50}")
-        print("ACTUAL FUNCTION EFFECTS (for comparison)")
-        print(f"{'='*50}")
-        
-        actual_effects = {
-            "fin": "Reverses the name",
-            "bin": "Changes name to 'bad name, please change me immediately!'",
-            "stin": "Changes name to Spanish translation of the input noun",
-            "hin": "Keeps first N characters of the name",
-            "min": "Changes name to input string without its first character",
-            "tox": "Doubles the pim value",
-            "plox": "Adds the input number (1-10) to pim",
-            "rox": "Adds the number of sides of the shape to pim",
-            "sox": "Changes bim to 'Red'",
-            "vox": "Changes bim to color associated with the input animal",
-            "lox": "Changes bim to intermediate color between current bim and input color",
-            "mox": "Changes bim to ROYGBIV color at position N (1-7)",
-            "hox": "Resets to name='Cama', bim='Red', pim=1",
-            "box": "Changes bim to animal's color, pim to animal's leg count"
-        }
+        self.log(f"\n{'='*50}")
+        self.log("ACTUAL FUNCTION EFFECTS (for comparison)")
+        self.log(f"{'='*50}")
         
         for func in self.selected_functions:
-            print(f"- {func}: {actual_effects[func]}")
+            self.log(f"- {func}: {FUNCTION_EFFECTS[func]}")
+        
+        return self.get_results(final_response, final_error)
 
 def main():
     """Run a single game"""
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import os
+
+import httpx
+import openai
+
+from zab import ORACLE_MODEL
+from zab_game_oai import ZabGameOAI
+from zab_metrics import Completion
+from zab_ratelimit import ModelRequestFailed, default_scheduler, estimate_tokens
+
+def create_async_client(api_key=None, max_connections=100, timeout=120.0):
+    """Create an AsyncOpenAI client whose connection pool is shared by many games"""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OpenAI API key must be provided or set in OPENAI_API_KEY environment variable")
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+    return openai.AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+
+class AsyncOnlyBackend:
+    """Stands in for the sync backend of async games, which send requests through their async client"""
+
+    def complete(self, model_name, messages, **params):
+        raise TypeError("Async games send requests with get_llm_response_async; use play_game_async")
+
+ASYNC_ONLY_BACKEND = AsyncOnlyBackend()
+
+class AsyncZabGameOAI(ZabGameOAI):
+    """ZabGameOAI driven by asyncio so one process can run many games at once"""
+
+    def __init__(self, total_turns=10, model_name="gpt-4o-mini", api_key=None, oracle_model=ORACLE_MODEL,
+                 client=None, limiter=None, available_functions=None, seed=None, verbose=False, multi_turn=False,
+                 scheduler=None, backend=None):
+        self.async_client = client or create_async_client(api_key)
+        self.limiter = limiter  # asyncio.Semaphore shared by all games, or None
+        self.scheduler = scheduler or default_scheduler()  # rate limits, retries and hedging
+        # Requests go through the async client, so no game needs a sync client and connection pool of its own
+        super().__init__(total_turns, model_name, oracle_model=oracle_model, available_functions=available_functions,
+                         seed=seed, verbose=verbose, multi_turn=multi_turn, backend=backend or ASYNC_ONLY_BACKEND)
+
+    async def _create(self, request):
+        completions = self.async_client.chat.completions
+        if not hasattr(completions, "with_raw_response"):
+            return await completions.create(**request)
+        raw = await completions.with_raw_response.create(**request)
+        self.scheduler.observe(self.model_name, raw.headers)
+        return await raw.parse()
+
+    async def get_llm_response_async(self, prompt):
+        """Get response from OpenAI API without blocking the event loop; raises ModelRequestFailed"""
+        request = self.build_request(prompt)
+
+        async def send():
+            if self.limiter is None:
+                return await self._create(request)
+            async with self.limiter:
+                return await self._create(request)
+
+        response = await self.scheduler.call_async(self.model_name, send,
+                                                   estimate_tokens(request['messages'], request))
+        content = response.choices[0].message.content
+        self.metrics.add_usage(request['messages'], Completion.from_openai(content, getattr(response, "usage", None)))
+        self.prompts.record(prompt, content)
+        return content
+
+    async def play_turn_async(self):
+        """Play a single turn"""
+        self.log(f"TURN {self.current_turn + 1}/{self.total_turns}: {self.current_zab.state()}")
+
+        self.metrics.start_turn(self.current_turn + 1)
+        with self.metrics.phase("prompt"):
+            prompt = self.create_prompt()
+        try:
+            with self.metrics.phase("model"):
+                response = await self.get_llm_response_async(prompt)
+        except ModelRequestFailed as e:
+            self.record_failed_turn(e)
+            self.current_turn += 1
+            return
+        with self.metrics.phase("parse"):
+            func_name, args = self.parse_action(response)
+
+        if func_name:
+            # Oracle functions may call a local model synchronously, so keep them off the loop
+            with self.metrics.phase("execute"):
+                success, message = await asyncio.to_thread(self.execute_action, func_name, args)
+            self.log(f"Action result: {message}")
+        else:
+            success, message = False, "No valid action found in response. Skipping turn."
+            self.log(message)
+        self.record_turn(response, func_name, args, success, message)
+
+        self.current_turn += 1
+
+    def play_game(self):
+        """Play the complete game from synchronous code"""
+        return asyncio.run(self.play_game_async())
+
+    async def play_game_async(self):
+        """Play the complete game and return its transcript"""
+        while self.current_turn < self.total_turns:
+            await self.play_turn_async()
+
+        self.metrics.start_turn("final")
+        try:
+            with self.metrics.phase("final"):
+                final_response, final_error = await self.get_llm_response_async(self.create_final_prompt()), None
+        except ModelRequestFailed as e:
+            final_response, final_error = None, str(e)
+        self.metrics.end_turn()
+        return self.get_results(final_response, final_error)
+
+async def run_games(num_games, total_turns=10, model_name="gpt-4o-mini", api_key=None,
+                    max_concurrency=50, max_connections=100, verbose=False):
+    """Run num_games games concurrently over one client, at most max_concurrency requests in flight"""
+    client = create_async_client(api_key, max_connections=max_connections)
+    limiter = asyncio.Semaphore(max_concurrency)
+    try:
+        games = [AsyncZabGameOAI(total_turns, model_name, client=client, limiter=limiter, verbose=verbose)
+                 for _ in range(num_games)]
+        return await asyncio.gather(*(game.play_game_async() for game in games), return_exceptions=True)
+    finally:
+        await client.close()
+
+def main():
+    """Run many games concurrently and print a short summary"""
+    parser = argparse.ArgumentParser(description="Run Zab games concurrently with asyncio")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--model", default="gpt-4.1")
+    parser.add_argument("--concurrency", type=int, default=50, help="maximum API requests in flight")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_games(args.games, args.turns, args.model,
+                                    max_concurrency=args.concurrency, verbose=args.verbose))
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            print(f"Game {i + 1}: failed ({result})")
+        else:
+            print(f"Game {i + 1}: {result['selected_functions']} -> {result['final_state']}")
+
+if __name__ == "__main__":
+    main()
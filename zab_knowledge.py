@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+import argparse
+import difflib
+import mmap
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from zab_cache import cache_dir, default_cache_path
+from zab_colors import BIM_COLORS, MODIFIERS, snap_color
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zab_knowledge.tsv")
+KINDS = ("animal", "shape")
+UNKNOWN = "-"
+
+ARTICLES = ("a ", "an ", "the ")
+IRREGULAR_PLURALS = {"mice": "mouse", "geese": "goose", "oxen": "ox", "lice": "louse", "octopi": "octopus",
+                     "octopuses": "octopus", "wolves": "wolf", "calves": "calf", "ponies": "pony",
+                     "children": "child", "people": "person", "teeth": "tooth", "feet": "foot", "fish": "fish",
+                     "sheep": "sheep", "deer": "deer", "moose": "moose", "bison": "bison", "rhombi": "rhombus",
+                     "trapezia": "trapezium", "ellipses": "ellipse", "cacti": "cactus"}
+POLYGON_PATTERN = re.compile(r'(\d+)\s*(?:gon|sided(?:\s+\w+)?|sides)')
+# Leading words that never change the answer and can be dropped down to the head noun. Other words
+# can ("sea lion" is not a lion), so those names go to the model when the table lacks them
+HEAD_MODIFIERS = ({color.lower() for color in BIM_COLORS} | set(MODIFIERS) | {
+    "grey", "golden", "spotted", "striped", "big", "small", "large", "little", "tiny", "huge", "fat",
+    "baby", "young", "adult", "old", "male", "female", "wild", "pet", "common", "regular", "irregular",
+    "african", "asian", "american", "european", "australian", "indian", "chinese", "japanese",
+    "british", "english", "french", "german", "mexican", "brazilian", "canadian", "russian",
+})
+FUZZY_CUTOFF = 0.9  # one dropped or added letter in a longer name, not a swapped one ("horsefly" is not a housefly)
+
+def normalize(text) -> str:
+    """Lowercase, drop punctuation and leading articles, and collapse whitespace"""
+    text = re.sub(r"[^\w\s-]", "", str(text).lower()).replace("-", " ").replace("_", " ")
+    text = " ".join(text.split())
+    for article in ARTICLES:
+        if text.startswith(article):
+            text = text[len(article):]
+    return text
+
+def singular_forms(word: str) -> List[str]:
+    """Candidate singulars of a (possibly plural) word, most likely first"""
+    if word in IRREGULAR_PLURALS:
+        return [IRREGULAR_PLURALS[word]]
+    forms = []
+    if word.endswith("ies"):
+        forms.append(word[:-3] + "y")
+    if word.endswith("ves"):
+        forms += [word[:-3] + "f", word[:-3] + "fe"]
+    if word.endswith("es"):
+        forms.append(word[:-2])
+    if word.endswith("s") and not word.endswith("ss"):
+        forms.append(word[:-1])
+    return forms
+
+def default_overlay_path() -> str:
+    """ZAB_KNOWLEDGE_OVERLAY, else knowledge_overlay.tsv next to the oracle cache file"""
+    path = os.getenv("ZAB_KNOWLEDGE_OVERLAY")
+    if path:
+        return path
+    cache_path = default_cache_path()
+    return os.path.join(os.path.dirname(cache_path) if cache_path else cache_dir(), "knowledge_overlay.tsv")
+
+class KnowledgeBase:
+    """Sides of shapes and legs and colors of animals, from a sorted TSV searched in place through mmap.
+
+    Answers the oracle model gives for names the table lacks go to an overlay file, so the next
+    lookup of the same name is local too.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, overlay_path: Optional[str] = None):
+        self.path = path
+        self.overlay_path = overlay_path or default_overlay_path()
+        self.lock = threading.Lock()
+        self._map = None
+        self._overlay = None
+        self._names: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _mmap(self):
+        if self._map is None:
+            with self.lock:
+                if self._map is None:
+                    with open(self.path, "rb") as f:
+                        self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _overlay_rows(self) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+        if self._overlay is None:
+            with self.lock:
+                if self._overlay is None:
+                    overlay = {}
+                    if os.path.exists(self.overlay_path):
+                        with open(self.overlay_path) as f:
+                            for line in f:
+                                key, count, color = self._split(line)
+                                old = overlay.get(key, (None, None))
+                                overlay[key] = (count if count is not None else old[0], color or old[1])
+                    self._overlay = overlay
+        return self._overlay
+
+    @staticmethod
+    def _split(line: str):
+        key, count, color = line.rstrip("\n").split("\t")
+        return key, int(count) if count != UNKNOWN else None, color if color != UNKNOWN else None
+
+    def _search(self, key: str) -> Optional[str]:
+        # Binary search over byte offsets, snapping each probe back to the start of its line
+        data = self._mmap()
+        target = key.encode()
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            line = data[start:end]
+            found = line.split(b"\t", 1)[0]
+            if found == target:
+                return line.decode()
+            if found < target:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+    def get(self, kind: str, name: str) -> Optional[Tuple[Optional[int], Optional[str]]]:
+        """(count, color) for an exact normalized name, from the overlay or the bundled table"""
+        key = f"{kind}:{name}"
+        overlay = self._overlay_rows()
+        with self.lock:
+            row = overlay.get(key)
+        line = self._search(key)
+        if line is None:
+            return row
+        _, count, color = self._split(line)
+        if row is not None:
+            count, color = count if count is not None else row[0], color or row[1]
+        return count, color
+
+    def names(self, kind: str) -> List[str]:
+        """Every name of a kind (read once, for fuzzy matching after a miss)"""
+        cached = self._names.get(kind)
+        if cached is not None:
+            return cached
+        prefix = f"{kind}:"
+        names = [line.split("\t", 1)[0][len(prefix):]
+                 for line in self._mmap()[:].decode().splitlines() if line.startswith(prefix)]
+        overlay = self._overlay_rows()
+        with self.lock:
+            # Snapshot and store under the lock: a remember() from another game either lands in this
+            # list or clears it afterwards, never in between
+            names += [key[len(prefix):] for key in overlay if key.startswith(prefix)]
+            names = self._names[kind] = sorted(set(names))
+        return names
+
+    def resolve(self, kind: str, text) -> Optional[Tuple[str, Tuple[Optional[int], Optional[str]]]]:
+        """(matched name, (count, color)) for free text: exact, singular, without modifiers, then a close spelling"""
+        name = normalize(text)
+        if not name:
+            return None
+        words = name.split()
+        candidates = self._forms(words)
+        if len(words) > 1:
+            candidates += self._forms(["".join(words)])  # "sea horse" is the seahorse
+        # "african elephant", "baby goats": drop known modifiers down to the head noun
+        for i in range(1, len(words)):
+            if words[i - 1] not in HEAD_MODIFIERS:
+                break
+            candidates += self._forms(words[i:])
+        for candidate in candidates:
+            row = self.get(kind, candidate)
+            if row is not None:
+                return candidate, row
+        if kind == "shape":
+            match = POLYGON_PATTERN.search(name)
+            if match:
+                return name, (int(match.group(1)), None)
+        close = difflib.get_close_matches(name, self.names(kind), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            return close[0], self.get(kind, close[0])
+        return None
+
+    @staticmethod
+    def _forms(words: List[str]) -> List[str]:
+        return [" ".join(words)] + [" ".join(words[:-1] + [form]) for form in singular_forms(words[-1])]
+
+    def lookup(self, kind: str, text, field: str):
+        """A shape's sides or an animal's legs ("count") or color ("color"), or None on a miss"""
+        resolved = self.resolve(kind, text)
+        value = None
+        if resolved is not None:
+            count, color = resolved[1]
+            value = count if field == "count" else color
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def remember(self, kind: str, text, field: str, value):
+        """Write an oracle answer back to the overlay so the name resolves locally from now on"""
+        name = normalize(text)
+        if not name or value is None:
+            return
+        key = f"{kind}:{name}"
+        rows = self._overlay_rows()
+        with self.lock:
+            count, color = rows.get(key, (None, None))
+            if field == "count":
+                count = int(value)
+            else:
+                color = value
+            rows[key] = (count, color)
+            self._names.pop(kind, None)
+        # Written after releasing the lock, so lookups from other games never wait on the disk
+        line = f"{key}\t{UNKNOWN if count is None else count}\t{color or UNKNOWN}\n"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.overlay_path)), exist_ok=True)
+            with open(self.overlay_path, "a") as f:
+                f.write(line)
+        except OSError:
+            pass  # read-only cache directory: keep the answer for this process only
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'overlay_entries': len(self._overlay or {})}
+
+def parse_answer(field: str, answer):
+    """The value of an oracle answer for a knowledge field, or None if it does not parse"""
+    if field == "count":
+        answer = str(answer).strip()
+        return int(answer) if answer.isdigit() else None
+    return snap_color(answer)
+
+def merge_overlay(knowledge: KnowledgeBase):
+    """Fold the overlay into the bundled table, keeping it sorted"""
+    rows = {}
+    with open(knowledge.path) as f:
+        header = f.readline()
+        for line in f:
+            key, count, color = knowledge._split(line)
+            rows[key] = (count, color)
+    for key, (count, color) in knowledge._overlay_rows().items():
+        old = rows.get(key, (None, None))
+        rows[key] = (old[0] if old[0] is not None else count, old[1] or color)
+    with open(knowledge.path, "w") as f:
+        f.write(header)
+        for key in sorted(rows, key=str.encode):
+            count, color = rows[key]
+            f.write(f"{key}\t{UNKNOWN if count is None else count}\t{color or UNKNOWN}\n")
+    return len(rows)
+
+# Shared knowledge base for rox, vox and box
+knowledge = KnowledgeBase()
+
+def main():
+    """Look names up or fold overlay answers into the bundled table"""
+    parser = argparse.ArgumentParser(description="Query or extend the Zab knowledge table")
+    sub = parser.add_subparsers(dest="command", required=True)
+    lookup = sub.add_parser("lookup")
+    lookup.add_argument("kind", choices=KINDS)
+    lookup.add_argument("name")
+    sub.add_parser("merge-overlay", help="add the overlay's oracle answers to zab_knowledge.tsv")
+    args = parser.parse_args()
+
+    if args.command == "lookup":
+        resolved = knowledge.resolve(args.kind, args.name)
+        print("miss" if resolved is None else f"{resolved[0]}: count={resolved[1][0]} color={resolved[1][1]}")
+    else:
+        print(f"{merge_overlay(knowledge)} rows in {knowledge.path}")
+
+if __name__ == "__main__":
+    main()
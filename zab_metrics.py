@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PHASES = ("prompt", "model", "parse", "execute")
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def estimate_text_tokens(text) -> int:
+    """Rough token count when the backend reports no usage (about four characters per token)"""
+    return (len(str(text)) + 3) // 4
+
+class Completion(str):
+    """Model output text that also carries the request's token usage and time to first token"""
+
+    def __new__(cls, text, prompt_tokens=None, completion_tokens=None, cached_tokens=None, ttft=None):
+        completion = super().__new__(cls, "" if text is None else text)
+        completion.prompt_tokens = prompt_tokens
+        completion.completion_tokens = completion_tokens
+        completion.cached_tokens = cached_tokens
+        completion.ttft = ttft  # seconds, when the backend can tell
+        return completion
+
+    @classmethod
+    def from_openai(cls, text, usage, ttft=None) -> "Completion":
+        """Wrap text with the usage block of an OpenAI-style response"""
+        if usage is None:
+            return cls(text, ttft=ttft)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return cls(text, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None),
+                   getattr(details, "cached_tokens", None), ttft)
+
+class Histogram:
+    """Prometheus-style cumulative histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{format_labels(labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+def format_labels(labels, **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+class MetricsRegistry:
+    """Counters and histograms for the Prometheus /metrics endpoint, keyed by name and labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help: Dict[str, tuple] = {}
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.histograms: Dict[str, Dict[tuple, Histogram]] = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Text exposition format, with optional point-in-time gauges appended"""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines += self._header(name, "counter")
+                lines += [f"{name}{format_labels(key)} {value}" for key, value in sorted(series.items())]
+            for name, series in sorted(self.histograms.items()):
+                lines += self._header(name, "histogram")
+                for key, histogram in sorted(series.items()):
+                    lines += histogram.lines(name, key)
+        for name, value in sorted((gauges or {}).items()):
+            if value is not None:
+                lines += [f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, kind):
+        kind, text = self.help.get(name, (kind, None))
+        return ([f"# HELP {name} {text}"] if text else []) + [f"# TYPE {name} {kind}"]
+
+# Process-wide registry shared by every game (served by the web server at /metrics)
+registry = MetricsRegistry()
+registry.describe("zab_phase_seconds", "histogram", "Time per turn phase (prompt, model, parse, execute, final)")
+registry.describe("zab_time_to_first_token_seconds", "histogram", "Time to first token, where the backend reports it")
+registry.describe("zab_tokens_total", "counter", "Tokens sent and received (kind: prompt, completion, cached)")
+registry.describe("zab_turns_total", "counter", "Turns played (outcome: valid, invalid, failed)")
+registry.describe("zab_games_total", "counter", "Games finished")
+
+class GameMetrics:
+    """Per-turn phase timings and token counts for one game, mirrored into the shared registry"""
+
+    def __init__(self, model_name, registry: Optional[MetricsRegistry] = registry):
+        self.model_name = model_name
+        self.registry = registry
+        self.turns: List[Dict] = []
+        self.current: Optional[Dict] = None
+
+    def start_turn(self, turn):
+        """Open a record for a turn (or "final" for the closing analysis)"""
+        self.current = {'turn': turn, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0,
+                        'estimated_tokens': False, 'ttft_s': None}
+        self.turns.append(self.current)
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one phase of the current turn"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            turn = self._turn()
+            turn[f"{name}_s"] = turn.get(f"{name}_s", 0.0) + elapsed
+            if self.registry is not None:
+                self.registry.observe("zab_phase_seconds", elapsed, model=self.model_name, phase=name)
+
+    def add_usage(self, messages, response):
+        """Count the tokens of one model call, estimating them when the backend reports none"""
+        turn = self._turn()
+        prompt_tokens = getattr(response, "prompt_tokens", None)
+        completion_tokens = getattr(response, "completion_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_text_tokens(m.get("content", "")) for m in messages)
+            turn['estimated_tokens'] = True
+        if completion_tokens is None:
+            completion_tokens = estimate_text_tokens(response)
+            turn['estimated_tokens'] = True
+        cached_tokens = getattr(response, "cached_tokens", None) or 0
+        turn['prompt_tokens'] += prompt_tokens
+        turn['completion_tokens'] += completion_tokens
+        turn['cached_tokens'] += cached_tokens
+        ttft = getattr(response, "ttft", None)
+        if ttft is not None:
+            turn['ttft_s'] = ttft
+        if self.registry is not None:
+            for kind, count in (("prompt", prompt_tokens), ("completion", completion_tokens), ("cached", cached_tokens)):
+                if count:
+                    self.registry.inc("zab_tokens_total", count, model=self.model_name, kind=kind)
+            if ttft is not None:
+                self.registry.observe("zab_time_to_first_token_seconds", ttft, model=self.model_name)
+
+    def _turn(self):
+        # Subclasses with their own turn loop may skip start_turn
+        if self.current is None:
+            self.start_turn(len(self.turns) + 1)
+        return self.current
+
+    def end_turn(self, outcome=None):
+        """Close the current turn; outcome is valid, invalid or failed"""
+        turn = self._turn()
+        turn['outcome'] = outcome
+        self.current = None
+        if self.registry is not None and outcome is not None:
+            self.registry.inc("zab_turns_total", model=self.model_name, outcome=outcome)
+
+    def end_game(self):
+        if self.registry is not None:
+            self.registry.inc("zab_games_total", model=self.model_name)
+
+    def summary(self) -> Dict:
+        """Per-turn records plus totals, and the share of wall time spent waiting on the model"""
+        totals = {f"{phase}_s": sum(turn.get(f"{phase}_s", 0.0) for turn in self.turns)
+                  for phase in PHASES + ("final",)}
+        for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens'):
+            totals[key] = sum(turn[key] for turn in self.turns)
+        elapsed = sum(totals[f"{phase}_s"] for phase in PHASES + ("final",))
+        ttfts = [turn['ttft_s'] for turn in self.turns if turn['ttft_s'] is not None]
+        totals['mean_ttft_s'] = sum(ttfts) / len(ttfts) if ttfts else None
+        totals['model_share'] = (totals['model_s'] + totals['final_s']) / elapsed if elapsed else None
+        totals['estimated_tokens'] = any(turn['estimated_tokens'] for turn in self.turns)
+        return {'turns': self.turns, 'totals': totals}
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+# Pieces of the game and oracle prompts the scripted players react to
+ACTION_PATTERN = re.compile(r'- (\w+) - Takes ([^\n]*)\n\s*- Example: (\w+)\(')
+FINAL_FUNCTION_PATTERN = re.compile(r'^- (\w+):\s*$', re.MULTILINE)
+CHOICES_PATTERN = re.compile(r'Choose from this list: ([^.]*)\.')
+QUOTED_PATTERN = re.compile(r"'([^']*)'")
+
+ARGUMENT_POOLS = {
+    "noun": ["cat", "house", "tree", "book", "river"],
+    "word": ["hello", "zab", "puzzle", "orange"],
+    "shape": ["triangle", "square", "pentagon", "hexagon", "circle"],
+    "animal": ["spider", "dog", "flamingo", "snake", "octopus"],
+    "color": ["blue", "green", "yellow", "purple", "black"],
+}
+
+def count_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+class MockError(Exception):
+    """Injected server error"""
+    status_code = 500
+
+class MockRateLimitError(MockError):
+    """Injected or enforced rate limit"""
+    status_code = 429
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LatencyModel:
+    """Time to first token drawn from a distribution, plus generation time at a token throughput"""
+
+    def __init__(self, kind: str = "fixed", *params: float, tokens_per_second: Optional[float] = None):
+        self.kind = kind  # fixed:s, uniform:lo:hi, lognormal:median:sigma or exponential:mean
+        self.params = params or (0.0,)
+        self.tokens_per_second = tokens_per_second
+
+    @classmethod
+    def parse(cls, spec: str, tokens_per_second: Optional[float] = None) -> "LatencyModel":
+        """Build from a command-line spec such as "lognormal:0.4:0.6" """
+        kind, *params = spec.split(":")
+        return cls(kind, *map(float, params), tokens_per_second=tokens_per_second)
+
+    def first_token(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return rng.lognormvariate(0, sigma) * median
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.params[0])
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+    def per_token(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+class Strategy:
+    """A scripted player: turns a game prompt into a response"""
+
+    def move(self, actions: List[tuple], rng: random.Random) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def call(name: str, takes: str, rng: random.Random) -> str:
+        takes = takes.lower()
+        if "no parameters" in takes:
+            return f"{name}()"
+        if "1-10" in takes:
+            return f"{name}({rng.randint(1, 10)})"
+        if "1-7" in takes:
+            return f"{name}({rng.randint(1, 7)})"
+        if "integer" in takes:
+            return f"{name}({rng.randint(1, 6)})"
+        for kind, pool in ARGUMENT_POOLS.items():
+            if kind in takes:
+                return f'{name}("{rng.choice(pool)}")'
+        return f"{name}()"
+
+class RandomStrategy(Strategy):
+    """Calls a random available function with a plausible argument"""
+
+    def move(self, actions, rng):
+        name, takes = rng.choice(actions)
+        return f"<scratch>Trying {name} at random.</scratch>\nI will call {self.call(name, takes, rng)}"
+
+class CycleStrategy(Strategy):
+    """Calls the available functions in turn (counted per set of functions)"""
+
+    def __init__(self):
+        self.turns: Dict[tuple, int] = {}
+        self.lock = threading.Lock()
+
+    def move(self, actions, rng):
+        key = tuple(name for name, _ in actions)
+        with self.lock:
+            turn = self.turns.get(key, 0)
+            self.turns[key] = turn + 1
+        name, takes = actions[turn % len(actions)]
+        return f"<scratch>Cycling through {', '.join(key)}.</scratch>\n{self.call(name, takes, rng)}"
+
+class InvalidStrategy(Strategy):
+    """Never makes a valid call, exercising the skipped-turn path"""
+
+    def move(self, actions, rng):
+        return "I am not sure what to do, so I will think about it some more."
+
+class ScriptedStrategy(Strategy):
+    """Replays a fixed list of responses, one per turn, wrapping around"""
+
+    def __init__(self, responses: List[str]):
+        self.responses = responses
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def move(self, actions, rng):
+        with self.lock:
+            response = self.responses[self.index % len(self.responses)]
+            self.index += 1
+        return response
+
+STRATEGIES: Dict[str, Callable[[], Strategy]] = {
+    "random": RandomStrategy,
+    "cycle": CycleStrategy,
+    "invalid": InvalidStrategy,
+}
+
+def make_strategy(spec: str) -> Strategy:
+    """Strategy by name, or "script:<path>" for a JSON list of responses"""
+    if spec.startswith("script:"):
+        with open(spec[len("script:"):]) as f:
+            return ScriptedStrategy(json.load(f))
+    return STRATEGIES[spec]()
+
+class MockBackend:
+    """Stand-in model with configurable latency, failures, rate limits and player behaviour"""
+
+    def __init__(self, strategy: Optional[Strategy] = None, latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, requests_per_minute: Optional[int] = None,
+                 seed: Optional[int] = None, sleep: Callable[[float], None] = time.sleep):
+        self.strategy = strategy or RandomStrategy()
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate  # probability of an injected server error
+        self.rate_limit_rate = rate_limit_rate  # probability of an injected 429
+        self.requests_per_minute = requests_per_minute  # enforced request budget (None: unlimited)
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    @classmethod
+    def from_env(cls) -> "MockBackend":
+        """Configure from ZAB_MOCK_* variables (used by ZAB_MODEL_BACKEND=mock)"""
+        latency = LatencyModel.parse(os.getenv("ZAB_MOCK_LATENCY", "fixed:0"),
+                                     float(os.getenv("ZAB_MOCK_TPS", "0")) or None)
+        rpm = int(os.getenv("ZAB_MOCK_RPM", "0")) or None
+        return cls(make_strategy(os.getenv("ZAB_MOCK_STRATEGY", "random")), latency,
+                   float(os.getenv("ZAB_MOCK_ERROR_RATE", "0")), float(os.getenv("ZAB_MOCK_429_RATE", "0")), rpm)
+
+    def reply(self, prompt: str) -> str:
+        """Text the model would produce for a prompt, without any delay or failure"""
+        with self.lock:
+            rng = random.Random(self.rng.random())
+        if "Choose from this list" in prompt:
+            choices = CHOICES_PATTERN.search(prompt)
+            return rng.choice(choices.group(1).split(", ")) if choices else "Red"
+        if prompt.startswith("Translate the English noun"):
+            noun = QUOTED_PATTERN.search(prompt)
+            return (noun.group(1) if noun else "cosa") + "o"
+        if prompt.startswith("How many legs"):
+            return str(rng.choice([0, 2, 4, 6, 8]))
+        if prompt.startswith("How many sides"):
+            return str(rng.randint(3, 10))
+        if "provide your best guess" in prompt:
+            functions = FINAL_FUNCTION_PATTERN.findall(prompt)
+            return "\n".join(f"- {func}: changes one of my qualities in a way I could not pin down" for func in functions)
+        actions = [(name.lower(), takes) for name, takes, _ in ACTION_PATTERN.findall(prompt)]
+        if not actions:
+            return "OK"
+        return self.strategy.move(actions, rng)
+
+    def admit(self):
+        """Count a request against the budget, raising the injected or enforced failures"""
+        with self.lock:
+            self.stats['requests'] += 1
+            roll = self.rng.random()
+            if self.requests_per_minute:
+                now = time.monotonic()
+                if now - self.window_start >= 60:
+                    self.window_start, self.window_requests = now, 0
+                if self.window_requests >= self.requests_per_minute:
+                    self.stats['rate_limited'] += 1
+                    raise MockRateLimitError("Rate limit reached for requests", 60 - (now - self.window_start))
+                self.window_requests += 1
+            if roll < self.rate_limit_rate:
+                self.stats['rate_limited'] += 1
+                raise MockRateLimitError("Rate limit reached (injected)")
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats['errors'] += 1
+                raise MockError("The server had an error while processing your request (injected)")
+
+    def rate_limit_headers(self) -> Dict[str, str]:
+        if not self.requests_per_minute:
+            return {}
+        with self.lock:
+            remaining = max(0, self.requests_per_minute - self.window_requests)
+            reset = max(0.0, 60 - (time.monotonic() - self.window_start))
+        return {
+            'x-ratelimit-limit-requests': str(self.requests_per_minute),
+            'x-ratelimit-remaining-requests': str(remaining),
+            'x-ratelimit-reset-requests': f"{reset:.3f}s",
+        }
+
+    def generate(self, prompt: str):
+        """Admit, wait out the simulated latency and return (text, prompt tokens, completion tokens)"""
+        self.admit()
+        text = self.reply(prompt)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+        with self.lock:
+            delay = self.latency.first_token(self.rng) + completion_tokens * self.latency.per_token()
+            self.stats['prompt_tokens'] += prompt_tokens
+            self.stats['completion_tokens'] += completion_tokens
+        self.sleep(delay)
+        return text, prompt_tokens, completion_tokens
+
+    def stream(self, prompt: str):
+        """Like generate, but yields the text in token-sized pieces at the configured throughput"""
+        self.admit()
+        text = self.reply(prompt)
+        with self.lock:
+            first = self.latency.first_token(self.rng)
+            self.stats['prompt_tokens'] += count_tokens(prompt)
+            self.stats['completion_tokens'] += count_tokens(text)
+        self.sleep(first)
+        per_token = self.latency.per_token()
+        for start in range(0, len(text), 4):
+            if start and per_token:
+                self.sleep(per_token)
+            yield text[start:start + 4]
+
+    # lmstudio-style interface: ModelProvider(factory=backend.llm)
+    def llm(self, model_name: str) -> "MockModel":
+        return MockModel(self, model_name)
+
+    # OpenAI-style in-process client: ZabGameOAI(client=backend.client())
+    def client(self):
+        return SimpleNamespace(chat=SimpleNamespace(completions=MockCompletions(self)), api_key="mock")
+
+class MockModel:
+    """lmstudio model handle look-alike"""
+
+    def __init__(self, backend: MockBackend, model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def respond(self, prompt):
+        return self.backend.generate(str(prompt))[0]
+
+def messages_text(messages) -> str:
+    return "\n\n".join(str(message.get('content', "")) for message in messages)
+
+def completion_body(model, text, prompt_tokens, completion_tokens) -> Dict:
+    return {
+        'id': f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        'object': "chat.completion",
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': "assistant", 'content': text}, 'finish_reason': "stop"}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+class MockCompletions:
+    """chat.completions look-alike returning plain namespaces instead of openai types"""
+
+    def __init__(self, backend: MockBackend):
+        self.backend = backend
+
+    def create(self, model, messages, **kwargs):
+        text, prompt_tokens, completion_tokens = self.backend.generate(messages_text(messages))
+        body = completion_body(model, text, prompt_tokens, completion_tokens)
+        return SimpleNamespace(
+            id=body['id'], model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content=text))],
+            usage=SimpleNamespace(**body['usage']))
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/chat/completions (plain or streamed) from the server's MockBackend"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self.send_json(200, self.server.backend.stats)
+        else:
+            self.send_json(404, {'error': {'message': "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {'error': {'message': "Not found"}})
+            return
+        backend = self.server.backend
+        prompt = messages_text(request.get('messages', []))
+        model = request.get('model', "mock")
+        try:
+            if request.get('stream'):
+                self.stream_completion(backend, prompt, model, request)
+                return
+            text, prompt_tokens, completion_tokens = backend.generate(prompt)
+        except MockRateLimitError as e:
+            headers = dict(backend.rate_limit_headers(), **{'retry-after': f"{e.retry_after:.3f}"})
+            self.send_json(429, {'error': {'message': str(e), 'type': "rate_limit_error"}}, headers)
+            return
+        except Exception as e:
+            self.send_json(500, {'error': {'message': str(e), 'type': "server_error"}})
+            return
+        self.send_json(200, completion_body(model, text, prompt_tokens, completion_tokens),
+                       backend.rate_limit_headers())
+
+    def stream_completion(self, backend, prompt, model, request):
+        chunks = backend.stream(prompt)
+        first = next(chunks, "")  # raises injected failures before any bytes are sent
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for name, value in backend.rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+
+        def send(delta, finish_reason=None):
+            chunk = {'id': completion_id, 'object': "chat.completion.chunk", 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            send({'role': "assistant", 'content': first})
+            for piece in chunks:
+                send({'content': piece})
+            send({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client stopped reading, e.g. after an early stop
+
+class MockOpenAIServer:
+    """Threaded HTTP server speaking enough of the OpenAI chat-completions protocol for the games"""
+
+    def __init__(self, backend: Optional[MockBackend] = None, host: str = "127.0.0.1", port: int = 0):
+        self.backend = backend or MockBackend()
+        self.httpd = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.backend = self.backend
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="zab-mock-openai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def load_test(server_url: str, games: int = 20, total_turns: int = 5, model_name: str = "mock-model",
+              poll_interval: float = 0.2, timeout: float = 600) -> Dict:
+    """Start games on a running zab_web_server and time them until they all finish"""
+    import httpx
+
+    started = time.time()
+    clients, starts, durations, rejected = [], {}, [], 0
+    for i in range(games):
+        client = httpx.Client(base_url=server_url, timeout=30)
+        response = client.post("/start_game", json={'model_name': model_name, 'total_turns': total_turns,
+                                                     'api_key': "mock", 'fast_mode': True})
+        if response.status_code != 200 or not response.json().get('success'):
+            rejected += 1
+            client.close()
+            continue
+        clients.append(client)
+        starts[i] = time.time()
+
+    pending = dict(zip(starts, clients))
+    while pending and time.time() - started < timeout:
+        for i, client in list(pending.items()):
+            status = client.get("/game_status").json()
+            if status.get('is_complete'):
+                durations.append(time.time() - starts[i])
+                client.close()
+                del pending[i]
+        time.sleep(poll_interval)
+    for client in pending.values():
+        client.close()
+
+    elapsed = time.time() - started
+    return {
+        'games': games,
+        'completed': len(durations),
+        'rejected': rejected,
+        'timed_out': len(pending),
+        'elapsed_s': round(elapsed, 3),
+        'games_per_s': round(len(durations) / elapsed, 3) if elapsed else None,
+        'turns_per_s': round(len(durations) * total_turns / elapsed, 3) if elapsed else None,
+        'p50_game_s': percentile(durations, 0.5),
+        'p95_game_s': percentile(durations, 0.95),
+        'p99_game_s': percentile(durations, 0.99),
+    }
+
+def main():
+    """Run the mock OpenAI server, or load-test a web server that points at it"""
+    parser = argparse.ArgumentParser(description="Mock model backend for load-testing Zab")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve the OpenAI chat-completions protocol")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--latency", default="lognormal:0.4:0.5", help="fixed:S, uniform:LO:HI, lognormal:MEDIAN:SIGMA, exponential:MEAN")
+    serve.add_argument("--tokens-per-second", type=float, default=None)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--rate-limit-rate", type=float, default=0.0, help="probability of an injected 429")
+    serve.add_argument("--rpm", type=int, default=None, help="enforced requests per minute")
+    serve.add_argument("--strategy", default="random", help="random, cycle, invalid or script:<json file>")
+    serve.add_argument("--seed", type=int, default=None)
+    load = commands.add_parser("loadtest", help="start games on a web server and report latency")
+    load.add_argument("--server", default="http://127.0.0.1:5000")
+    load.add_argument("--games", type=int, default=20)
+    load.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "loadtest":
+        print(json.dumps(load_test(args.server, args.games, args.turns), indent=2))
+        return
+
+    backend = MockBackend(make_strategy(args.strategy), LatencyModel.parse(args.latency, args.tokens_per_second),
+                          args.error_rate, args.rate_limit_rate, args.rpm, args.seed)
+    server = MockOpenAIServer(backend, args.host, args.port)
+    print(f"Mock OpenAI server on {server.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+from typing import Optional
+
+from zab_backends import ModelBackend, backend_from_env
+from zab_metrics import Completion
+
+class ModelProvider:
+    """Process-wide model backend shared by the games and the oracle functions"""
+
+    def __init__(self, backend: Optional[ModelBackend] = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> ModelBackend:
+        # Created on first use so importing zab never needs a model server
+        if self._backend is None:
+            self._backend = backend_from_env()
+        return self._backend
+
+    def set_backend(self, backend: ModelBackend):
+        """Send all future requests to backend (lmstudio, OpenAI-compatible or mock)"""
+        self._backend = backend
+
+    def set_max_concurrent(self, max_concurrent: Optional[int]):
+        """Limit how many requests may be in flight at once (None for no limit)"""
+        self.backend.set_max_concurrent(max_concurrent)
+
+    def respond(self, model_name: str, prompt) -> Completion:
+        """Run a plain prompt against model_name"""
+        return self.backend.respond(model_name, prompt)
+
+    def complete(self, model_name: str, messages, **params) -> Completion:
+        """Run a chat request against model_name"""
+        return self.backend.complete(model_name, messages, **params)
+
+    def stream(self, model_name: str, messages, on_chunk=None, stop=None, **params) -> Completion:
+        """Run a chat request, passing the answer to on_chunk as it is generated"""
+        return self.backend.stream(model_name, messages, on_chunk, stop, **params)
+
+    def reset(self):
+        """Forget cached handles and connections"""
+        self.backend.reset()
+
+# Process-wide provider shared by ZabFunctions and the games (configured by ZAB_MODEL_BACKEND)
+model_provider = ModelProvider()
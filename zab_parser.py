@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import re
+from typing import List, Optional
+
+# One pass over the response: a scratchpad block is consumed whole, so calls written
+# inside it are never mistaken for the action
+TOKEN_PATTERN = re.compile(r'<scratch>(.*?)</scratch>|(\w+)\s*\(([^)]*)\)', re.DOTALL)
+ARG_PATTERN = re.compile(r'"([^"]*)"|\'([^\']*)\'|([^,\s][^,]*)')
+INT_PATTERN = re.compile(r'[+-]?\d+')
+
+def parse_arg(text: str):
+    """Turn one argument into an int when it looks like one, otherwise a string"""
+    text = text.strip()
+    if INT_PATTERN.fullmatch(text):
+        return int(text)
+    return text
+
+def parse_args(arg_str: str) -> list:
+    """Split an argument list on commas outside quotes"""
+    args = []
+    for double, single, bare in ARG_PATTERN.findall(arg_str):
+        if bare:
+            args.append(parse_arg(bare.strip().strip('"\'')))
+        else:
+            args.append(parse_arg(double or single))
+    return args
+
+class ParseResult:
+    """The action and scratchpad found in a response, plus notes on anything odd"""
+    __slots__ = ("func_name", "args", "scratchpad", "valid_calls", "unknown_calls", "diagnostics")
+
+    def __init__(self):
+        self.func_name: Optional[str] = None
+        self.args: list = None
+        self.scratchpad: Optional[str] = None  # None when the response had no scratchpad
+        self.valid_calls = 0
+        self.unknown_calls: List[str] = []
+        self.diagnostics: List[str] = []
+
+    def action(self):
+        return self.func_name, self.args
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class ActionParser:
+    """Extracts the last call to one of a game's functions from a model response"""
+
+    def __init__(self, functions):
+        self.functions = {f.lower(): f for f in functions}
+
+    def parse(self, response: str) -> ParseResult:
+        result = ParseResult()
+        scratch_blocks = 0
+        last_args = None
+        for match in TOKEN_PATTERN.finditer(response):
+            scratch, name, arg_str = match.groups()
+            if name is None:
+                scratch_blocks += 1
+                if scratch_blocks == 1:
+                    result.scratchpad = scratch.strip()
+                continue
+            func_name = name.lower()
+            if func_name in self.functions:
+                result.valid_calls += 1
+                result.func_name = func_name
+                last_args = arg_str
+            else:
+                result.unknown_calls.append(name)
+
+        if result.func_name is not None:
+            result.args = parse_args(last_args)
+        self._diagnose(response, result, scratch_blocks)
+        return result
+
+    def is_complete(self, partial: str) -> bool:
+        """Whether a response still being generated already holds a scratchpad and a finished action line.
+
+        Used to stop streaming early; text after that point could only add another call, and
+        the last call wins, so stopping trades that chance for the saved tokens.
+        """
+        return CompletionCheck(self.functions)(partial)
+
+    def completion_check(self) -> "CompletionCheck":
+        """is_complete for one streamed response, for text that grows a piece at a time"""
+        return CompletionCheck(self.functions)
+
+    def _diagnose(self, response, result, scratch_blocks):
+        if result.func_name is None:
+            result.diagnostics.append("no call to an available function")
+        elif result.valid_calls > 1:
+            result.diagnostics.append(f"{result.valid_calls} valid calls; used the last one")
+        if result.unknown_calls:
+            result.diagnostics.append(f"ignored calls to unknown functions: {', '.join(result.unknown_calls)}")
+        if scratch_blocks > 1:
+            result.diagnostics.append(f"{scratch_blocks} scratchpad blocks; kept the first")
+        if response.count("<scratch>") > scratch_blocks:
+            result.diagnostics.append("unclosed <scratch> tag")
+
+class CompletionCheck:
+    """ActionParser.is_complete for one response, resuming each check where the last one stopped.
+
+    Called with the whole text so far on every streamed piece, so rescanning from the start would
+    cost quadratic time in the response length. A shorter text (a retried request) starts over.
+    """
+
+    def __init__(self, functions):
+        self.functions = functions
+        self.reset()
+
+    def reset(self):
+        self.pos = 0  # everything before this is scanned and cannot start a new match
+        self.length = 0
+        self.open_scratch = None  # where an unclosed <scratch> starts
+        self.scratchpad = False
+        self.call_end = None
+
+    def __call__(self, partial: str) -> bool:
+        if len(partial) < self.length:
+            self.reset()
+        previous, self.length = self.length, len(partial)
+        if self.open_scratch is not None:
+            # Calls inside an open scratchpad are notes, not actions; only look at the new text for its end
+            if partial.find("</scratch>", max(self.open_scratch, previous - len("</scratch>"))) == -1:
+                return False
+            self.pos, self.open_scratch = self.open_scratch, None
+        while True:
+            match = TOKEN_PATTERN.search(partial, self.pos)
+            opened = partial.find("<scratch>", self.pos, match.start() if match else len(partial))
+            if opened != -1:
+                # The pattern takes a closed block whole, so a tag it skipped is still open
+                self.pos = self.open_scratch = opened
+                return False
+            if match is None:
+                break
+            scratch, name, _ = match.groups()
+            if name is None:
+                self.scratchpad = True
+            elif name.lower() in self.functions:
+                self.call_end = match.end()
+            self.pos = match.end()
+        self.pos = self._resume_point(partial)
+        return self.scratchpad and self.call_end is not None and "\n" in partial[self.call_end:]
+
+    def _resume_point(self, partial: str) -> int:
+        # The earliest place a match could still start once more text arrives: a call whose ")" has
+        # not come yet, a function name still being written, or a "<scratch>" tag cut in half
+        cut = partial.find("(", partial.rfind(")", self.pos) + 1 or self.pos)
+        if cut == -1:
+            cut = len(partial)
+        while cut > self.pos and partial[cut - 1].isspace():
+            cut -= 1
+        while cut > self.pos and (partial[cut - 1].isalnum() or partial[cut - 1] == "_"):
+            cut -= 1
+        tag = partial.find("<", max(self.pos, len(partial) - len("<scratch>")))
+        return max(self.pos, min(cut, tag) if tag != -1 else cut)
+
+def parse_action(response: str, functions) -> ParseResult:
+    """Parse one response without keeping a parser around (e.g. re-scoring stored transcripts)"""
+    return ActionParser(functions).parse(response)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+from typing import Dict, List
+
+SYSTEM_INSTRUCTION = "You are playing a puzzle game called Zab. Follow the instructions carefully and make one function call per turn."
+
+# Function descriptions shown to the player (intentionally vague to make it a puzzle)
+FUNCTION_DESCRIPTIONS = {
+    "fin": "Fin - Takes no parameters\n      - Example: Fin()",
+    "bin": "Bin - Takes no parameters\n      - Example: Bin()",
+    "stin": "Stin - Takes a single noun\n      - Example: Stin(\"cat\")",
+    "hin": "Hin - Takes a positive integer\n      - Example: Hin(3)",
+    "min": "Min - Takes a single word\n      - Example: Min(\"hello\")",
+    "tox": "Tox - Takes no parameters\n      - Example: Tox()",
+    "plox": "Plox - Takes a number from 1-10\n      - Example: Plox(4)",
+    "rox": "Rox - Takes the name of a 2D shape\n      - Example: Rox(\"triangle\")",
+    "sox": "Sox - Takes no parameters\n      - Example: Sox()",
+    "vox": "Vox - Takes the name of an animal\n      - Example: Vox(\"elephant\")",
+    "lox": "Lox - Takes the name of a color\n      - Example: Lox(\"blue\")",
+    "mox": "Mox - Takes a number from 1-7\n      - Example: Mox(3)",
+    "hox": "Hox - Takes no parameters\n      - Example: Hox()",
+    "box": "Box - Takes the name of an animal\n      - Example: Box(\"spider\")"
+}
+
+class PromptBuilder:
+    """Builds turn prompts with the invariant rules first and the per-turn state last.
+
+    The rules and function descriptions never change during a game, so every request
+    starts with the same prefix and providers can serve it from their prompt cache.
+    In multi-turn mode the conversation is extended each turn instead of rebuilt.
+    """
+
+    def __init__(self, selected_functions, total_turns, multi_turn=False, descriptions=FUNCTION_DESCRIPTIONS):
+        self.selected_functions = selected_functions
+        self.total_turns = total_turns
+        self.multi_turn = multi_turn
+        self.descriptions = descriptions
+        self.static_prompt = self._build_static_prompt()
+        self.conversation: List[Dict[str, str]] = [
+            {"role": "system", "content": f"{SYSTEM_INSTRUCTION}\n\n{self.static_prompt}"}
+        ]
+        self.history_seen = 0  # history entries already sent in the conversation
+        self._pending_history = 0
+
+    def function_descriptions(self) -> str:
+        return "\n".join(f"    - {self.descriptions[func]}" for func in self.selected_functions)
+
+    def _build_static_prompt(self) -> str:
+        return f"""You are a Zab.
+As a Zab, you have three qualities: a name, a bim, and a pim.
+You have access to the following actions:
+{self.function_descriptions()}
+
+The game lasts {self.total_turns} turns.
+
+You can include private notes in a scratchpad by wrapping them with <scratch></scratch> tags. This information will be preserved across turns.
+
+Your goal is to figure out what all the functions do over the course of your turns. At the end, you'll be prompted to make a guess as to what each function does. It is helpful to use your <scratch></scratch> functionality to include working theories so they can be tested later.
+Submit an action after describing your current working theory for what the functions do as well as what your goal is. Include notes you'd like to pass into the future with the <scratch></scratch> tags."""
+
+    def turn_prompt(self, zab, turn, scratchpad) -> str:
+        """The turn-specific part of the prompt: state, scratchpad and history"""
+        history = zab.history_view
+        if self.multi_turn:
+            # Earlier turns are already in the conversation; only report what is new
+            entries = history[self.history_seen:]
+            self._pending_history = len(history)
+            history_label = "What happened since your last message"
+            no_entries = "No new actions since the last turn." if self.history_seen else "No actions taken yet."
+        else:
+            entries = list(history)
+            history_label = "Your history (the actions you've taken already)"
+            no_entries = "No actions taken yet."
+
+        additional_context = ""
+        if turn > 0:
+            history_text = "\n".join(entries) if entries else no_entries
+            additional_context = f"\n\n{history_label}:\n{history_text}"
+
+        return f"""This is turn {turn + 1}/{self.total_turns}.
+Your name is "{zab.name}", your bim is "{zab.bim}", and your pim is "{zab.pim}".
+
+Your scratchpad:
+{scratchpad}{additional_context}"""
+
+    def messages(self, prompt) -> List[Dict[str, str]]:
+        """Chat messages for a turn prompt: cached system prefix, then the changing content"""
+        if self.multi_turn:
+            return self.conversation + [{"role": "user", "content": prompt}]
+        return [self.conversation[0], {"role": "user", "content": prompt}]
+
+    def record(self, prompt, response):
+        """Append a finished exchange to the conversation (multi-turn mode)"""
+        if self.multi_turn:
+            self.conversation.append({"role": "user", "content": prompt})
+            self.conversation.append({"role": "assistant", "content": response})
+            self.history_seen = self._pending_history
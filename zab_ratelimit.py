@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional, Tuple
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+RETRYABLE_STATUS = {408, 409, 429}  # plus every 5xx
+
+class ModelRequestFailed(Exception):
+    """A model request that still failed after the scheduler's retries"""
+
+    def __init__(self, message, attempts=1):
+        super().__init__(message)
+        self.attempts = attempts
+
+class RequestTimeout(TimeoutError):
+    """An attempt took longer than the scheduler's timeout"""
+
+class Attempt:
+    """One copy of a request run on the scheduler's threads; cancelled when it times out or loses a hedge.
+
+    Backends find it with current_attempt() and use it to stop work nobody is waiting for.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, timeout: Optional[float] = None):
+        self.deadline = deadline  # time.monotonic() after which the scheduler stops waiting
+        self.timeout = timeout  # sets the deadline once a worker starts the attempt, if none was given
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self._callbacks = []
+
+    def start(self):
+        """Called by the worker thread; time spent waiting for a free thread does not count"""
+        if self.deadline is None and self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+        self.started.set()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def on_cancel(self, callback):
+        """Run callback when the attempt is abandoned, at once if it already was"""
+        with self.lock:
+            if not self.cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # the attempt is abandoned either way
+
+_local = threading.local()
+
+def current_attempt() -> Optional[Attempt]:
+    """The scheduler attempt running on this thread, or None outside one (no timeout or hedging)"""
+    return getattr(_local, "attempt", None)
+
+@contextmanager
+def detached():
+    """Run a block outside the current attempt, e.g. a batch that also answers other requests"""
+    attempt = current_attempt()
+    _local.attempt = None
+    try:
+        yield
+    finally:
+        _local.attempt = attempt
+
+def _run_attempt(send, attempt):
+    attempt.start()
+    _local.attempt = attempt
+    try:
+        return send()
+    finally:
+        _local.attempt = None
+
+def parse_duration(value) -> Optional[float]:
+    """Seconds from a rate-limit header value such as "1s", "6m0s", "20ms" or "0.5" """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def estimate_tokens(messages, params=None) -> int:
+    """Rough token cost of a request as rate limiters count it: prompt plus the completion budget"""
+    params = params or {}
+    prompt = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    return prompt + int(params.get("max_tokens") or params.get("max_completion_tokens") or 0)
+
+def error_headers(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+def retry_hint(error) -> Tuple[bool, Optional[float]]:
+    """Whether an error is worth retrying, and the server's Retry-After in seconds if it sent one"""
+    headers = error_headers(error)
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None and headers.get("retry-after-ms") is not None:
+        retry_after = (parse_duration(headers.get("retry-after-ms")) or 0) / 1000
+    if retry_after is None:
+        retry_after = parse_duration(headers.get("retry-after"))
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500, retry_after
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True, retry_after
+    try:
+        import openai
+        import httpx
+        return isinstance(error, (openai.APIConnectionError, httpx.TransportError)), retry_after
+    except ImportError:
+        return False, retry_after
+
+class TokenBucket:
+    """A per-minute budget that refills continuously; reservations may run it into debt"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now) -> float:
+        """Take amount and return how many seconds the caller must wait before spending it"""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def try_take(self, amount, now) -> bool:
+        """Take amount only if it is available right now"""
+        self._refill(now)
+        if self.level < min(amount, self.capacity):
+            return False
+        self.level -= min(amount, self.capacity)
+        return True
+
+    def sync(self, limit, remaining, now):
+        """Adopt the server's limit and remaining count where they are lower than ours"""
+        self._refill(now)
+        if limit:
+            self.capacity = min(self.capacity, float(limit))
+        self.level = min(self.level, self.capacity if remaining is None else float(remaining))
+
+class ModelLimits:
+    """Request and token buckets for one model, kept in step with the server's x-ratelimit headers.
+
+    The headers describe the whole API key; with `processes` sharing it, this one keeps its share.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 processes: int = 1):
+        self.processes = processes
+        self.buckets: Dict[str, TokenBucket] = {}
+        if requests_per_minute:
+            self.buckets["requests"] = TokenBucket(requests_per_minute)
+        if tokens_per_minute:
+            self.buckets["tokens"] = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _amounts(self, tokens):
+        return (("requests", 1), ("tokens", tokens))
+
+    def reserve(self, tokens=0) -> float:
+        """Reserve one request of `tokens` and return the seconds to wait before sending it"""
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            for kind, amount in self._amounts(tokens):
+                bucket = self.buckets.get(kind)
+                if bucket is not None and amount:
+                    delay = max(delay, bucket.reserve(amount, now))
+            return delay
+
+    def try_reserve(self, tokens=0) -> bool:
+        """Reserve a request only if the budget allows one right now (used for hedges)"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return False
+            for kind, amount in self._amounts(tokens):
+                bucket = self.buckets.get(kind)
+                if bucket is not None and amount and not bucket.try_take(amount, now):
+                    return False
+            return True
+
+    def pause(self, seconds):
+        """Hold every request for this model, e.g. after a 429 with Retry-After"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers):
+        """Update the buckets from x-ratelimit-{limit,remaining,reset}-{requests,tokens} headers"""
+        if not headers:
+            return
+        with self.lock:
+            now = time.monotonic()
+            for kind in ("requests", "tokens"):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit is None and remaining is None:
+                    continue
+                limit = float(limit) / self.processes if limit is not None else None
+                remaining = float(remaining) / self.processes if remaining is not None else None
+                bucket = self.buckets.get(kind)
+                if bucket is None:
+                    if not limit:
+                        continue
+                    bucket = self.buckets[kind] = TokenBucket(limit)
+                bucket.sync(limit, remaining, now)
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if remaining is not None and remaining <= 0 and reset:
+                    self.paused_until = max(self.paused_until, now + reset)
+
+class RequestScheduler:
+    """Paces model requests per model, retries transient failures with jittered backoff and hedges slow ones.
+
+    A hedge is a second copy of a request sent once the first has been out for `hedge_after`
+    seconds; whichever answers first wins. Hedges are only sent when the rate budget allows.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 timeout: Optional[float] = None, hedge_after: Optional[float] = None, seed=None, sleep=time.sleep,
+                 processes: int = 1, max_threads: int = 64):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.processes = processes  # processes sharing the API key's limits (see ModelLimits)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout  # seconds per attempt (None: the backend's own timeout)
+        self.hedge_after = hedge_after
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.limits: Dict[str, ModelLimits] = {}
+        self.lock = threading.Lock()
+        self.max_threads = max_threads  # threads running attempts that have a timeout or may be hedged
+        self._executor = None
+        self.stats = {'requests': 0, 'attempts': 0, 'retries': 0, 'rate_limited': 0, 'timeouts': 0,
+                      'hedged': 0, 'hedge_wins': 0, 'failed': 0, 'waited_s': 0.0}
+
+    def _count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def limits_for(self, model_name) -> ModelLimits:
+        limits = self.limits.get(model_name)
+        if limits is None:
+            with self.lock:
+                limits = self.limits.setdefault(model_name, ModelLimits(self.requests_per_minute,
+                                                                        self.tokens_per_minute, self.processes))
+        return limits
+
+    def observe(self, model_name, headers):
+        """Feed the rate-limit headers of a response into the model's buckets"""
+        self.limits_for(model_name).observe(headers)
+
+    def backoff(self, model_name, error, attempt) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None when a retry cannot help"""
+        retryable, retry_after = retry_hint(error)
+        if isinstance(error, RequestTimeout):
+            self._count(timeouts=1)
+        if not retryable:
+            return None
+        limits = self.limits_for(model_name)
+        limits.observe(error_headers(error))
+        # Full jitter keeps many games that failed together from retrying together
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = retry_after + self.rng.uniform(0, self.base_delay)
+        if getattr(error, "status_code", None) == 429 or retry_after is not None:
+            self._count(rate_limited=1)
+            limits.pause(delay)
+        return delay
+
+    def _failed(self, error, attempts):
+        self._count(failed=1)
+        return ModelRequestFailed(f"{type(error).__name__}: {error}", attempts)
+
+    def call(self, model_name, send, tokens=0, hedge=True):
+        """Run send() under the model's rate limits, retrying transient failures.
+
+        hedge=False never runs two copies at once (streamed answers cannot be merged).
+        """
+        limits = self.limits_for(model_name)
+        self._count(requests=1)
+        for attempt in range(self.max_retries + 1):
+            delay = limits.reserve(tokens)
+            if delay > 0:
+                self._count(waited_s=delay)
+                self.sleep(delay)
+            try:
+                return self._attempt(send, limits, tokens, hedge)
+            except Exception as e:
+                error = e
+            delay = self.backoff(model_name, error, attempt)
+            if delay is None or attempt == self.max_retries:
+                break
+            self._count(retries=1)
+            self.sleep(delay)
+        raise self._failed(error, attempt + 1) from error
+
+    def _attempt(self, send, limits, tokens, hedge=True):
+        self._count(attempts=1)
+        hedge_after = self.hedge_after if hedge else None
+        if self.timeout is None and hedge_after is None:
+            return send()
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_threads,
+                                                        thread_name_prefix="zab-request")
+        attempts = {}
+
+        def submit(deadline=None):
+            attempt = Attempt(deadline, self.timeout)
+            future = self._executor.submit(_run_attempt, send, attempt)
+            attempts[future] = attempt
+            return future
+        primary = submit()
+        pending = {primary}
+        try:
+            # With every thread busy the attempt queues; its timeout and the hedge delay start once it runs
+            attempts[primary].started.wait()
+            deadline = attempts[primary].deadline
+            if hedge_after is not None and (self.timeout is None or hedge_after < self.timeout):
+                done, _ = wait(pending, timeout=hedge_after)
+                if not done and limits.try_reserve(tokens):
+                    self._count(hedged=1, attempts=1)
+                    pending.add(submit(deadline))
+            error = None
+            while pending:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise RequestTimeout(f"No answer within {self.timeout}s")
+                for future in done:
+                    if future.exception() is None:
+                        if future is not primary:
+                            self._count(hedge_wins=1)
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # A copy that timed out or lost the hedge would otherwise keep a worker thread and the
+            # backend's concurrency slot until the server answered
+            for future in pending:
+                future.cancel()
+                attempts[future].cancel()
+
+    async def call_async(self, model_name, send, tokens=0):
+        """call() for coroutines: send is an async function"""
+        limits = self.limits_for(model_name)
+        self._count(requests=1)
+        for attempt in range(self.max_retries + 1):
+            delay = limits.reserve(tokens)
+            if delay > 0:
+                self._count(waited_s=delay)
+                await asyncio.sleep(delay)
+            try:
+                return await self._attempt_async(send, limits, tokens)
+            except Exception as e:
+                error = e
+            delay = self.backoff(model_name, error, attempt)
+            if delay is None or attempt == self.max_retries:
+                break
+            self._count(retries=1)
+            await asyncio.sleep(delay)
+        raise self._failed(error, attempt + 1) from error
+
+    async def _attempt_async(self, send, limits, tokens):
+        self._count(attempts=1)
+        if self.timeout is None and self.hedge_after is None:
+            return await send()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        primary = asyncio.ensure_future(send())
+        pending = {primary}
+        try:
+            if self.hedge_after is not None and (self.timeout is None or self.hedge_after < self.timeout):
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+                if not done and limits.try_reserve(tokens):
+                    self._count(hedged=1, attempts=1)
+                    pending.add(asyncio.ensure_future(send()))
+            error = None
+            while pending:
+                remaining = None if self.timeout is None else max(0.0, self.timeout - (loop.time() - started))
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise RequestTimeout(f"No answer within {self.timeout}s")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count(hedge_wins=1)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+def scheduler_from_env() -> RequestScheduler:
+    """Scheduler configured by ZAB_RATE_LIMIT_RPM/TPM/PROCESSES, ZAB_MAX_RETRIES, ZAB_REQUEST_TIMEOUT and ZAB_HEDGE_AFTER"""
+    return RequestScheduler(
+        requests_per_minute=float(os.getenv("ZAB_RATE_LIMIT_RPM", "0")) or None,
+        tokens_per_minute=float(os.getenv("ZAB_RATE_LIMIT_TPM", "0")) or None,
+        max_retries=int(os.getenv("ZAB_MAX_RETRIES", "4")),
+        timeout=float(os.getenv("ZAB_REQUEST_TIMEOUT", "0")) or None,
+        hedge_after=float(os.getenv("ZAB_HEDGE_AFTER", "0")) or None,
+        processes=int(os.getenv("ZAB_RATE_LIMIT_PROCESSES", "1")),
+    )
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+def default_scheduler() -> RequestScheduler:
+    """Process-wide scheduler, so every game on one API key shares the same rate budget"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = scheduler_from_env()
+        return _default_scheduler
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import time
+from typing import Dict, List
+
+from zab import oracle_hook
+from zab_ratelimit import ModelRequestFailed
+
+class ReplayMismatch(Exception):
+    """Raised when a replayed game asks for something the log does not contain"""
+
+def digest(text: str) -> str:
+    """Short stable fingerprint of a prompt or result, stored instead of the full text"""
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def results_digest(results: Dict) -> str:
+    # Timings differ on every run, so they are not part of what a replay must reproduce
+    results = {key: value for key, value in results.items() if key != 'metrics'}
+    return digest(json.dumps(results, sort_keys=True, default=str))
+
+def oracle_key(func_name, args, model_name) -> str:
+    return json.dumps([func_name, list(args), model_name])
+
+def game_classes() -> Dict[str, type]:
+    """Game classes a recording can name"""
+    from zab_game import ZabGame
+    from zab_game_oai import ZabGameOAI
+    classes = {"ZabGame": ZabGame, "ZabGameOAI": ZabGameOAI}
+    try:
+        from zab_game_async import AsyncZabGameOAI
+        classes["AsyncZabGameOAI"] = AsyncZabGameOAI
+    except ImportError:  # httpx missing
+        pass
+    return classes
+
+class _ReplayClient:
+    """Stands in for an API client during replay; any real call is a bug"""
+    api_key = "replay"
+
+    def __getattr__(self, attr):
+        raise ReplayMismatch("Replayed game tried to use its API client directly")
+
+def request_text(game, prompt) -> str:
+    """Everything the model would see for a prompt, including chat system messages"""
+    if hasattr(game, "build_request"):
+        return json.dumps(game.build_request(prompt), sort_keys=True)
+    return prompt
+
+def _record_calls(game, record):
+    """Report every model call of this game instance to record(request text, response, error)"""
+    call = game.get_llm_response
+
+    def get_llm_response(prompt, stop=None):
+        request = request_text(game, prompt)
+        try:
+            response = call(prompt, stop)
+        except ModelRequestFailed as e:
+            record(request, None, e)
+            raise
+        record(request, response)
+        return response
+    game.get_llm_response = get_llm_response
+
+    if hasattr(game, "get_llm_response_async"):
+        call_async = game.get_llm_response_async
+
+        async def get_llm_response_async(prompt):
+            request = request_text(game, prompt)
+            try:
+                response = await call_async(prompt)
+            except ModelRequestFailed as e:
+                record(request, None, e)
+                raise
+            record(request, response)
+            return response
+        game.get_llm_response_async = get_llm_response_async
+
+def _replay_calls(game, answer):
+    """Serve every model call of this game instance from answer(request text)"""
+    def get_llm_response(prompt, stop=None):
+        response = answer(request_text(game, prompt))
+        # Multi-turn games extend their conversation on every successful response
+        if hasattr(game, "prompts"):
+            game.prompts.record(prompt, response)
+        return response
+    game.get_llm_response = get_llm_response
+
+    if hasattr(game, "get_llm_response_async"):
+        async def get_llm_response_async(prompt):
+            return get_llm_response(prompt)
+        game.get_llm_response_async = get_llm_response_async
+
+class GameRecorder:
+    """Captures every model response and oracle answer of a game to a compact JSONL log"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events: List[Dict] = []
+
+    def _model(self, request, response, error=None):
+        event = {'type': 'model', 'prompt': digest(request), 'response': response}
+        if error is not None:
+            event.update(error=str(error), attempts=error.attempts)
+        self.events.append(event)
+
+    def _oracle(self, func_name, args, prompt, model_name, ask):
+        answer = ask(func_name, args, prompt, model_name)
+        self.events.append({'type': 'oracle', 'func': func_name, 'args': list(args), 'model': model_name,
+                            'answer': answer})
+        return answer
+
+    def play(self, game) -> Dict:
+        """Play the game live, writing the log when it finishes (or fails)"""
+        header = {
+            'type': 'game',
+            'game': type(game).__name__,
+            'model_name': game.model_name,
+            'oracle_model': game.oracle_model,
+            'total_turns': game.total_turns,
+            'available_functions': game.available_functions,
+            'seed': game.seed,
+            'selected_functions': game.selected_functions,
+            'multi_turn': getattr(getattr(game, "prompts", None), "multi_turn", False),
+        }
+        _record_calls(game, self._model)
+        token = oracle_hook.set(self._oracle)
+        results = None
+        try:
+            results = game.play_game()
+            return results
+        finally:
+            oracle_hook.reset(token)
+            with open(self.path, "w") as f:
+                for event in [header] + self.events:
+                    f.write(json.dumps(event) + "\n")
+                if results is not None:
+                    f.write(json.dumps({'type': 'result', 'digest': results_digest(results)}) + "\n")
+
+class GameReplayer:
+    """Replays a recorded game without any model: bit-for-bit (strict) or by response order"""
+
+    def __init__(self, path: str, strict: bool = True, live_oracle: bool = False):
+        self.strict = strict  # prompts, oracle calls and results must match the recording exactly
+        self.live_oracle = live_oracle  # ask the real oracle for questions the log never saw
+        self.header = None
+        self.result_digest = None
+        self.model_events: List[Dict] = []
+        self.oracle_events: List[Dict] = []
+        with open(path) as f:
+            for line in f:
+                event = json.loads(line)
+                if event['type'] == 'game':
+                    self.header = event
+                elif event['type'] == 'model':
+                    self.model_events.append(event)
+                elif event['type'] == 'oracle':
+                    self.oracle_events.append(event)
+                elif event['type'] == 'result':
+                    self.result_digest = event['digest']
+        if self.header is None:
+            raise ValueError(f"{path} is not a game recording")
+        self.oracle_answers = {oracle_key(e['func'], e['args'], e['model']): e['answer'] for e in self.oracle_events}
+
+    def build_game(self, game_class=None, **overrides):
+        """Recreate the recorded game (same seed and functions) with no model client attached"""
+        header = self.header
+        game_class = game_class or game_classes()[header['game']]
+        kwargs = dict(total_turns=header['total_turns'], model_name=header['model_name'],
+                      oracle_model=header['oracle_model'], available_functions=header['available_functions'],
+                      seed=header['seed'], verbose=False)
+        if header['game'] != "ZabGame":
+            kwargs.update(client=_ReplayClient(), multi_turn=header.get('multi_turn', False))
+        kwargs.update(overrides)
+        game = game_class(**kwargs)
+        if game.selected_functions != header['selected_functions']:
+            raise ReplayMismatch(f"Seed {header['seed']} selected {game.selected_functions}, "
+                                 f"recording has {header['selected_functions']}")
+        return game
+
+    def play(self, game=None) -> Dict:
+        """Replay the game and return its results"""
+        game = game or self.build_game()
+        model_events = iter(self.model_events)
+        oracle_events = iter(self.oracle_events)
+
+        def respond(request):
+            event = next(model_events, None)
+            if event is None:
+                raise ReplayMismatch("Game asked the model more often than the recording")
+            if self.strict and event['prompt'] != digest(request):
+                raise ReplayMismatch("Prompt differs from the recording")
+            if event.get('error') is not None:
+                raise ModelRequestFailed(event['error'], event.get('attempts', 1))
+            return event['response']
+
+        def oracle(func_name, args, prompt, model_name, ask):
+            if self.strict:
+                event = next(oracle_events, None)
+                if event is None or (event['func'], event['args'], event['model']) != (func_name, list(args), model_name):
+                    raise ReplayMismatch(f"Unexpected oracle call {func_name}{tuple(args)}")
+                return event['answer']
+            answer = self.oracle_answers.get(oracle_key(func_name, args, model_name))
+            if answer is None:
+                if not self.live_oracle:
+                    raise ReplayMismatch(f"No recorded oracle answer for {func_name}{tuple(args)}")
+                answer = ask(func_name, args, prompt, model_name)
+            return answer
+
+        _replay_calls(game, respond)
+        token = oracle_hook.set(oracle)
+        try:
+            results = game.play_game()
+        finally:
+            oracle_hook.reset(token)
+        if self.strict and self.result_digest and results_digest(results) != self.result_digest:
+            raise ReplayMismatch("Replayed results differ from the recording")
+        return results
+
+def main():
+    """Replay a recorded game, optionally many times to profile the engine"""
+    parser = argparse.ArgumentParser(description="Replay a recorded Zab game without a model server")
+    parser.add_argument("log", help="JSONL recording written by GameRecorder")
+    parser.add_argument("--loose", action="store_true", help="replay responses in order even if prompts changed")
+    parser.add_argument("--live-oracle", action="store_true", help="ask the oracle model for unrecorded questions")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    replayer = GameReplayer(args.log, strict=not args.loose, live_oracle=args.live_oracle)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        results = replayer.play()
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {args.repeat} game(s) in {elapsed:.3f}s ({elapsed / args.repeat * 1000:.2f} ms each)")
+    print(f"Final state: {results['final_state']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import hashlib
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+class QueueFullError(Exception):
+    """Raised when the admission queue has no room for another game"""
+
+class SchedulerShutdownError(Exception):
+    """Raised when submitting to a scheduler that is shutting down"""
+
+def api_key_bucket(api_key: Optional[str]) -> str:
+    """Concurrency bucket for an API key, without keeping the key itself around"""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+class GameJob:
+    """A queued unit of work plus the callbacks that report its progress"""
+    __slots__ = ("job_id", "key", "run", "on_position", "on_cancel", "position")
+
+    def __init__(self, job_id, key, run, on_position=None, on_cancel=None):
+        self.job_id = job_id
+        self.key = key
+        self.run = run
+        self.on_position = on_position  # called with the 1-based queue position (0 once started)
+        self.on_cancel = on_cancel  # called if the job is dropped at shutdown
+        self.position = None
+
+class GameScheduler:
+    """Fixed pool of worker threads fed by a bounded admission queue with per-key limits"""
+
+    def __init__(self, max_workers: int = 8, max_queue: int = 32, per_key_limit: Optional[int] = 4):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.per_key_limit = per_key_limit
+        self.queue: "deque[GameJob]" = deque()
+        self.running: Dict[str, GameJob] = {}
+        self.running_per_key: Dict[str, int] = {}
+        self.condition = threading.Condition()
+        self.accepting = True
+        self.stopping = False
+        self.completed = 0
+        self.failed = 0
+        self.workers = [threading.Thread(target=self._worker, name=f"zab-game-{i}", daemon=True)
+                        for i in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job_id: str, run: Callable[[], None], key: str = "default",
+               on_position: Optional[Callable[[int], None]] = None,
+               on_cancel: Optional[Callable[[], None]] = None) -> int:
+        """Queue a job; returns its queue position (0 if a worker can take it right away)"""
+        job = GameJob(job_id, key, run, on_position, on_cancel)
+        with self.condition:
+            if not self.accepting:
+                raise SchedulerShutdownError("Server is shutting down")
+            if len(self.queue) >= self.max_queue:
+                raise QueueFullError(f"Game queue is full ({self.max_queue} waiting)")
+            self.queue.append(job)
+            updates = self._report_positions()
+            self.condition.notify_all()
+            position = job.position
+        self._notify(updates)
+        return position
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Current queue position of a job, 0 if running, None if unknown or finished"""
+        with self.condition:
+            if job_id in self.running:
+                return 0
+            for job in self.queue:
+                if job.job_id == job_id:
+                    return job.position
+            return None
+
+    def _runnable(self, job: GameJob, running_per_key: Optional[Dict[str, int]] = None) -> bool:
+        running = (self.running_per_key if running_per_key is None else running_per_key).get(job.key, 0)
+        return self.per_key_limit is None or running < self.per_key_limit
+
+    def _report_positions(self):
+        """Recompute queue positions, counting idle capacity as position 0 (caller holds the lock)
+
+        Returns the position callbacks to make; call them with _notify once the lock is released.
+        """
+        updates = []
+        free = self.max_workers - len(self.running)
+        starting = dict(self.running_per_key)  # includes queued jobs about to be picked up
+        waiting = 0
+        for job in self.queue:
+            if free > 0 and self._runnable(job, starting):
+                position = 0
+                free -= 1
+                starting[job.key] = starting.get(job.key, 0) + 1
+            else:
+                waiting += 1
+                position = waiting
+            if position != job.position:
+                job.position = position
+                if job.on_position:
+                    updates.append((job.on_position, position))
+        return updates
+
+    @staticmethod
+    def _notify(updates):
+        """Run position callbacks outside the scheduler lock; they may take locks of their own"""
+        for on_position, position in updates:
+            on_position(position)
+
+    def _next_job(self) -> Optional[GameJob]:
+        """Take the oldest job whose key is under its limit (caller holds the lock)"""
+        for job in self.queue:
+            if self._runnable(job):
+                self.queue.remove(job)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = None
+                while not self.stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self.condition.wait()
+                if job is None:
+                    return
+                self.running[job.job_id] = job
+                self.running_per_key[job.key] = self.running_per_key.get(job.key, 0) + 1
+                updates = []
+                if job.position != 0:
+                    job.position = 0
+                    if job.on_position:
+                        updates.append((job.on_position, 0))
+                updates += self._report_positions()
+            self._notify(updates)
+
+            try:
+                job.run()
+                succeeded = True
+            except Exception:
+                succeeded = False
+
+            with self.condition:
+                del self.running[job.job_id]
+                self.running_per_key[job.key] -= 1
+                if not self.running_per_key[job.key]:
+                    del self.running_per_key[job.key]
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                updates = self._report_positions()
+                self.condition.notify_all()
+            self._notify(updates)
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {
+                'max_workers': self.max_workers,
+                'running': len(self.running),
+                'queued': len(self.queue),
+                'max_queue': self.max_queue,
+                'per_key_limit': self.per_key_limit,
+                'running_per_key': len(self.running_per_key),
+                'completed': self.completed,
+                'failed': self.failed,
+                'accepting': self.accepting
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = True, timeout: Optional[float] = None):
+        """Stop accepting games, drop (or drain) the queue and wait for running games"""
+        with self.condition:
+            self.accepting = False
+            dropped = []
+            if cancel_pending:
+                dropped = list(self.queue)
+                self.queue.clear()
+            if not wait:
+                self.stopping = True
+            self.condition.notify_all()
+        for job in dropped:
+            if job.on_cancel:
+                job.on_cancel()
+        if wait:
+            with self.condition:
+                self.condition.wait_for(lambda: not self.queue and not self.running, timeout)
+                self.stopping = True
+                self.condition.notify_all()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import re
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Optional
+
+from zab import Zab, ZabFunctions, ORACLE_MODEL, KNOWLEDGE_QUESTIONS, oracle_cache, bim_to_index
+from zab_colors import BIM_COLORS, lox_index, snap_color, snap_color_index
+from zab_knowledge import knowledge
+from zab_parser import parse_args
+
+# Bump when the hypotheses or probes change so old and new scores are not mixed up
+RUBRIC_VERSION = 3
+
+ROYGBIV = ("Red", "Orange", "Yellow", "Green", "Blue", "Indigo", "Violet")
+
+# Functions whose effect can be computed without asking the oracle model
+DETERMINISTIC_PROBES = {
+    "fin": [()], "bin": [()], "tox": [()], "sox": [()], "hox": [()], "vin": [()], "cin": [()],
+    "hin": [(1,), (3,), (10,)],
+    "min": [("hello",), ("x",), ("Zab",)],
+    "plox": [(1,), (4,), (10,)],
+    "mox": [(i,) for i in range(1, 8)],
+    "rox": [("triangle",), ("square",), ("hexagon",), ("circle",)],
+    "lox": [("Yellow",), ("Blue",), ("White",), ("Black",)],
+}
+PROBE_STATES = [("Cama", "Red", 1), ("Zorblax", "Blue", 7), ("ab", "Violet", -3)]
+
+HISTORY_PATTERN = re.compile(
+    r'^\(name: (.*), bim: (\w+), pim: (-?\d+)\) -> (\w+)\((.*)\) -> \(name: (.*), bim: (\w+), pim: (-?\d+)\)$')
+QUALITY_PATTERN = re.compile(r'\b(name|bim|pim)s?\b', re.IGNORECASE)
+
+class Hypothesis:
+    """A guessable behaviour: keywords that express it and a simulator for it"""
+    __slots__ = ("name", "quality", "pattern", "predict")
+
+    def __init__(self, name: str, quality: str, pattern: str, predict: Callable):
+        self.name = name
+        self.quality = quality  # "name", "bim", "pim" or "all"
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.predict = predict  # (state, args, oracle_model) -> new state, or None if it cannot tell
+
+def _cached(func_name, args, oracle_model) -> Optional[str]:
+    # The knowledge table or previously paid-for answers; re-scoring never calls the oracle model
+    question = KNOWLEDGE_QUESTIONS.get(func_name)
+    if question is not None:
+        known = knowledge.lookup(question[0], args[0], question[1])
+        if known is not None:
+            return str(known)
+    return oracle_cache.get(func_name, args, oracle_model)
+
+def _int_arg(args) -> Optional[int]:
+    if len(args) == 1 and isinstance(args[0], int):
+        return args[0]
+    return None
+
+def _str_arg(args) -> Optional[str]:
+    if len(args) == 1 and isinstance(args[0], str) and args[0]:
+        return args[0]
+    return None
+
+def _first_n(state, args, oracle_model):
+    n = _int_arg(args)
+    return (state[0][:n], state[1], state[2]) if n and n > 0 else None
+
+def _drop_first(state, args, oracle_model):
+    word = _str_arg(args)
+    return (word[1:] or "unnamed", state[1], state[2]) if word else None
+
+def _to_input(state, args, oracle_model):
+    word = _str_arg(args)
+    return (word, state[1], state[2]) if word else None
+
+def _spanish(state, args, oracle_model):
+    word = _str_arg(args)
+    translation = word and _cached("stin", (word,), oracle_model)
+    return (translation, state[1], state[2]) if translation else None
+
+def _add_input(state, args, oracle_model):
+    n = _int_arg(args)
+    return (state[0], state[1], state[2] + n) if n is not None else None
+
+def _add_sides(state, args, oracle_model):
+    shape = _str_arg(args)
+    if not shape:
+        return None
+    answer = _cached("rox", (shape,), oracle_model)
+    if answer is None or not answer.strip().isdigit():
+        return None
+    return (state[0], state[1], state[2] + int(answer))
+
+def _roygbiv(state, args, oracle_model):
+    i = _int_arg(args)
+    return (state[0], ROYGBIV[i - 1], state[2]) if i and 1 <= i <= 7 else None
+
+def _animal_color(state, args, oracle_model):
+    animal = _str_arg(args)
+    color = animal and snap_color(_cached("vox", (animal,), oracle_model) or _cached("box_color", (animal,), oracle_model))
+    return (state[0], color, state[2]) if color else None
+
+def _mix_color(state, args, oracle_model):
+    color = _str_arg(args)
+    target = color and snap_color_index(color)
+    if color and target is None:
+        target = snap_color_index(_cached("color", (color,), oracle_model))
+    return (state[0], BIM_COLORS[lox_index(bim_to_index(state[1]), target)], state[2]) if target is not None else None
+
+def _animal_legs(state, args, oracle_model):
+    animal = _str_arg(args)
+    legs = animal and _cached("box_legs", (animal,), oracle_model)
+    if not legs or not legs.strip().isdigit():
+        return None
+    color = snap_color(_cached("box_color", (animal,), oracle_model))
+    return (state[0], color or state[1], int(legs))
+
+HYPOTHESES: List[Hypothesis] = [
+    Hypothesis("reverse_name", "name", r"revers|backwards?|mirror|flip",
+               lambda s, a, m: (s[0][::-1], s[1], s[2])),
+    Hypothesis("bad_name", "name", r"bad name|please change me",
+               lambda s, a, m: ("bad name, please change me immediately!", s[1], s[2])),
+    Hypothesis("first_n_chars", "name", r"first\s+(?:\w+\s+)?(?:char|letter)|truncat|shorten|prefix", _first_n),
+    Hypothesis("drop_first_char", "name",
+               r"(?:remov|drop|delet|strip|without|minus|except|skip)\w*\s+(?:the\s+)?first\s+(?:char|letter)|all but the first",
+               _drop_first),
+    Hypothesis("name_to_input", "name",
+               r"(?:name|it)\s+(?:becomes|is set to|changes to|is replaced (?:by|with))\s+(?:the\s+)?(?:input|argument|word|given)",
+               _to_input),
+    Hypothesis("spanish_name", "name", r"spanish|translat", _spanish),
+    Hypothesis("double_pim", "pim", r"doubl|twice|multipl\w*\s+(?:it\s+|pim\s+)?by\s+(?:2|two)|times\s+(?:2|two)|\bx\s?2\b",
+               lambda s, a, m: (s[0], s[1], s[2] * 2)),
+    Hypothesis("add_input", "pim", r"\badd|plus|increas|sum\b", _add_input),
+    Hypothesis("add_sides", "pim", r"\bsides|edges|vertices|corners", _add_sides),
+    Hypothesis("set_red", "bim", r"\bred\b", lambda s, a, m: (s[0], "Red", s[2])),
+    Hypothesis("roygbiv", "bim", r"roygbiv|rainbow|spectrum", _roygbiv),
+    Hypothesis("animal_color", "bim", r"colou?r\s+(?:of|associated with)\s+(?:the\s+)?animal|animal'?s?\s+colou?r", _animal_color),
+    Hypothesis("mix_color", "bim", r"between|\bmix|blend|intermediate|average|midpoint|combin", _mix_color),
+    Hypothesis("reset", "all", r"reset|default|initial|original", lambda s, a, m: ("Cama", "Red", 1)),
+    Hypothesis("animal_legs", "all", r"\blegs?\b", _animal_legs),
+]
+
+def parse_history_entry(text: str):
+    """Turn a history line back into (old state, func_name, args, new state)"""
+    match = HISTORY_PATTERN.match(text)
+    if not match:
+        return None
+    old = (match.group(1), match.group(2), int(match.group(3)))
+    new = (match.group(6), match.group(7), int(match.group(8)))
+    return old, match.group(4), tuple(parse_args(match.group(5))), new
+
+def extract_guesses(analysis: str, functions) -> Dict[str, str]:
+    """Split a final analysis into the text written about each function"""
+    names = "|".join(re.escape(f) for f in functions)
+    # The header takes the markdown around the name with it: "- **fin()**: ..." leaves "..."
+    header = re.compile(rf'^[\s>*#\-\d.`_]*\s*({names})\b(?:\([^)\n]*\))?[*_`]*\s*[:\-\u2013\u2014]?[*_`]*',
+                        re.IGNORECASE | re.MULTILINE)
+    headers = list(header.finditer(analysis or ""))
+    guesses = {func: "" for func in functions}
+    for i, match in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(analysis)
+        guesses[match.group(1).lower()] += analysis[match.end():end].strip()
+    # Fall back to any sentence mentioning the function
+    for func in functions:
+        if not guesses[func]:
+            sentences = re.findall(rf'[^.\n]*\b{re.escape(func)}\b[^.\n]*', analysis or "", re.IGNORECASE)
+            guesses[func] = " ".join(s.strip() for s in sentences)
+    return guesses
+
+def simulate(func_name: str, state, args):
+    """Run a registry function on a state (deterministic functions only)"""
+    zab = Zab(0, name=state[0], bim=state[1], pim=state[2])
+    new_zab = ZabFunctions.registry[func_name](zab, *args)
+    return new_zab.name, new_zab.bim, new_zab.pim
+
+@lru_cache(maxsize=None)
+def simulated_probes(func_name: str) -> tuple:
+    """Probe cases for a deterministic function; the same for every transcript"""
+    return tuple((state, args, simulate(func_name, state, args))
+                 for args in DETERMINISTIC_PROBES.get(func_name, []) for state in PROBE_STATES)
+
+def probes_for(func_name: str, observed) -> List[tuple]:
+    """(state, args, true new state) cases: simulated ones plus transitions seen in the game"""
+    cases = list(simulated_probes(func_name))
+    cases.extend((old, args, new) for old, name, args, new in observed if name == func_name)
+    return cases
+
+def score_hypothesis(hypothesis: Hypothesis, cases, oracle_model) -> Optional[float]:
+    """Fraction of evaluable cases the hypothesis predicts exactly, None if none were evaluable"""
+    evaluated = correct = 0
+    for state, args, expected in cases:
+        try:
+            predicted = hypothesis.predict(state, args, oracle_model)
+        except Exception:
+            predicted = None
+        if predicted is None:
+            continue
+        evaluated += 1
+        correct += predicted == expected
+    return correct / evaluated if evaluated else None
+
+def score_transcript(result: Dict) -> Dict:
+    """Grade each function guess in a finished game against the simulator"""
+    functions = [f.lower() for f in result['selected_functions']]
+    oracle_model = result.get('oracle_model') or ORACLE_MODEL
+    observed = [entry for entry in map(parse_history_entry, result.get('history') or []) if entry]
+    guesses = extract_guesses(result.get('final_analysis') or "", functions)
+
+    graded = {}
+    for func in functions:
+        guess = guesses[func]
+        cases = probes_for(func, observed)
+        matched = [h for h in HYPOTHESES if h.pattern.search(guess)]
+        best, best_score = None, 0.0
+        for hypothesis in matched:
+            accuracy = score_hypothesis(hypothesis, cases, oracle_model)
+            if accuracy is not None and accuracy > best_score:
+                best, best_score = hypothesis.name, accuracy
+        graded[func] = {
+            'guess': guess,
+            'hypotheses': [h.name for h in matched],
+            'best_hypothesis': best,
+            'accuracy': best_score,
+            'probes': len(cases),
+            'qualities_mentioned': sorted({q.lower() for q in QUALITY_PATTERN.findall(guess)}),
+        }
+    return {
+        'rubric_version': RUBRIC_VERSION,
+        'score': sum(g['accuracy'] for g in graded.values()) / len(graded) if graded else 0.0,
+        'functions': graded,
+    }
+
+def score_line(line: str) -> Optional[Dict]:
+    """Score one JSONL record, either a bare game result or a sweep record with a 'result' key"""
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    result = record.get('result', record)
+    if 'selected_functions' not in result:
+        return {'config': record.get('config'), 'error': record.get('error', "no game result")}
+    scored = score_transcript(result)
+    scored['config'] = record.get('config') or {'model_name': result.get('model_name'), 'seed': result.get('seed')}
+    return scored
+
+def score_file(input_path: str, output_path: str, workers: int = 4, chunksize: int = 64) -> Dict:
+    """Stream a transcript archive through a process pool, writing one score per line"""
+    total = errors = 0
+    score_sum = 0.0
+    with open(input_path) as lines, open(output_path, "w") as out, Pool(workers) as pool:
+        # Pool.imap's feeder thread would read the whole file ahead of the workers, so hand it a few
+        # chunks per worker at a time; memory stays bounded however large the archive is
+        while True:
+            batch = list(itertools.islice(lines, workers * chunksize * 4))
+            if not batch:
+                break
+            for scored in pool.imap(score_line, batch, chunksize):
+                if scored is None:
+                    continue
+                out.write(json.dumps(scored) + "\n")
+                total += 1
+                if 'error' in scored:
+                    errors += 1
+                else:
+                    score_sum += scored['score']
+    graded = total - errors
+    return {'games': total, 'errors': errors, 'mean_score': score_sum / graded if graded else None,
+            'rubric_version': RUBRIC_VERSION}
+
+def main():
+    """Re-score stored transcripts from the command line"""
+    parser = argparse.ArgumentParser(description="Re-score stored Zab game transcripts offline")
+    parser.add_argument("input", help="JSONL of game results or benchmark sweep records")
+    parser.add_argument("--output", default="zab_scores.jsonl")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunksize", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(score_file(args.input, args.output, args.workers, args.chunksize), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from zab import BIM_COLORS, ORACLE_MODEL, bim_to_index
+from zab_batch import NAME_DTYPE, BatchFunctions, ZabBatch
+from zab_scoring import DETERMINISTIC_PROBES, HYPOTHESES, simulate
+
+# Arguments tried for each function: the scoring probes, every plox step, and animals in the knowledge table
+CALL_ARGUMENTS = dict(DETERMINISTIC_PROBES,
+                      plox=[(n,) for n in range(1, 11)],
+                      vox=[("cat",), ("flamingo",), ("frog",), ("spider",)],
+                      box=[("spider",), ("snake",), ("flamingo",), ("ant",)])
+
+class StateSpace:
+    """Zab states packed into int64 keys, with memoized per-quality transitions for a set of functions.
+
+    Every zab function changes each quality as a function of that quality alone (or sets it to a
+    constant), so a call's effect is a name map, a bim map and a pim map. Name and bim maps are
+    computed once per call; pims are transformed per search layer on the unique values only.
+    """
+
+    def __init__(self, functions: Sequence[str], max_pim: int = 1000, arguments: Optional[Dict] = None):
+        arguments = CALL_ARGUMENTS if arguments is None else arguments
+        unsupported = [f for f in functions if f not in BatchFunctions.registry]
+        if unsupported:
+            raise ValueError(f"No batch implementation for: {', '.join(unsupported)} (it needs the oracle)")
+        self.max_pim = max_pim
+        self.span = 2 * max_pim + 1
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.actions: List[Tuple[str, tuple]] = []
+        for func_name in functions:
+            for args in arguments.get(func_name, [()]):
+                try:
+                    self._apply((func_name, args), ["Cama"], [0], [1])
+                except ValueError:
+                    continue  # e.g. an animal missing from the knowledge table
+                self.actions.append((func_name, tuple(args)))
+        n = len(BIM_COLORS)
+        self.bim_maps = [self._apply(action, ["Cama"] * n, np.arange(n), np.ones(n, dtype=np.int64)).bims
+                         for action in self.actions]
+        self.name_maps = [np.zeros(0, dtype=np.int64) for _ in self.actions]
+
+    @staticmethod
+    def _apply(action, names, bims, pims) -> ZabBatch:
+        func_name, args = action
+        return ZabBatch(np.asarray(names, dtype=NAME_DTYPE), np.asarray(bims, dtype=np.int8), pims).apply(func_name, *args)
+
+    def intern(self, name: str) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def pack(self, name_ids, bims, pims) -> np.ndarray:
+        bims = np.asarray(bims, dtype=np.int64)
+        return (np.asarray(name_ids, dtype=np.int64) * len(BIM_COLORS) + bims) * self.span + (np.asarray(pims, dtype=np.int64) + self.max_pim)
+
+    def unpack(self, keys: np.ndarray):
+        rest, pims = np.divmod(keys, self.span)
+        name_ids, bims = np.divmod(rest, len(BIM_COLORS))
+        return name_ids, bims, pims - self.max_pim
+
+    def key(self, state) -> int:
+        name, bim, pim = state
+        if abs(pim) > self.max_pim:
+            raise ValueError(f"pim {pim} is outside the search range ±{self.max_pim}")
+        return int(self.pack([self.intern(name)], [bim_to_index(bim)], [pim])[0])
+
+    def state(self, key: int) -> tuple:
+        name_id, bim, pim = (int(v[0]) for v in self.unpack(np.array([key], dtype=np.int64)))
+        return self.names[name_id], BIM_COLORS[bim], pim
+
+    def _extend_name_maps(self):
+        # New names only ever need one batch call per action; the maps are reused by every later layer
+        known = len(self.names)
+        for i, action in enumerate(self.actions):
+            done = len(self.name_maps[i])
+            if done < known:
+                new_names = self._apply(action, self.names[done:known], np.zeros(known - done), np.ones(known - done, dtype=np.int64)).names
+                ids = np.array([self.intern(str(name)) for name in new_names], dtype=np.int64)
+                self.name_maps[i] = np.concatenate([self.name_maps[i], ids])
+
+    def successors(self, keys: np.ndarray):
+        """Yield (action index, child keys, in-range mask) for every action applied to every key"""
+        name_ids, bims, pims = self.unpack(keys)
+        self._extend_name_maps()
+        unique_pims, inverse = np.unique(pims, return_inverse=True)
+        n = len(unique_pims)
+        for i, action in enumerate(self.actions):
+            new_pims = self._apply(action, ["Cama"] * n, np.zeros(n), unique_pims).pims
+            if new_pims.dtype == object:  # widened past int64
+                in_range = np.array([abs(p) <= self.max_pim for p in new_pims.tolist()], dtype=bool)
+            else:
+                in_range = np.abs(new_pims) <= self.max_pim
+            new_pims = np.where(in_range, new_pims, 0).astype(np.int64)
+            yield i, self.pack(self.name_maps[i][name_ids], self.bim_maps[i][bims], new_pims[inverse]), in_range[inverse]
+
+    def matcher(self, target) -> Callable[[np.ndarray], np.ndarray]:
+        """Mask function for keys matching a (name, bim, pim) target; None matches anything"""
+        name, bim, pim = target
+        bim = None if bim is None else bim_to_index(bim)
+
+        def match(keys):
+            name_ids, bims, pims = self.unpack(keys)
+            mask = np.ones(len(keys), dtype=bool)
+            if name is not None:
+                mask &= name_ids == self.name_ids.get(name, -1)
+            if bim is not None:
+                mask &= bims == bim
+            if pim is not None:
+                mask &= pims == pim
+            return mask
+        return match
+
+    def _expand(self, keys: np.ndarray, visited: np.ndarray):
+        # Children of a slice of the frontier that are not yet visited: (keys, parent index, action index)
+        children, parent_index, action_index = [], [], []
+        for i, child, in_range in self.successors(keys):
+            kept = np.flatnonzero(in_range)
+            children.append(child[kept])
+            parent_index.append(kept.astype(np.int32))
+            action_index.append(np.full(len(kept), i, dtype=np.int16))
+        if not children:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int16)
+        unique, first = np.unique(np.concatenate(children), return_index=True)
+        position = np.minimum(np.searchsorted(visited, unique), len(visited) - 1)
+        new = visited[position] != unique
+        first = first[new]
+        return unique[new], np.concatenate(parent_index)[first], np.concatenate(action_index)[first]
+
+    def explore(self, start, depth: int, max_states: Optional[int] = None, stop: Optional[Callable] = None,
+                chunk_size: int = 1 << 22) -> 'Exploration':
+        """Breadth-first layers of states first reached after 0..depth calls.
+
+        The frontier is expanded in slices of about chunk_size children, so peak memory stays near
+        the size of the visited set rather than the branching factor times the frontier.
+        """
+        keys = np.array([self.key(start)], dtype=np.int64)
+        layers, parents, moves = [keys], [np.zeros(1, dtype=np.int32)], [np.full(1, -1, dtype=np.int16)]
+        visited = keys  # sorted, so membership is a binary search
+        truncated = False
+        step = max(1, chunk_size // max(1, len(self.actions)))
+        for _ in range(depth):
+            frontier = layers[-1]
+            if stop is not None and stop(frontier).any():
+                break
+            found, parent_index, action_index = [], [], []
+            for offset in range(0, len(frontier), step):
+                new_keys, parent, move = self._expand(frontier[offset:offset + step], visited)
+                found.append(new_keys)
+                parent_index.append(parent + offset)
+                action_index.append(move)
+            # Ties go to the earliest parent slice, then the earliest action
+            unique, first = np.unique(np.concatenate(found), return_index=True)
+            if not len(unique):
+                break
+            layers.append(unique)
+            parents.append(np.concatenate(parent_index)[first])
+            moves.append(np.concatenate(action_index)[first])
+            visited = np.union1d(visited, unique)
+            if max_states is not None and len(visited) >= max_states:
+                truncated = True
+                break
+        return Exploration(self, layers, parents, moves, truncated)
+
+class Exploration:
+    """Result of a breadth-first search: per-layer sorted keys plus the parent and call that reached each"""
+
+    def __init__(self, space: StateSpace, layers, parents, moves, truncated=False):
+        self.space = space
+        self.layers = layers
+        self.parents = parents  # index into the previous layer
+        self.moves = moves  # index into space.actions
+        self.truncated = truncated  # stopped at max_states before the requested depth
+
+    def __len__(self):
+        return sum(len(layer) for layer in self.layers)
+
+    def layer_sizes(self) -> List[int]:
+        return [len(layer) for layer in self.layers]
+
+    def find(self, target) -> Optional[Tuple[int, int]]:
+        """(distance, index) of the nearest state matching a (name, bim, pim) target, or None"""
+        match = self.space.matcher(target)
+        for distance, layer in enumerate(self.layers):
+            hits = np.flatnonzero(match(layer))
+            if len(hits):
+                return distance, int(hits[0])
+        return None
+
+    def path(self, distance: int, index: int) -> List[Tuple[str, tuple]]:
+        """Calls leading from the start state to a state in the given layer"""
+        calls = []
+        while distance > 0:
+            calls.append(self.space.actions[int(self.moves[distance][index])])
+            index = int(self.parents[distance][index])
+            distance -= 1
+        return calls[::-1]
+
+    def states(self, distance: int) -> List[tuple]:
+        return [self.space.state(int(key)) for key in self.layers[distance]]
+
+def shortest_path(functions, start, target, max_depth: int = 10, max_pim: int = 1000,
+                  max_states: Optional[int] = None) -> Optional[List[Tuple[str, tuple]]]:
+    """Fewest calls from start to a state matching target (None fields match anything), or None"""
+    space = StateSpace(functions, max_pim)
+    exploration = space.explore(start, max_depth, max_states, stop=space.matcher(target))
+    found = exploration.find(target)
+    return None if found is None else exploration.path(*found)
+
+def reachable(functions, start, target, max_depth: int = 10, max_pim: int = 1000) -> bool:
+    return shortest_path(functions, start, target, max_depth, max_pim) is not None
+
+def consistent_hypotheses(func_name: str, observed=(), oracle_model: str = ORACLE_MODEL) -> List:
+    """Hypotheses from zab_scoring that explain every observed (old, func, args, new) transition"""
+    cases = [(old, args, new) for old, name, args, new in observed if name == func_name]
+    remaining = []
+    for hypothesis in HYPOTHESES:
+        for old, args, new in cases:
+            try:
+                predicted = hypothesis.predict(old, args, oracle_model)
+            except Exception:
+                predicted = None
+            if predicted != new:  # includes hypotheses that cannot apply to these arguments
+                break
+        else:
+            remaining.append(hypothesis)
+    return remaining
+
+def information_gain(hypotheses, state, args, oracle_model: str = ORACLE_MODEL) -> float:
+    """Expected bits learned about a function from one call, under a uniform prior over the hypotheses.
+
+    Hypotheses that cannot apply to the call share one outcome: any real result rules them out.
+    """
+    outcomes: Dict[Optional[tuple], int] = {}
+    for hypothesis in hypotheses:
+        try:
+            predicted = hypothesis.predict(state, args, oracle_model)
+        except Exception:
+            predicted = None
+        outcomes[predicted] = outcomes.get(predicted, 0) + 1
+    total = len(hypotheses)
+    return -sum(n / total * math.log2(n / total) for n in outcomes.values())
+
+def most_informative_calls(state, functions, observed=(), arguments: Optional[Dict] = None,
+                           oracle_model: str = ORACLE_MODEL) -> List[Dict]:
+    """Every candidate call from a state, ranked by how much it tells apart the remaining hypotheses"""
+    arguments = CALL_ARGUMENTS if arguments is None else arguments
+    ranked = []
+    for func_name in functions:
+        hypotheses = consistent_hypotheses(func_name, observed, oracle_model)
+        for args in arguments.get(func_name, [()]):
+            if hypotheses:
+                ranked.append({'call': (func_name, tuple(args)),
+                               'bits': information_gain(hypotheses, state, tuple(args), oracle_model),
+                               'hypotheses': len(hypotheses)})
+    ranked.sort(key=lambda entry: -entry['bits'])  # stable: ties keep function order
+    return ranked
+
+def probe_plan(functions, start=("Cama", "Red", 1), turns: int = 10, oracle_model: str = ORACLE_MODEL) -> Dict:
+    """Greedy optimal-probing baseline: play the most informative call each turn and prune on the true outcome"""
+    state, observed, calls = tuple(start), [], []
+    for _ in range(turns):
+        ranked = most_informative_calls(state, functions, observed, oracle_model=oracle_model)
+        if not ranked or ranked[0]['bits'] <= 0:
+            break
+        func_name, args = ranked[0]['call']
+        new_state = simulate(func_name, state, args)
+        observed.append((state, func_name, args, new_state))
+        calls.append({'call': [func_name, list(args)], 'bits': ranked[0]['bits'], 'state': list(new_state)})
+        state = new_state
+    return {'calls': calls,
+            'remaining': {f: [h.name for h in consistent_hypotheses(f, observed, oracle_model)] for f in functions}}
+
+def parse_state(text: str, wildcard: bool = False) -> tuple:
+    """'name,bim,pim' (names may contain commas); empty fields are wildcards when allowed"""
+    name, bim, pim = text.rsplit(",", 2)
+    if not wildcard and not (name and bim and pim):
+        raise ValueError(f"start state needs a name, bim and pim: {text!r}")
+    return name or None, bim or None, int(pim) if pim else None
+
+def main():
+    """Explore the state graph, solve for a target or plan probing calls from the command line"""
+    parser = argparse.ArgumentParser(description="Search the zab state graph for a set of functions")
+    parser.add_argument("command", choices=["explore", "path", "probe"])
+    parser.add_argument("--functions", required=True, help="comma-separated function names")
+    parser.add_argument("--start", default="Cama,Red,1", help="name,bim,pim")
+    parser.add_argument("--target", default=",,", help="name,bim,pim; empty fields match anything")
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--max-pim", type=int, default=1000)
+    parser.add_argument("--max-states", type=int)
+    args = parser.parse_args()
+
+    functions = [f.strip() for f in args.functions.split(",") if f.strip()]
+    start = parse_state(args.start)
+    if args.command == "explore":
+        space = StateSpace(functions, args.max_pim)
+        exploration = space.explore(start, args.depth, args.max_states)
+        output = {'states': len(exploration), 'layers': exploration.layer_sizes(),
+                  'names': len(space.names), 'truncated': exploration.truncated}
+    elif args.command == "path":
+        path = shortest_path(functions, start, parse_state(args.target, wildcard=True), args.depth,
+                             args.max_pim, args.max_states)
+        output = {'reachable': path is not None, 'calls': None if path is None else [[f, list(a)] for f, a in path]}
+    else:
+        output = probe_plan(functions, start, args.depth)
+    print(json.dumps(output, indent=2))
+
+if __name__ == "__main__":
+    main()
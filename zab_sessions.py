@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+class SessionLimitError(Exception):
+    """Raised when a new game would exceed the cap on live games"""
+
+class GameSessionStore:
+    """Web game sessions with a live-game cap, TTL/LRU eviction of finished games and disk spilling"""
+
+    def __init__(self, max_live_games: int = 20, max_finished_games: int = 100, finished_ttl: float = 3600,
+                 idle_ttl: Optional[float] = None, spill_dir: Optional[str] = None,
+                 restore: Optional[Callable[[Dict], object]] = None, sweep_interval: float = 5.0):
+        self.max_live_games = max_live_games
+        self.max_finished_games = max_finished_games
+        self.finished_ttl = finished_ttl  # seconds a finished game is kept after its last access
+        self.idle_ttl = idle_ttl  # seconds before an unwatched running game is cancelled (None: never)
+        self.spill_dir = spill_dir  # completed transcripts are written here on eviction
+        self.restore = restore  # rebuilds an output capture from a spilled transcript
+        self.sweep_interval = sweep_interval
+        self.sessions: "OrderedDict[str, Dict]" = OrderedDict()  # least recently used first
+        self.lock = threading.RLock()
+        self.evicted = 0
+        self.spilled = 0
+        self._last_sweep = 0.0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def is_finished(entry) -> bool:
+        return entry['output_capture'].is_complete
+
+    def live_count(self) -> int:
+        with self.lock:
+            return sum(1 for entry in self.sessions.values() if not self.is_finished(entry))
+
+    def add(self, session_id: str, entry: Dict):
+        """Register a new game session, refusing it if the live-game cap is reached"""
+        with self.lock:
+            self.sweep(force=True)
+            if self.max_live_games and self.live_count() >= self.max_live_games:
+                raise SessionLimitError(f"Too many games in progress (limit {self.max_live_games})")
+            entry['last_access'] = time.time()
+            self.sessions[session_id] = entry
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict]:
+        """Look up a session, refreshing its LRU position; spilled sessions are reloaded read-only"""
+        if not session_id:
+            return None
+        with self.lock:
+            self.sweep()
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                entry = self._load_spilled(session_id)
+                if entry is None:
+                    return None
+                self.sessions[session_id] = entry
+            entry['last_access'] = time.time()
+            self.sessions.move_to_end(session_id)
+            return entry
+
+    def touch(self, session_id: str):
+        """Mark a session as in use without a full lookup, e.g. from an open event stream"""
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is not None:
+                entry['last_access'] = time.time()
+                self.sessions.move_to_end(session_id)
+
+    def remove(self, session_id: str):
+        """Forget a session without spilling it"""
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def __contains__(self, session_id) -> bool:
+        return self.get(session_id) is not None
+
+    def __getitem__(self, session_id) -> Dict:
+        entry = self.get(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        return entry
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def sweep(self, force: bool = False):
+        """Evict expired and excess finished games; cancel abandoned running games"""
+        now = time.time()
+        with self.lock:
+            if not force and now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+
+            finished = []
+            for session_id, entry in list(self.sessions.items()):
+                idle = now - entry['last_access']
+                if self.is_finished(entry):
+                    if self.finished_ttl is not None and idle > self.finished_ttl:
+                        self._evict(session_id)
+                    else:
+                        finished.append(session_id)
+                elif self.idle_ttl is not None and idle > self.idle_ttl:
+                    # Nobody is watching; stop spending turns on it (it finishes and is evicted later)
+                    entry['output_capture'].cancel()
+
+            # sessions is in LRU order, so the oldest finished games go first
+            excess = len(finished) - self.max_finished_games
+            for session_id in finished[:max(0, excess)]:
+                self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        entry = self.sessions.pop(session_id)
+        self.evicted += 1
+        if self.spill_dir and entry.get('game') is not None:
+            path = self._spill_path(session_id)
+            with open(path + ".tmp", "w") as f:
+                json.dump(entry['output_capture'].to_dict(), f)
+            os.replace(path + ".tmp", path)
+            self.spilled += 1
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{os.path.basename(session_id)}.json")
+
+    def _load_spilled(self, session_id: str) -> Optional[Dict]:
+        if not self.spill_dir or self.restore is None:
+            return None
+        path = self._spill_path(session_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            output_capture = self.restore(json.load(f))
+        return {'game': None, 'output_capture': output_capture, 'last_access': time.time()}
+
+    def memory_report(self) -> Dict:
+        """Approximate memory held by sessions (serialized transcript sizes) plus process peak RSS"""
+        with self.lock:
+            sessions = []
+            total = 0
+            for session_id, entry in self.sessions.items():
+                size = len(json.dumps(entry['output_capture'].to_dict()))
+                total += size
+                sessions.append({
+                    'session_id': session_id,
+                    'finished': self.is_finished(entry),
+                    'transcript_bytes': size,
+                    'idle_s': round(time.time() - entry['last_access'], 1)
+                })
+            return {
+                'sessions': len(self.sessions),
+                'live_games': self.live_count(),
+                'max_live_games': self.max_live_games,
+                'evicted': self.evicted,
+                'spilled': self.spilled,
+                'transcript_bytes': total,
+                'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+                'per_session': sessions
+            }
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
+import atexit
+import itertools
+import json
 import os
 import uuid
 import threading
@@ -8,23 +11,52 @@ import time
 from io import StringIO
 import sys
 from contextlib import redirect_stdout, redirect_stderr
+from zab import ORACLE_MODEL, FUNCTION_EFFECTS
 from zab_game_oai import ZabGameOAI
+from zab_metrics import registry as metrics_registry
+from zab_ratelimit import ModelRequestFailed
+from zab_scheduler import GameScheduler, QueueFullError, SchedulerShutdownError, api_key_bucket
+from zab_sessions import GameSessionStore, SessionLimitError
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-# Store game sessions
-game_sessions = {}
 
 class GameOutputCapture:
     """Capture game output for web display"""
-    def __init__(self):
+    def __init__(self, turn_delay=2.0, fast_mode=False, paused=False):
         self.turns = []  # List of turn objects
         self.current_turn_index = 0
         self.game_state = {}
         self.is_complete = False
-        self.is_paused = False
+        self.is_paused = paused
+        self.fast_mode = fast_mode  # no delay between turns
+        self.turn_delay = turn_delay  # seconds between turns for readability
+        self.step_requests = 0  # pending single-step advances
+        self.cancelled = False
+        self.queue_position = None
         self.final_analysis = None
+        self.events = []  # Append-only event log; event ids are 1-based positions
+        self.condition = threading.Condition()
+        self.chunk_interval = 0.1  # seconds between streamed response events, so the log stays small
+        self.pending_chunk = None
+        self.last_chunk_emit = 0.0
+        
+    def emit(self, event_type, data):
+        """Append an event for streaming clients (caller holds the condition)"""
+        self.events.append({'id': len(self.events) + 1, 'type': event_type, 'data': data})
+        self.condition.notify_all()
+        
+    def events_since(self, last_event_id):
+        """Return the events after last_event_id"""
+        with self.condition:
+            return self.events[max(0, last_event_id):]
+        
+    def wait_for_events(self, last_event_id, timeout=None):
+        """Block until there are events after last_event_id (or the game ends); returns them"""
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.events) > last_event_id or self.is_complete, timeout)
+            return self.events[max(0, last_event_id):]
         
     def start_new_turn(self, turn_number, total_turns):
         """Start a new turn"""
@@ -38,48 +70,200 @@ class GameOutputCapture:
             'llm_response': None,
             'is_complete': False
         }
-        self.turns.append(turn_data)
-        self.current_turn_index = len(self.turns) - 1
+        with self.condition:
+            self.turns.append(turn_data)
+            self.current_turn_index = len(self.turns) - 1
+            self.emit('turn_start', {'turn_index': self.current_turn_index, 'turn': dict(turn_data, steps=[])})
         
     def add_step(self, text, step_type="info", data=None):
         """Add a step to the current turn"""
         if not self.turns:
             return
             
-        current_turn = self.turns[-1]
         step = {
             'text': text,
             'type': step_type,
             'timestamp': time.time(),
             'data': data or {}
         }
-        current_turn['steps'].append(step)
         
         # Update specific turn data based on step type
+        fields = {}
         if step_type == "initial_state":
-            current_turn['initial_state'] = data
+            fields['initial_state'] = data
         elif step_type == "final_state":
-            current_turn['final_state'] = data
+            fields['final_state'] = data
         elif step_type == "llm_response":
-            current_turn['llm_response'] = text
+            fields['llm_response'] = text
         elif step_type == "action_result":
-            current_turn['action_taken'] = text
+            fields['action_taken'] = text
             
+        with self.condition:
+            if step_type == "llm_response":
+                self.pending_chunk = None  # the full response replaces the streamed one
+            current_turn = self.turns[-1]
+            current_turn['steps'].append(step)
+            current_turn.update(fields)
+            self.emit('step', {'turn_index': len(self.turns) - 1, 'step': step, 'fields': fields})
+            
+    def add_response_chunk(self, text, offset, final=False):
+        """Stream part of a model response; offset is where text starts in it (0 again after a retry)"""
+        with self.condition:
+            turn_index = None if final else len(self.turns) - 1
+            pending = self.pending_chunk
+            if (pending is None or pending['turn_index'] != turn_index
+                    or offset != pending['offset'] + len(pending['text'])):
+                self._flush_chunk()
+                pending = self.pending_chunk = {'turn_index': turn_index, 'offset': offset, 'text': ""}
+            pending['text'] += text
+            if time.time() - self.last_chunk_emit >= self.chunk_interval:
+                self._flush_chunk()
+    
+    def _flush_chunk(self):
+        # Caller holds the condition; turn_index None is the final analysis
+        if self.pending_chunk is not None and self.pending_chunk['text']:
+            self.emit('llm_response_chunk', self.pending_chunk)
+            self.last_chunk_emit = time.time()
+        self.pending_chunk = None
+        
     def complete_current_turn(self):
         """Mark the current turn as complete"""
-        if self.turns:
-            self.turns[-1]['is_complete'] = True
+        with self.condition:
+            if self.turns:
+                self.turns[-1]['is_complete'] = True
+                self.emit('turn_complete', {'turn_index': len(self.turns) - 1})
+                
+    def set_game_state(self, game_state, history_added=()):
+        """Replace the summary of the current game state; the event carries only the new history entries"""
+        history_added = list(history_added)
+        with self.condition:
+            self.game_state = dict(game_state, history=self.game_state.get('history', []) + history_added)
+            self.emit('game_state', dict(game_state, history_added=history_added))
             
     def set_final_analysis(self, analysis):
         """Set the final analysis"""
-        self.final_analysis = analysis
+        with self.condition:
+            self.pending_chunk = None
+            self.final_analysis = analysis
+            self.emit('final_analysis', analysis)
+            
+    def set_queue_position(self, position):
+        """Record where the game waits in the scheduler queue (0 once it is running)"""
+        with self.condition:
+            self.queue_position = position
+            self.emit('queued', {'position': position})
+            
+    def set_paused(self, paused):
+        """Pause or resume the game between turns"""
+        with self.condition:
+            self.is_paused = paused
+            self.emit('paused', {'paused': paused})
+            
+    def set_fast_mode(self, fast_mode):
+        """Turn the delay between turns off (or back on)"""
+        with self.condition:
+            self.fast_mode = fast_mode
+            self.condition.notify_all()
+            
+    def request_step(self):
+        """Let a paused game play one more turn, or skip the current delay"""
+        with self.condition:
+            self.step_requests += 1
+            self.condition.notify_all()
+            
+    def wait_for_next_turn(self, delay=True):
+        """Block before a turn: the readability delay (delay=False skips it), then for as long as the game is paused"""
+        with self.condition:
+            if delay and not self.fast_mode and self.turn_delay > 0:
+                # Ends early on pause, step, fast mode or cancel
+                self.condition.wait_for(
+                    lambda: self.cancelled or self.fast_mode or self.is_paused or self.step_requests > 0,
+                    self.turn_delay
+                )
+            self.condition.wait_for(lambda: self.cancelled or not self.is_paused or self.step_requests > 0)
+            if self.step_requests > 0:
+                self.step_requests -= 1
+            
+    def cancel(self):
+        """Ask the game to stop after the current turn"""
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+        
+    def to_dict(self):
+        """Serializable transcript, used when spilling finished sessions to disk; the event log holds everything"""
+        with self.condition:
+            return {'events': self.events}
+            
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a finished capture by replaying a to_dict() event log"""
+        capture = cls()
+        for event in data['events']:
+            capture._replay(event['type'], event['data'])
+        capture.events = data['events']
+        return capture
+    
+    def _replay(self, event_type, data):
+        # The same bookkeeping the page does in applyGameEvent
+        if event_type == 'turn_start':
+            self.turns.append(dict(data['turn'], steps=list(data['turn']['steps'])))  # the log stays as sent
+            self.current_turn_index = data['turn_index']
+        elif event_type == 'step':
+            turn = self.turns[data['turn_index']]
+            turn['steps'].append(data['step'])
+            turn.update(data['fields'])
+        elif event_type == 'turn_complete':
+            self.turns[data['turn_index']]['is_complete'] = True
+        elif event_type == 'game_state':
+            state = {key: value for key, value in data.items() if key != 'history_added'}
+            self.game_state = dict(state, history=self.game_state.get('history', []) + data['history_added'])
+        elif event_type == 'final_analysis':
+            self.final_analysis = data
+        elif event_type == 'queued':
+            self.queue_position = data['position']
+        elif event_type == 'complete':
+            self.is_complete = True
+            
+    def mark_complete(self):
+        """Mark the game as finished and wake any waiting streams"""
+        with self.condition:
+            self.is_complete = True
+            self.emit('complete', {})
+
+# Store game sessions; finished games are evicted (and optionally spilled to disk)
+game_sessions = GameSessionStore(
+    max_live_games=int(os.getenv("ZAB_MAX_LIVE_GAMES", "20")),
+    max_finished_games=int(os.getenv("ZAB_MAX_FINISHED_GAMES", "100")),
+    finished_ttl=float(os.getenv("ZAB_SESSION_TTL", "3600")),
+    idle_ttl=float(os.getenv("ZAB_IDLE_TTL")) if os.getenv("ZAB_IDLE_TTL") else None,
+    spill_dir=os.getenv("ZAB_SPILL_DIR"),
+    restore=GameOutputCapture.from_dict
+)
+
+# Fixed pool of game threads with an admission queue and per-API-key limits
+game_scheduler = GameScheduler(
+    max_workers=int(os.getenv("ZAB_GAME_WORKERS", "8")),
+    max_queue=int(os.getenv("ZAB_GAME_QUEUE", "32")),
+    per_key_limit=int(os.getenv("ZAB_PER_KEY_GAMES", "4")) or None
+)
+
+def shutdown_games(timeout=30):
+    """Drop queued games, ask running games to stop after their current turn and wait for them"""
+    for entry in list(game_sessions.sessions.values()):
+        entry['output_capture'].cancel()
+    game_scheduler.shutdown(wait=True, cancel_pending=True, timeout=timeout)
+
+atexit.register(shutdown_games)
 
 class WebZabGame(ZabGameOAI):
     """Modified ZabGame for web interface"""
     
-    def __init__(self, total_turns=10, model_name="gpt-4.1-mini", api_key=None, output_capture=None):
+    def __init__(self, total_turns=10, model_name="gpt-4.1-mini", api_key=None, output_capture=None, oracle_model=ORACLE_MODEL):
         self.output_capture = output_capture or GameOutputCapture()
-        super().__init__(total_turns, model_name, api_key)
+        super().__init__(total_turns, model_name, api_key, oracle_model)
+        self.on_response_chunk = self.output_capture.add_response_chunk  # show responses as they arrive
+        self.history_sent = 0  # history entries already sent to the page
         
     def log_output(self, text, output_type="info", data=None):
         """Log output to capture"""
@@ -99,47 +283,56 @@ class WebZabGame(ZabGameOAI):
         self.log_output(f"TURN {self.current_turn + 1}/{self.total_turns}", "turn_header")
         self.log_output(f"Current state: {self.current_zab.state()}", "initial_state", initial_state)
         
-        prompt = self.create_prompt()
+        self.metrics.start_turn(self.current_turn + 1)
+        with self.metrics.phase("prompt"):
+            prompt = self.create_prompt()
         self.log_output("Sending prompt to LLM...", "info")
         
-        response = self.get_llm_response(prompt)
-        self.log_output(response, "llm_response")
-        
-        func_name, args = self.parse_action(response)
-        
-        if func_name:
-            success, message = self.execute_action(func_name, args)
-            self.log_output(message, "action_result" if success else "error")
-            if success:
-                final_state = {
-                    'name': self.current_zab.name,
-                    'bim': self.current_zab.bim,
-                    'pim': self.current_zab.pim
-                }
-                self.log_output(f"New state: {self.current_zab.state()}", "final_state", final_state)
+        try:
+            with self.metrics.phase("model"):
+                response = self.get_llm_response(prompt, self.turn_stop())
+        except ModelRequestFailed as e:
+            self.record_failed_turn(e)
+            self.log_output(self.turn_log[-1]['message'], "error")
         else:
-            self.log_output("No valid action found in response. Skipping turn.", "warning")
+            self.log_output(response, "llm_response")
+            
+            with self.metrics.phase("parse"):
+                func_name, args = self.parse_action(response)
+            
+            if func_name:
+                with self.metrics.phase("execute"):
+                    success, message = self.execute_action(func_name, args)
+                self.log_output(message, "action_result" if success else "error")
+                if success:
+                    final_state = {
+                        'name': self.current_zab.name,
+                        'bim': self.current_zab.bim,
+                        'pim': self.current_zab.pim
+                    }
+                    self.log_output(f"New state: {self.current_zab.state()}", "final_state", final_state)
+            else:
+                success, message = False, "No valid action found in response. Skipping turn."
+                self.log_output(message, "warning")
+            self.record_turn(response, func_name, args, success, message)
         
         self.current_turn += 1
         
-        # Update game state for web display
-        self.output_capture.game_state = {
+        # Update game state for web display; only this turn's history entries go out, not the whole history
+        history = self.current_zab.history_view
+        self.output_capture.set_game_state({
             'name': self.current_zab.name,
             'bim': self.current_zab.bim,
             'pim': self.current_zab.pim,
             'turn': self.current_turn,
             'total_turns': self.total_turns,
             'selected_functions': self.selected_functions,
-            'scratchpad': self.scratchpad,
-            'history': self.current_zab.history
-        }
+            'scratchpad': self.scratchpad
+        }, list(itertools.islice(reversed(history), len(history) - self.history_sent))[::-1])
+        self.history_sent = len(history)
         
         self.output_capture.complete_current_turn()
         
-        # Pause for readability if not in fast mode
-        if not getattr(self.output_capture, 'fast_mode', False):
-            time.sleep(2)  # 2 second pause between turns
-        
     def play_game(self):
         """Play the complete game with web-friendly output"""
         self.log_output("Starting Zab Game with OpenAI!", "game_start")
@@ -147,54 +340,40 @@ class WebZabGame(ZabGameOAI):
         self.log_output(f"Initial state: {self.current_zab.state()}", "info")
         self.log_output(f"Available functions: {self.selected_functions}", "info")
         
-        # Play all turns
-        while self.current_turn < self.total_turns:
+        # Play all turns, waiting before each one (and before the analysis) so a game started paused holds
+        # before its first model request; the readability delay only comes after a turn
+        while True:
+            self.output_capture.wait_for_next_turn(delay=self.current_turn > 0)
+            if self.output_capture.cancelled:
+                self.log_output("Game cancelled.", "warning")
+                self.output_capture.mark_complete()
+                return self.get_results(None)
+            if self.current_turn >= self.total_turns:
+                break
             self.play_turn()
         
         # Final analysis
         self.log_output("GAME COMPLETE - FINAL ANALYSIS", "game_complete")
         
-        final_prompt = f"""The game is now complete! Based on your {self.total_turns} turns of experimentation, please provide your final analysis.
-
-Your final state: {self.current_zab.state()}
-
-Your complete history:
-{chr(10).join(self.current_zab.history) if self.current_zab.history else "No actions were successfully executed."}
-
-Your final scratchpad:
-{self.scratchpad}
-
-Now, please provide your best guess for what each of the three functions does:
-{chr(10).join([f"- {func}:" for func in self.selected_functions])}
-
-Be specific about how each function affects your name, bim, and pim values."""
+        final_prompt = self.create_final_prompt()
         
         self.log_output("Requesting final analysis from LLM...", "info")
-        final_response = self.get_llm_response(final_prompt)
+        self.metrics.start_turn("final")
+        self.on_response_chunk = lambda text, offset: self.output_capture.add_response_chunk(text, offset, final=True)
+        try:
+            with self.metrics.phase("final"):
+                final_response, final_error = self.get_llm_response(final_prompt), None
+        except ModelRequestFailed as e:
+            final_response, final_error = None, str(e)
+            self.log_output(f"Final analysis failed: {e}", "error")
+        self.metrics.end_turn()
         
         # Show actual function effects
-        actual_effects = {
-            "fin": "Reverses the name",
-            "bin": "Changes name to 'bad name, please change me immediately!'",
-            "stin": "Changes name to Spanish translation of the input noun",
-            "hin": "Keeps first N characters of the name",
-            "min": "Changes name to input string without its first character",
-            "tox": "Doubles the pim value",
-            "plox": "Adds the input number (1-10) to pim",
-            "rox": "Adds the number of sides of the shape to pim",
-            "sox": "Changes bim to 'Red'",
-            "vox": "Changes bim to color associated with the input animal",
-            "lox": "Changes bim to intermediate color between current bim and input color",
-            "mox": "Changes bim to ROYGBIV color at position N (1-7)",
-            "hox": "Resets to name='Cama', bim='Red', pim=1",
-            "box": "Changes bim to animal's color, pim to animal's leg count"
-        }
-        
-        actual_effects_text = "\n".join([f"- {func}: {actual_effects[func]}" for func in self.selected_functions])
+        actual_effects_text = "\n".join([f"- {func}: {FUNCTION_EFFECTS[func]}" for func in self.selected_functions])
         
         # Set final analysis data
         self.output_capture.set_final_analysis({
-            'llm_analysis': final_response,
+            'llm_analysis': final_response or f"Model request failed: {final_error}",
             'actual_effects': actual_effects_text,
             'selected_functions': self.selected_functions,
             'final_state': {
@@ -204,7 +383,9 @@ Be specific about how each function affects your name, bim, and pim values."""
             }
         })
         
-        self.output_capture.is_complete = True
+        self.output_capture.mark_complete()
+        
+        return self.get_results(final_response, final_error)
 
 @app.route('/')
 def index():
@@ -218,71 +399,187 @@ def start_game():
     model_name = data.get('model_name', 'gpt-4.1-mini')
     total_turns = data.get('total_turns', 10)
     api_key = data.get('api_key', None)
+    oracle_model = data.get('oracle_model', ORACLE_MODEL)
+    fast_mode = bool(data.get('fast_mode', False))
+    turn_delay = float(data.get('turn_delay', 2.0))
+    start_paused = bool(data.get('paused', False))
     
     # Create new game session
     session_id = str(uuid.uuid4())
-    session['game_id'] = session_id
     
     try:
-        output_capture = GameOutputCapture()
-        game = WebZabGame(total_turns=total_turns, model_name=model_name, api_key=api_key, output_capture=output_capture)
+        output_capture = GameOutputCapture(turn_delay=turn_delay, fast_mode=fast_mode, paused=start_paused)
+        game = WebZabGame(total_turns=total_turns, model_name=model_name, api_key=api_key, output_capture=output_capture, oracle_model=oracle_model)
         
-        game_sessions[session_id] = {
+        game_session = {
             'game': game,
-            'output_capture': output_capture,
-            'thread': None
+            'output_capture': output_capture
         }
+        game_sessions.add(session_id, game_session)
         
-        # Start game in background thread
+        # Queue the game on the shared worker pool
         def run_game():
             try:
                 game.play_game()
             except Exception as e:
                 game.log_output(f"Error: {str(e)}", "error")
-        
-        thread = threading.Thread(target=run_game)
-        game_sessions[session_id]['thread'] = thread
-        thread.start()
-        
-        return jsonify({'success': True, 'session_id': session_id})
-        
+                output_capture.mark_complete()
+        
+        try:
+            queue_position = game_scheduler.submit(
+                session_id, run_game, key=api_key_bucket(api_key),
+                on_position=output_capture.set_queue_position,
+                on_cancel=output_capture.mark_complete
+            )
+        except (QueueFullError, SchedulerShutdownError) as e:
+            game_sessions.remove(session_id)
+            return jsonify({'success': False, 'error': str(e)}), 429 if isinstance(e, QueueFullError) else 503
+        
+        session['game_id'] = session_id
+        return jsonify({'success': True, 'session_id': session_id, 'queue_position': queue_position})
+        
+    except SessionLimitError as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/game_status')
 def game_status():
-    """Get current game status"""
+    """Get current game status, or only the events after ?cursor=<version>"""
     session_id = session.get('game_id')
-    if not session_id or session_id not in game_sessions:
+    game_session = game_sessions.get(session_id)
+    if game_session is None:
         return jsonify({'error': 'No active game session'})
     
-    game_session = game_sessions[session_id]
     output_capture = game_session['output_capture']
+    cursor = request.args.get('cursor', type=int)
     
-    return jsonify({
-        'turns': output_capture.turns,
-        'game_state': output_capture.game_state,
-        'is_complete': output_capture.is_complete,
-        'final_analysis': output_capture.final_analysis,
-        'total_turns': len(output_capture.turns)
-    })
+    with output_capture.condition:
+        version = len(output_capture.events)
+        etag = f"{session_id}-{version}"
+        if etag in request.if_none_match or (cursor is not None and cursor >= version):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        if cursor is not None:
+            # Incremental update: only the events since the client's cursor
+            response = jsonify({
+                'version': version,
+                'events': output_capture.events[max(0, cursor):],
+                'is_complete': output_capture.is_complete
+            })
+        else:
+            response = jsonify({
+                'turns': output_capture.turns,
+                'game_state': output_capture.game_state,
+                'is_complete': output_capture.is_complete,
+                'final_analysis': output_capture.final_analysis,
+                'total_turns': len(output_capture.turns),
+                'queue_position': output_capture.queue_position,
+                'version': version
+            })
+    response.set_etag(etag)
+    return response
+
+@app.route('/game_events')
+def game_events():
+    """Stream game events as server-sent events, resuming after Last-Event-ID"""
+    session_id = session.get('game_id')
+    game_session = game_sessions.get(session_id)
+    if game_session is None:
+        return jsonify({'error': 'No active game session'})
+    
+    output_capture = game_session['output_capture']
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    def stream():
+        cursor = last_event_id
+        yield "retry: 2000\n\n"
+        while True:
+            events = output_capture.wait_for_events(cursor, timeout=15)
+            # An open stream is someone watching: keep ZAB_IDLE_TTL from cancelling the game
+            game_sessions.touch(session_id)
+            if not events:
+                if output_capture.is_complete:
+                    return
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            cursor = events[-1]['id']
+            if output_capture.is_complete and cursor >= len(output_capture.events):
+                return
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/set_pause', methods=['POST'])
 def set_pause():
     """Pause or unpause the game"""
     session_id = session.get('game_id')
-    if not session_id or session_id not in game_sessions:
+    game_session = game_sessions.get(session_id)
+    if game_session is None:
         return jsonify({'error': 'No active game session'})
     
     data = request.json
-    is_paused = data.get('paused', False)
+    is_paused = bool(data.get('paused', False))
     
-    game_session = game_sessions[session_id]
     output_capture = game_session['output_capture']
-    output_capture.is_paused = is_paused
+    output_capture.set_paused(is_paused)
     
     return jsonify({'success': True, 'paused': is_paused})
 
+@app.route('/step', methods=['POST'])
+def step():
+    """Advance a paused game by one turn"""
+    session_id = session.get('game_id')
+    game_session = game_sessions.get(session_id)
+    if game_session is None:
+        return jsonify({'error': 'No active game session'})
+    
+    game_session['output_capture'].request_step()
+    return jsonify({'success': True})
+
+@app.route('/set_fast_mode', methods=['POST'])
+def set_fast_mode():
+    """Turn the delay between turns on or off"""
+    session_id = session.get('game_id')
+    game_session = game_sessions.get(session_id)
+    if game_session is None:
+        return jsonify({'error': 'No active game session'})
+    
+    fast_mode = bool(request.json.get('fast_mode', False))
+    game_session['output_capture'].set_fast_mode(fast_mode)
+    return jsonify({'success': True, 'fast_mode': fast_mode})
+
+@app.route('/sessions/stats')
+def sessions_stats():
+    """Report live/finished sessions and approximate memory use"""
+    game_sessions.sweep(force=True)
+    report = game_sessions.memory_report()
+    report['scheduler'] = game_scheduler.stats()
+    return jsonify(report)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: per-phase latency, tokens and turn outcomes, plus session and queue gauges"""
+    game_sessions.sweep()
+    queue = game_scheduler.stats()
+    gauges = {
+        # memory_report serializes every transcript, too slow for a scrape target
+        'zab_sessions': len(game_sessions.sessions),
+        'zab_live_games': game_sessions.live_count(),
+        'zab_sessions_evicted': game_sessions.evicted,
+        'zab_queue_running': queue['running'],
+        'zab_queue_waiting': queue['queued'],
+    }
+    return Response(metrics_registry.render(gauges), mimetype="text/plain; version=0.0.4")
+
 @app.route('/templates/index.html')
 def serve_template():
     """Serve the HTML template directly for debugging"""
@@ -678,6 +975,12 @@ if __name__ == '__main__':
                     <label for="api-key-input">OpenAI API Key (optional, uses environment variable if not provided):</label>
                     <input type="password" id="api-key-input" placeholder="sk-...">
                 </div>
+                <div class="form-group">
+                    <label for="fast-mode-input">
+                        <input type="checkbox" id="fast-mode-input" style="width: auto;">
+                        Fast mode (no delay between turns)
+                    </label>
+                </div>
                 <button id="start-btn" class="btn">Start Game</button>
             </div>
             
@@ -693,6 +996,8 @@ if __name__ == '__main__':
                         </div>
                         <button id="next-turn" class="btn btn-secondary">Next →</button>
                         <button id="auto-play" class="btn btn-secondary">Auto Play</button>
+                        <button id="pause-game" class="btn btn-secondary">Pause Game</button>
+                        <button id="step-game" class="btn btn-secondary" disabled>Step</button>
                     </div>
                     <div>
                         <span id="game-status">Ready</span>
@@ -755,6 +1060,7 @@ if __name__ == '__main__':
         let gameData = null;
         let currentTurnIndex = -1;
         let gameInterval = null;
+        let eventSource = null;
         let autoPlayMode = false;
         
         document.getElementById('start-btn').addEventListener('click', startGame);
@@ -782,6 +1088,8 @@ if __name__ == '__main__':
             }
         });
         document.getElementById('auto-play').addEventListener('click', toggleAutoPlay);
+        document.getElementById('pause-game').addEventListener('click', toggleGamePause);
+        document.getElementById('step-game').addEventListener('click', stepGame);
         
         // Add keyboard navigation
         document.addEventListener('keydown', (e) => {
@@ -832,6 +1140,7 @@ if __name__ == '__main__':
             const model = document.getElementById('model-select').value;
             const turns = parseInt(document.getElementById('turns-input').value);
             const apiKey = document.getElementById('api-key-input').value;
+            const fastMode = document.getElementById('fast-mode-input').checked;
             
             const startBtn = document.getElementById('start-btn');
             startBtn.disabled = true;
@@ -846,7 +1155,8 @@ if __name__ == '__main__':
                     body: JSON.stringify({
                         model_name: model,
                         total_turns: turns,
-                        api_key: apiKey || null
+                        api_key: apiKey || null,
+                        fast_mode: fastMode
                     })
                 });
                 
@@ -856,8 +1166,12 @@ if __name__ == '__main__':
                     document.getElementById('game-setup').style.display = 'none';
                     document.getElementById('game-display').style.display = 'block';
                     
-                    // Start polling for game updates
-                    gameInterval = setInterval(updateGameStatus, 1000);
+                    // Stream game updates, falling back to polling
+                    if (window.EventSource) {
+                        startEventStream();
+                    } else {
+                        gameInterval = setInterval(updateGameStatus, 1000);
+                    }
                 } else {
                     alert('Error starting game: ' + result.error);
                     startBtn.disabled = false;
@@ -870,9 +1184,86 @@ if __name__ == '__main__':
             }
         }
         
+        let statusCursor = 0;
+        
+        function applyGameEvent(type, data) {
+            switch (type) {
+                case 'turn_start':
+                    gameData.turns[data.turn_index] = data.turn;
+                    break;
+                case 'step': {
+                    const turn = gameData.turns[data.turn_index];
+                    if (!turn) return;
+                    turn.steps.push(data.step);
+                    Object.assign(turn, data.fields);
+                    if (data.step.type === 'llm_response') {
+                        delete turn.streaming_response;
+                    }
+                    break;
+                }
+                case 'llm_response_chunk': {
+                    // Keep the text before offset and append; offset 0 starts over after a retry
+                    const target = data.turn_index === null ? gameData : gameData.turns[data.turn_index];
+                    if (!target) return;
+                    target.streaming_response = (target.streaming_response || '').slice(0, data.offset) + data.text;
+                    break;
+                }
+                case 'turn_complete':
+                    if (gameData.turns[data.turn_index]) {
+                        gameData.turns[data.turn_index].is_complete = true;
+                        delete gameData.turns[data.turn_index].streaming_response;
+                    }
+                    break;
+                case 'game_state': {
+                    // Each event carries only the history entries added since the previous one
+                    const history = (gameData.game_state.history || []).concat(data.history_added || []);
+                    gameData.game_state = Object.assign({}, data, {history: history});
+                    delete gameData.game_state.history_added;
+                    break;
+                }
+                case 'final_analysis':
+                    gameData.final_analysis = data;
+                    delete gameData.streaming_response;
+                    break;
+                case 'queued':
+                    gameData.queue_position = data.position;
+                    break;
+                case 'paused':
+                    gameData.is_paused = data.paused;
+                    updatePauseControls();
+                    break;
+                case 'complete':
+                    gameData.is_complete = true;
+                    break;
+            }
+        }
+        
+        function startEventStream() {
+            gameData = {turns: [], game_state: {}, is_complete: false, final_analysis: null};
+            
+            // The browser resumes from Last-Event-ID on reconnect, so events are never applied twice
+            eventSource = new EventSource('/game_events');
+            ['queued', 'paused', 'turn_start', 'step', 'llm_response_chunk', 'turn_complete', 'game_state', 'final_analysis', 'complete'].forEach(type => {
+                eventSource.addEventListener(type, (e) => {
+                    applyGameEvent(type, JSON.parse(e.data));
+                    if (type === 'complete') {
+                        eventSource.close();
+                        eventSource = null;
+                    }
+                    onGameDataUpdated();
+                });
+            });
+        }
+        
         async function updateGameStatus() {
             try {
-                const response = await fetch('/game_status');
+                if (!gameData) {
+                    gameData = {turns: [], game_state: {}, is_complete: false, final_analysis: null};
+                }
+                
+                // Ask only for what changed since the last poll; 304 means nothing did
+                const response = await fetch(`/game_status?cursor=${statusCursor}`);
+                if (response.status === 304) return;
                 const data = await response.json();
                 
                 if (data.error) {
@@ -880,50 +1271,89 @@ if __name__ == '__main__':
                     return;
                 }
                 
-                gameData = data;
-                updateGameDisplay();
+                data.events.forEach(event => applyGameEvent(event.type, event.data));
+                statusCursor = data.version;
+                onGameDataUpdated();
+            } catch (error) {
+                console.error('Error updating game status:', error);
+            }
+        }
+        
+        function onGameDataUpdated() {
+            const data = gameData;
+            updateGameDisplay();
+            updateStreamingResponse();
+            
+            if (!data.is_complete && data.queue_position !== undefined && data.queue_position !== null) {
+                document.getElementById('game-status').textContent =
+                    data.queue_position > 0 ? `Queued (position ${data.queue_position})` : 'Running';
+            }
+            
+            // Auto-advance to latest turn if in auto-play mode (but not if user is manually navigating)
+            if (autoPlayMode && data.turns && data.turns.length > currentTurnIndex + 1 && 
+                (currentTurnIndex === -1 || currentTurnIndex === data.turns.length - 2)) {
+                navigateToTurn(data.turns.length - 1);
+            }
+            
+            // Stop polling if game is complete
+            if (data.is_complete) {
+                if (gameInterval) {
+                    clearInterval(gameInterval);
+                    gameInterval = null;
+                }
+                document.getElementById('game-status').textContent = 'Complete';
+                
+                // Disable auto-play when complete
+                if (autoPlayMode) {
+                    toggleAutoPlay();
+                }
                 
-                // Auto-advance to latest turn if in auto-play mode (but not if user is manually navigating)
-                if (autoPlayMode && data.turns && data.turns.length > currentTurnIndex + 1 && 
-                    (currentTurnIndex === -1 || currentTurnIndex === data.turns.length - 2)) {
-                    navigateToTurn(data.turns.length - 1);
+                // Add final analysis option to turn selector
+                const turnSelect = document.getElementById('turn-select');
+                if (!document.querySelector('option[value="final"]')) {
+                    const finalOption = document.createElement('option');
+                    finalOption.value = 'final';
+                    finalOption.textContent = 'Final Analysis';
+                    turnSelect.appendChild(finalOption);
                 }
                 
-                // Stop polling if game is complete
-                if (data.is_complete) {
-                    clearInterval(gameInterval);
-                    gameInterval = null;
-                    document.getElementById('game-status').textContent = 'Complete';
+                // Show final analysis if available and not already viewing a specific turn
+                if (data.final_analysis && (currentTurnIndex === -1 || currentTurnIndex >= data.turns.length - 1)) {
+                    // Show a notification that final analysis is ready
+                    const statusElement = document.getElementById('game-status');
+                    statusElement.innerHTML = 'Complete - <span style="color: #28a745; font-weight: bold;">Final Analysis Ready!</span>';
                     
-                    // Disable auto-play when complete
+                    // Only auto-navigate if in auto-play mode
                     if (autoPlayMode) {
-                        toggleAutoPlay();
-                    }
-                    
-                    // Add final analysis option to turn selector
-                    const turnSelect = document.getElementById('turn-select');
-                    if (!document.querySelector('option[value="final"]')) {
-                        const finalOption = document.createElement('option');
-                        finalOption.value = 'final';
-                        finalOption.textContent = 'Final Analysis';
-                        turnSelect.appendChild(finalOption);
-                    }
-                    
-                    // Show final analysis if available and not already viewing a specific turn
-                    if (data.final_analysis && (currentTurnIndex === -1 || currentTurnIndex >= data.turns.length - 1)) {
-                        // Show a notification that final analysis is ready
-                        const statusElement = document.getElementById('game-status');
-                        statusElement.innerHTML = 'Complete - <span style="color: #28a745; font-weight: bold;">Final Analysis Ready!</span>';
-                        
-                        // Only auto-navigate if in auto-play mode
-                        if (autoPlayMode) {
-                            navigateToTurn('final');
-                        }
+                        navigateToTurn('final');
                     }
                 }
-                
-            } catch (error) {
-                console.error('Error updating game status:', error);
+            }
+        }
+        
+        function streamingResponse(turnIndex) {
+            // Text of a response still being generated, shown under the turn that asked for it
+            const turn = gameData.turns[turnIndex];
+            if (!turn) return null;
+            if (turn.streaming_response !== undefined) {
+                return {title: '🤖 AI Response (generating...)', text: turn.streaming_response};
+            }
+            // The final analysis streams under the last turn until it is complete
+            if (turnIndex === gameData.turns.length - 1 && gameData.streaming_response !== undefined) {
+                return {title: '🎯 Final Analysis (generating...)', text: gameData.streaming_response};
+            }
+            return null;
+        }
+        
+        function updateStreamingResponse() {
+            if (currentTurnIndex === 'final' || currentTurnIndex < 0) return;
+            const streaming = streamingResponse(currentTurnIndex);
+            const element = document.getElementById('streaming-response');
+            if (streaming && element) {
+                element.textContent = streaming.text;
+            } else if (streaming || element) {
+                // Streaming started or finished: redraw the turn with its latest steps
+                showTurnContent(currentTurnIndex);
             }
         }
         
@@ -1119,8 +1549,21 @@ if __name__ == '__main__':
                 `;
             });
             
+            const streaming = streamingResponse(turnIndex);
+            if (streaming) {
+                html += `
+                    <div class="step-section llm_response">
+                        <h4>${streaming.title}</h4>
+                        <div class="response-text" id="streaming-response"></div>
+                    </div>
+                `;
+            }
+            
             html += '</div>';
             contentDiv.innerHTML = html;
+            if (streaming) {
+                document.getElementById('streaming-response').textContent = streaming.text;
+            }
         }
         
         function showFinalAnalysis(analysis) {
@@ -1161,6 +1604,33 @@ Pim: ${analysis.final_state.pim}</div>
             contentDiv.innerHTML = html;
         }
         
+        async function toggleGamePause() {
+            const paused = !(gameData && gameData.is_paused);
+            try {
+                await fetch('/set_pause', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({paused: paused})
+                });
+            } catch (error) {
+                console.error('Error pausing game:', error);
+            }
+        }
+        
+        async function stepGame() {
+            try {
+                await fetch('/step', {method: 'POST'});
+            } catch (error) {
+                console.error('Error stepping game:', error);
+            }
+        }
+        
+        function updatePauseControls() {
+            const paused = gameData && gameData.is_paused;
+            document.getElementById('pause-game').textContent = paused ? 'Resume Game' : 'Pause Game';
+            document.getElementById('step-game').disabled = !paused;
+        }
+        
         function toggleAutoPlay() {
             autoPlayMode = !autoPlayMode;
             const btn = document.getElementById('auto-play');